@@ -1,7 +1,12 @@
 from langgraph.graph import StateGraph, END
 
 from .state import AgentState
-from .nodes import agent_node, tool_node, output_formatter_node, should_format_output
+from .nodes import MAX_REACT_STEPS, agent_node, tool_node, output_formatter_node, should_format_output
+
+# A backstop: should_format_output stops a turn after MAX_REACT_STEPS rounds.
+# A full turn is two graph steps a round, the final agent call and the
+# formatter, and LangGraph needs one step more than that to finish
+RECURSION_LIMIT = 2 * MAX_REACT_STEPS + 3
 
 
 def create_graph():
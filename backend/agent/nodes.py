@@ -1,28 +1,59 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
-from langgraph.prebuilt import ToolNode
+import asyncio
+import os
+import threading
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.errors import GraphRecursionError
 
 from .state import AgentState
-from .tools.tools import tools
+from .tools.tools import tools, toolkits
+from .utils.tool_executor import EarlyToolDispatch, ToolCallExecutor
+from .utils.tool_selector import get_tool_selector
+from .utils.prompt_cache import get_prompt_cache
 
 from dotenv import load_dotenv
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-llm_with_tools = llm.bind_tools(tools)
+MODEL = "gemini-2.5-flash"
+# Agent -> tools rounds a turn may take before it's stopped
+MAX_REACT_STEPS = int(os.getenv("MAX_REACT_STEPS", "8"))
+# Built on first use, or by the startup thread: importing langchain_google_genai
+# is the single biggest cost of importing the backend
+llm = None
+llm_with_tools = None
+_llm_lock = threading.Lock()
 
 
-def agent_node(state: AgentState) -> AgentState:
-    """
-    The agent node - makes decisions and calls tools
-    """
-    messages = state["messages"]
-    selected_app = state.get("selected_app", "")
-    
-    # Add system message if first interaction
-    if len(messages) == 1:
-        system_msg = SystemMessage(
-            content=f"""You are Jarvis, a macOS automation agent. You control the local Mac and common apps using ONLY the provided tools. Do not invent abilities.
+def chat_model(**kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=MODEL, **kwargs)
+
+
+def get_llm():
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                llm = chat_model(temperature=0)
+    return llm
+
+
+def get_llm_with_tools():
+    """The model bound to every tool, for when tool selection is off."""
+    global llm_with_tools
+    if llm_with_tools is None:
+        with _llm_lock:
+            if llm_with_tools is None:
+                llm_with_tools = get_llm().bind_tools(tools)
+    return llm_with_tools
+
+
+tool_executor = ToolCallExecutor(tools)
+
+# Never interpolate into this: it is the cached prefix of every agent call.
+# Anything per-turn goes in context_message() at the end of the conversation.
+SYSTEM_PROMPT = """You are Jarvis, a macOS automation agent. You control the local Mac and common apps using ONLY the provided tools. Do not invent abilities.
 
 Core capabilities (via tools):
 - System: open/close macOS apps; set/adjust system volume
@@ -37,7 +68,7 @@ Core capabilities (via tools):
 
 Operating rules:
 1) Think then act: briefly plan steps, then call tools in the required order. For multi-step tasks, sequence tools (e.g., open app -> navigate/search -> type -> confirm).
-2) App context: Selected app: {selected_app if selected_app else "None (user will specify)"}. If selected_app is set, assume requests target that app unless the user names another.
+2) App context: If a "Context:" note names the app the user is working with, assume requests target that app unless the user names another.
 3) Parameterize: Always pass required arguments (e.g., browser name when needed: Chrome, Safari, Firefox, Arc, Brave, Edge). Sensible defaults: Chrome, Spotify, YouTube.
 4) Safety: Only use available tools. If a request needs capabilities you lack, say: "I'm sorry, I cannot assist with that request."
 5) Special rule: If the user mentions "surge" or "surging" at any point, call surgin_it immediately (in addition to any other needed steps).
@@ -51,19 +82,61 @@ Examples of decomposing tasks:
 
 If a step fails, return a clear error and suggest the next best alternative within your tools.
 """
-        )
-        messages = [system_msg] + messages
-    else:
-        # For subsequent messages, inject context about selected app if it exists
-        if selected_app:
-            context_msg = SystemMessage(
-                content=f"Remember: The user is currently working with {selected_app}. "
-                f"Unless they specify otherwise, assume actions relate to this app."
-            )
-            messages = [context_msg] + messages
+prompt_cache = get_prompt_cache(MODEL, SYSTEM_PROMPT, tools)
+
+
+def context_message(selected_app: str) -> HumanMessage:
+    return HumanMessage(
+        content=f"Context: The user is currently working with {selected_app}. "
+        f"Unless they specify otherwise, assume actions relate to this app."
+    )
+
+
+# Binds a relevant subset of tools per step instead of all of them (TOOL_SELECTION=off to disable)
+tool_selector = get_tool_selector(toolkits)
+
+
+async def bind_tools_for(messages, selected_app: str):
+    """The tools this step needs, and the model bound to them."""
+    last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=None)
+    if tool_selector is None or last_human is None:
+        return list(prompt_cache.tools), get_llm_with_tools()
+    used = [call["name"] for m in messages[last_human + 1:] if isinstance(m, AIMessage) for call in m.tool_calls]
+    names = await tool_selector.select(messages[last_human].content, selected_app, used)
+    return names, tool_selector.bind(get_llm(), names)
+
+
+async def agent_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """
+    The agent node - makes decisions and calls tools
+    """
+    messages = state["messages"]
+    selected_app = state.get("selected_app", "")
+    
+    if llm is None:
+        # Keep a first-use import off the event loop
+        await asyncio.to_thread(get_llm)
+
+    # Static prefix first (cacheable), per-turn context last
+    names, bound = await bind_tools_for(messages, selected_app)
+    model, prefix = prompt_cache.prepare(get_llm(), names, bound)
+    suffix = [context_message(selected_app)] if selected_app else []
+    messages = prefix + messages + suffix
         
-    # Call LLM with tools
-    response = llm_with_tools.invoke(messages)
+    # Stream the LLM response and start each tool as soon as its call is complete,
+    # unless the turn has used its rounds and any tool call will be refused
+    dispatch = EarlyToolDispatch(tool_executor, config)
+    early = tool_rounds(state["messages"]) < MAX_REACT_STEPS
+    accumulated = None
+    try:
+        async for chunk in model.astream(messages, config):
+            accumulated = chunk if accumulated is None else accumulated + chunk
+            if early:
+                dispatch.feed(accumulated)
+    except BaseException:
+        dispatch.cancel()
+        raise
+    response = dispatch.finish(accumulated)
     
     return {"messages": [response]}
 
@@ -81,7 +154,7 @@ def output_formatter_node(state: AgentState) -> AgentState:
     
     # If it's an AI message without tool calls, format it for the user
     if isinstance(last_message, AIMessage) and not (hasattr(last_message, 'tool_calls') and last_message.tool_calls):
-        formatter_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
+        formatter_llm = chat_model(temperature=0.3)
         
         formatter_prompt = f"""You are the output formatter for Jarvis. Format the agent's response into a brief, natural message.
 
@@ -106,14 +179,27 @@ Formatted response:"""
     return {"messages": []}
 
 
+def tool_rounds(messages) -> int:
+    """Tool-calling responses since the user's latest message, i.e. the rounds this turn has taken."""
+    rounds = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, AIMessage) and message.tool_calls:
+            rounds += 1
+    return rounds
+
+
 def should_format_output(state: AgentState) -> str:
     """
     Routing function: decide if we need to format output or continue with tools
     """
     last_message = state["messages"][-1]
     
-    # If the LLM makes a tool call, route to tools
+    # If the LLM makes a tool call, route to tools, unless the turn is out of rounds
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+        if tool_rounds(state["messages"][:-1]) >= MAX_REACT_STEPS:
+            raise GraphRecursionError(f"Still calling tools after {MAX_REACT_STEPS} rounds")
         return "tools"
     
     # If it's an AI message without tool calls, format it
@@ -124,8 +210,24 @@ def should_format_output(state: AgentState) -> str:
     return "end"
 
 
-# Create tool execution node
-tool_node = ToolNode(tools)
+async def tool_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """
+    Joins the tool calls the agent node already started, running any that
+    weren't (e.g. arguments only complete at the end of the stream) after them.
+    """
+    last_message = state["messages"][-1]
+    tasks, previous = [], None
+    for call in last_message.tool_calls:
+        task = tool_executor.take(call["id"]) or asyncio.create_task(tool_executor.run(call, config, after=previous))
+        tasks.append(task)
+        previous = task
+    try:
+        results = await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    return {"messages": list(results)}
 
 def should_open_my_presentation(state: AgentState) -> str:
     last_msg = state["messages"][-1]
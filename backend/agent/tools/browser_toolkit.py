@@ -1,10 +1,10 @@
 import logging
-import subprocess
 import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
-import pyautogui
 
+from ..utils.cancellation import run_process
+from ..utils.input_actor import hotkey, input_actor, open_app, press, wait, write
 from ..utils.mapping import normalize_app_name
 
 class BrowserToolkit:
@@ -30,7 +30,7 @@ class BrowserToolkit:
                 encoded_query = urllib.parse.quote(query)
                 search_url = f"https://www.google.com/search?q={encoded_query}"
                 
-                subprocess.run(['open', '-a', actual_browser, search_url], check=True)
+                run_process(['open', '-a', actual_browser, search_url], check=True)
                 time.sleep(2)
                 
                 return f"Opened {actual_browser} and searched for: {query}"
@@ -49,7 +49,7 @@ class BrowserToolkit:
             logging.info("calling open url tool")
             try:
                 actual_browser = normalize_app_name(browser)
-                subprocess.run(['open', '-a', actual_browser, url], check=True)
+                run_process(['open', '-a', actual_browser, url], check=True)
                 return f"Opened {url} in {actual_browser}"
             except Exception as e:
                 return f"Error opening URL: {str(e)}"
@@ -64,8 +64,7 @@ class BrowserToolkit:
             """
             logging.info("calling type text tool")
             try:
-                time.sleep(0.5)
-                pyautogui.write(text, interval=0.05)
+                input_actor.run(wait(0.5), write(text, interval=0.05))
                 return f"Typed text into active application"
             except Exception as e:
                 return f"Error typing text: {str(e)}"
@@ -82,9 +81,9 @@ class BrowserToolkit:
             try:
                 if '+' in key:
                     keys = key.split('+')
-                    pyautogui.hotkey(*keys)
+                    input_actor.run(hotkey(*keys))
                 else:
-                    pyautogui.press(key)
+                    input_actor.run(press(key))
                 return f"Pressed key: {key}"
             except Exception as e:
                 return f"Error pressing key: {str(e)}"
@@ -100,13 +99,12 @@ class BrowserToolkit:
             """
             logging.info("calling create note tool")
             try:
-                subprocess.run(['open', '-a', 'Notes'], check=True)
-                time.sleep(1)
-                
-                pyautogui.hotkey('command', 'n')
-                time.sleep(0.5)
-                
-                pyautogui.write(f"{title}\n{content}", interval=0.05)
+                input_actor.run(
+                    open_app('Notes'),
+                    hotkey('command', 'n'),
+                    wait(0.5),
+                    write(f"{title}\n{content}", interval=0.05),
+                )
                 
                 return f"Created note: {title}"
             except Exception as e:
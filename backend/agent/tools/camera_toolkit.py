@@ -1,9 +1,10 @@
-import subprocess
 import os
 import time
 
 from langchain_core.tools import tool
 
+from ..utils.cancellation import run_process
+
 DESKTOP_DIR = os.path.join(os.path.expanduser("~"), "Desktop")
 os.makedirs(DESKTOP_DIR, exist_ok=True) 
 
@@ -21,7 +22,7 @@ class CameraToolkit:
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"photo_{timestamp}.jpg"
             filepath = os.path.join(DESKTOP_DIR, filename)
-            subprocess.run(["imagesnap", "-q", filepath], check=True, timeout=10)
+            run_process(["imagesnap", "-q", filepath], check=True, timeout=10)
             return f"📸 Photo saved to: {filename}"
         except Exception as e:
             return f"⚠️ Unexpected error: {str(e)}"
@@ -1,9 +1,10 @@
-import subprocess
 import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
 import pyautogui
 
+from ..utils.app_state import app_state
+from ..utils.cancellation import run_process
 from ..utils.mapping import normalize_app_name
 
 class CoolToolkit:
@@ -22,8 +23,7 @@ class CoolToolkit:
                 None
             """
             try:
-                subprocess.run(['open', '-a', 'Spotify'], check=True)
-                time.sleep(1.5)
+                app_state.ensure_running('Spotify', 1.5)
                 
                 applescript = f'''
                 tell application "Spotify"
@@ -32,14 +32,14 @@ class CoolToolkit:
                 end tell
                 '''
                 
-                subprocess.run(['osascript', '-e', applescript], capture_output=True, text=True)
+                run_process(['osascript', '-e', applescript], capture_output=True, text=True)
 
                 time.sleep(2)
 
                 actual_browser = normalize_app_name("Chrome")
                 search_url = f"https://www.stormhacks.com/"
                 
-                subprocess.run(['open', '-a', actual_browser, search_url], check=True)
+                run_process(['open', '-a', actual_browser, search_url], check=True)
                 
                 return f"▶️ Im Surgin it gng"
                 
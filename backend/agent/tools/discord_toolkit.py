@@ -1,9 +1,8 @@
-import subprocess
-import time
-import pyautogui
 from typing import List
 from langchain_core.tools import tool, BaseTool
 
+from ..utils.cancellation import run_process
+from ..utils.input_actor import activate, click, hotkey, input_actor, open_app, press, wait, write
 from ..utils.mapping import normalize_app_name
 
 class DiscordToolkit:
@@ -17,8 +16,7 @@ class DiscordToolkit:
         def discord_open() -> str:
             """Opens the Discord application."""
             try:
-                subprocess.run(['open', '-a', 'Discord'], check=True)
-                time.sleep(2)
+                input_actor.run(open_app('Discord'))
                 return "Opened Discord"
             except Exception as e:
                 return f"Error opening Discord: {str(e)}"
@@ -27,7 +25,7 @@ class DiscordToolkit:
         def discord_close() -> str:
             """Closes the Discord application."""
             try:
-                subprocess.run(['osascript', '-e', 'quit app "Discord"'], check=True)
+                run_process(['osascript', '-e', 'quit app "Discord"'], check=True)
                 return "Closed Discord"
             except Exception as e:
                 return f"Error closing Discord: {str(e)}"
@@ -37,7 +35,7 @@ class DiscordToolkit:
             """Toggles microphone mute/unmute in Discord."""
             try:
                 # Discord keyboard shortcut: Cmd+Shift+M
-                pyautogui.hotkey('command', 'shift', 'm')
+                input_actor.run(hotkey('command', 'shift', 'm'))
                 return "Toggled Discord microphone mute"
             except Exception as e:
                 return f"Error toggling mute: {str(e)}"
@@ -47,7 +45,7 @@ class DiscordToolkit:
             """Toggles deafen on/off in Discord."""
             try:
                 # Discord keyboard shortcut: Cmd+Shift+D
-                pyautogui.hotkey('command', 'shift', 'd')
+                input_actor.run(hotkey('command', 'shift', 'd'))
                 return "Toggled Discord deafen"
             except Exception as e:
                 return f"Error toggling deafen: {str(e)}"
@@ -57,7 +55,7 @@ class DiscordToolkit:
             """Answers an incoming Discord call."""
             try:
                 # Discord keyboard shortcut: Cmd+Enter (when call notification is visible)
-                pyautogui.hotkey('command', 'return')
+                input_actor.run(hotkey('command', 'return'))
                 return "Answered Discord call"
             except Exception as e:
                 return f"Error answering call: {str(e)}"
@@ -67,7 +65,7 @@ class DiscordToolkit:
             """Declines an incoming Discord call."""
             try:
                 # Discord keyboard shortcut: Escape
-                pyautogui.press('escape')
+                input_actor.run(press('escape'))
                 return "Declined Discord call"
             except Exception as e:
                 return f"Error declining call: {str(e)}"
@@ -77,11 +75,8 @@ class DiscordToolkit:
             """Opens Discord search (Cmd+K)."""
             try:
                 # First, activate Discord
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+K
-                pyautogui.hotkey('command', 'k')
+                input_actor.run(activate("Discord"), hotkey('command', 'k'))
                 return "Opened Discord search"
             except Exception as e:
                 return f"Error opening search: {str(e)}"
@@ -99,11 +94,8 @@ class DiscordToolkit:
                     return "Server number must be between 1 and 9"
                 
                 # Activate Discord first
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+Number
-                pyautogui.hotkey('command', str(server_number))
+                input_actor.run(activate("Discord"), hotkey('command', str(server_number)))
                 return f"Navigated to server #{server_number}"
             except Exception as e:
                 return f"Error navigating to server: {str(e)}"
@@ -112,11 +104,8 @@ class DiscordToolkit:
         def discord_toggle_pins() -> str:
             """Toggles the pinned messages panel."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+P
-                pyautogui.hotkey('command', 'p')
+                input_actor.run(activate("Discord"), hotkey('command', 'p'))
                 return "Toggled Discord pins panel"
             except Exception as e:
                 return f"Error toggling pins: {str(e)}"
@@ -125,11 +114,8 @@ class DiscordToolkit:
         def discord_toggle_inbox() -> str:
             """Toggles the inbox (notifications) panel."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+I
-                pyautogui.hotkey('command', 'i')
+                input_actor.run(activate("Discord"), hotkey('command', 'i'))
                 return "Toggled Discord inbox"
             except Exception as e:
                 return f"Error toggling inbox: {str(e)}"
@@ -138,11 +124,8 @@ class DiscordToolkit:
         def discord_mark_server_read() -> str:
             """Marks the current server as read."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Shift+Escape
-                pyautogui.hotkey('shift', 'escape')
+                input_actor.run(activate("Discord"), hotkey('shift', 'escape'))
                 return "Marked current server as read"
             except Exception as e:
                 return f"Error marking as read: {str(e)}"
@@ -151,11 +134,8 @@ class DiscordToolkit:
         def discord_mark_channel_read() -> str:
             """Marks the current channel as read."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Escape
-                pyautogui.press('escape')
+                input_actor.run(activate("Discord"), press('escape'))
                 return "Marked current channel as read"
             except Exception as e:
                 return f"Error marking channel as read: {str(e)}"
@@ -164,11 +144,8 @@ class DiscordToolkit:
         def discord_upload_file() -> str:
             """Opens the file upload dialog."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+Shift+U
-                pyautogui.hotkey('command', 'shift', 'u')
+                input_actor.run(activate("Discord"), hotkey('command', 'shift', 'u'))
                 return "Opened file upload dialog"
             except Exception as e:
                 return f"Error opening upload dialog: {str(e)}"
@@ -177,11 +154,8 @@ class DiscordToolkit:
         def discord_create_dm() -> str:
             """Opens dialog to create a new DM or group DM."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+K, then type username
-                pyautogui.hotkey('command', 'k')
+                input_actor.run(activate("Discord"), hotkey('command', 'k'))
                 return "Opened DM creation (search for a user to message)"
             except Exception as e:
                 return f"Error creating DM: {str(e)}"
@@ -190,10 +164,7 @@ class DiscordToolkit:
         def discord_scroll_chat_up() -> str:
             """Scrolls up in the current chat."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
-                pyautogui.press('pageup')
+                input_actor.run(activate("Discord"), press('pageup'))
                 return "Scrolled chat up"
             except Exception as e:
                 return f"Error scrolling: {str(e)}"
@@ -202,10 +173,7 @@ class DiscordToolkit:
         def discord_scroll_chat_down() -> str:
             """Scrolls down in the current chat."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
-                pyautogui.press('pagedown')
+                input_actor.run(activate("Discord"), press('pagedown'))
                 return "Scrolled chat down"
             except Exception as e:
                 return f"Error scrolling: {str(e)}"
@@ -214,11 +182,8 @@ class DiscordToolkit:
         def discord_focus_text_input() -> str:
             """Focuses the message text input field."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Click in the text area or use Tab to navigate
-                pyautogui.press('tab')
+                input_actor.run(activate("Discord"), press('tab'))
                 return "Focused text input"
             except Exception as e:
                 return f"Error focusing input: {str(e)}"
@@ -233,20 +198,18 @@ class DiscordToolkit:
                 message: The message text to send
             """
             try:
-                # Activate Discord
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
-                # Focus text input
-                pyautogui.press('tab')
-                time.sleep(0.3)
-                
-                # Type the message
-                pyautogui.write(message, interval=0.02)
-                time.sleep(0.2)
-                
-                # Send with Enter
-                pyautogui.press('return')
+                # One script, so nothing else can type between focusing and sending
+                input_actor.run(
+                    activate("Discord"),
+                    # Focus text input
+                    press('tab'),
+                    wait(0.3),
+                    # Type short messages, paste long or non-ASCII ones
+                    write(message, interval=0.02),
+                    wait(0.2),
+                    # Send with Enter
+                    press('return'),
+                )
                 
                 return f"Sent message: {message}"
             except Exception as e:
@@ -256,11 +219,8 @@ class DiscordToolkit:
         def discord_toggle_emoji_picker() -> str:
             """Opens the emoji picker."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Cmd+E
-                pyautogui.hotkey('command', 'e')
+                input_actor.run(activate("Discord"), hotkey('command', 'e'))
                 return "Opened emoji picker"
             except Exception as e:
                 return f"Error opening emoji picker: {str(e)}"
@@ -269,18 +229,16 @@ class DiscordToolkit:
         def discord_navigate_to_dms() -> str:
             """Navigates to the DMs/Home section (leaves any server)."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
-                # Use Cmd+K to open quick switcher, then go home
-                pyautogui.hotkey('command', 'k')
-                time.sleep(0.3)
-                
-                # Type "home" or "friends" to navigate to DM section
-                pyautogui.write('home', interval=0.05)
-                time.sleep(0.3)
-                
-                pyautogui.press('return')
+                input_actor.run(
+                    activate("Discord"),
+                    # Use Cmd+K to open quick switcher, then go home
+                    hotkey('command', 'k'),
+                    wait(0.3),
+                    # Type "home" or "friends" to navigate to DM section
+                    write('home', interval=0.05),
+                    wait(0.3),
+                    press('return'),
+                )
                 return "Navigated to DMs/Home"
             except Exception as e:
                 return f"Error navigating to DMs: {str(e)}"
@@ -289,11 +247,8 @@ class DiscordToolkit:
         def discord_next_channel() -> str:
             """Moves to the next channel or DM in the list."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Alt+Down Arrow (macOS: Option+Down)
-                pyautogui.hotkey('alt', 'down')
+                input_actor.run(activate("Discord"), hotkey('alt', 'down'))
                 return "Moved to next channel/DM"
             except Exception as e:
                 return f"Error navigating: {str(e)}"
@@ -302,11 +257,8 @@ class DiscordToolkit:
         def discord_previous_channel() -> str:
             """Moves to the previous channel or DM in the list."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Alt+Up Arrow (macOS: Option+Up)
-                pyautogui.hotkey('alt', 'up')
+                input_actor.run(activate("Discord"), hotkey('alt', 'up'))
                 return "Moved to previous channel/DM"
             except Exception as e:
                 return f"Error navigating: {str(e)}"
@@ -315,11 +267,8 @@ class DiscordToolkit:
         def discord_next_unread_channel() -> str:
             """Jumps to the next unread channel or DM."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Alt+Shift+Down (macOS: Option+Shift+Down)
-                pyautogui.hotkey('alt', 'shift', 'down')
+                input_actor.run(activate("Discord"), hotkey('alt', 'shift', 'down'))
                 return "Jumped to next unread channel/DM"
             except Exception as e:
                 return f"Error navigating: {str(e)}"
@@ -328,11 +277,8 @@ class DiscordToolkit:
         def discord_previous_unread_channel() -> str:
             """Jumps to the previous unread channel or DM."""
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Discord keyboard shortcut: Alt+Shift+Up (macOS: Option+Shift+Up)
-                pyautogui.hotkey('alt', 'shift', 'up')
+                input_actor.run(activate("Discord"), hotkey('alt', 'shift', 'up'))
                 return "Jumped to previous unread channel/DM"
             except Exception as e:
                 return f"Error navigating: {str(e)}"
@@ -346,19 +292,17 @@ class DiscordToolkit:
                 username: Discord username to search for
             """
             try:
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
-                # Open quick switcher (Cmd+K)
-                pyautogui.hotkey('command', 'k')
-                time.sleep(0.5)
-                
-                # Type the username
-                pyautogui.write(username, interval=0.05)
-                time.sleep(0.5)
-                
-                # Press Enter to select first result
-                pyautogui.press('return')
+                input_actor.run(
+                    activate("Discord"),
+                    # Open quick switcher (Cmd+K)
+                    hotkey('command', 'k'),
+                    wait(0.5),
+                    # Type the username
+                    write(username, interval=0.05),
+                    wait(0.5),
+                    # Press Enter to select first result
+                    press('return'),
+                )
                 
                 return f"Searched for DM with: {username}"
             except Exception as e:
@@ -378,9 +322,6 @@ class DiscordToolkit:
                 if not 1 <= position <= 10:
                     return "Position must be between 1 and 10"
                 
-                subprocess.run(['osascript', '-e', 'tell application "Discord" to activate'])
-                time.sleep(0.5)
-                
                 # Click on the left sidebar where DMs are
                 # These are approximate coordinates - may need adjustment
                 base_y = 150  # Starting Y position for first DM
@@ -389,7 +330,7 @@ class DiscordToolkit:
                 
                 click_y = base_y + (dm_height * (position - 1))
                 
-                pyautogui.click(click_x, click_y)
+                input_actor.run(activate("Discord"), click(click_x, click_y))
                 
                 return f"Clicked DM at position {position}"
             except Exception as e:
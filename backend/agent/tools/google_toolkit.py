@@ -1,11 +1,10 @@
-import subprocess
 import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
-import pyautogui
-import pyperclip
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from ..utils.cancellation import run_process
+from ..utils.input_actor import hotkey, input_actor, open_app, press, read_clipboard, wait
 from ..utils.mapping import normalize_app_name
 
 class GoogleToolkit:
@@ -19,7 +18,7 @@ class GoogleToolkit:
         def open_gmail_inbox() -> str:
             """Opens Gmail inbox in default browser."""
             try:
-                subprocess.run(['open', 'https://mail.google.com/mail/u/0/#inbox'], check=True)
+                run_process(['open', 'https://mail.google.com/mail/u/0/#inbox'], check=True)
                 time.sleep(2)
                 return "📧 Gmail inbox opened in browser."
             except Exception as e:
@@ -33,10 +32,12 @@ class GoogleToolkit:
             Requires Gmail keyboard shortcuts enabled.
             """
             try:
-                pyautogui.press('j')  # move to next email
-                time.sleep(0.5)
-                pyautogui.press('o') 
-                time.sleep(1)
+                input_actor.run(
+                    press('j'),  # move to next email
+                    wait(0.5),
+                    press('o'),
+                    wait(1),
+                )
                 return "📧 Opened next email."
             except Exception as e:
                 return f"Error opening next email: {e}"
@@ -48,17 +49,16 @@ class GoogleToolkit:
             Requires Gmail keyboard shortcuts enabled and the email window focused.
             """
             try:
-                # Assume Gmail tab is open and focused
-                time.sleep(0.3)
-
-                # Select and copy all text
-                pyautogui.hotkey('command', 'a')
-                time.sleep(0.1)
-                pyautogui.hotkey('command', 'c')
-                time.sleep(0.3)
-
-                # Read from clipboard
-                email_text = pyperclip.paste().strip()
+                # Assume Gmail tab is open and focused; select and copy all text, then read it back
+                *_, copied = input_actor.run(
+                    wait(0.3),
+                    hotkey('command', 'a'),
+                    wait(0.1),
+                    hotkey('command', 'c'),
+                    wait(0.3),
+                    read_clipboard(),
+                )
+                email_text = copied.strip()
                 if not email_text:
                     return "⚠️ No text detected — make sure the email is open and focused."
 
@@ -76,10 +76,12 @@ class GoogleToolkit:
         def open_previous_email() -> str:
             """Moves to the previous email using the 'k' key and opens it."""
             try:
-                pyautogui.press('k')  # move to previous email
-                time.sleep(0.5)
-                pyautogui.press('o') 
-                time.sleep(1)
+                input_actor.run(
+                    press('k'),  # move to previous email
+                    wait(0.5),
+                    press('o'),
+                    wait(1),
+                )
                 return "📧 Opened previous email."
             except Exception as e:
                 return f"Error opening previous email: {e}"
@@ -92,9 +94,12 @@ class GoogleToolkit:
             """
             try:
                 presentation_url = "https://docs.google.com/presentation/d/18Bd9ROTpzLLJeCns--3JipkxseVCfAcGzT-so6E2TAQ/edit?usp=sharing"
-                subprocess.run(['open', '-a', 'Google Chrome', presentation_url], check=True)
-                time.sleep(3)
-                pyautogui.hotkey('command', 'enter')
+                input_actor.run(
+                    open_app('Google Chrome', presentation_url),
+                    # Give the deck time to load before presenting
+                    wait(3),
+                    hotkey('command', 'enter'),
+                )
                 return f"📊 Opened Google Slides presentation."
             except Exception as e:
                 return f"Error opening Google Slides presentation: {str(e)}"
@@ -104,9 +109,7 @@ class GoogleToolkit:
             Click the next slide if in Google Slides presentation already
             """
             try:
-                time.sleep(0.5)
-                pyautogui.press('right')
-                time.sleep(0.5)
+                input_actor.run(wait(0.5), press('right'), wait(0.5))
                 return f"📊 Moved to next slide."
             except Exception as e:
                 return f"Error moving to next slide in the presentation: {str(e)}"
@@ -1,9 +1,11 @@
 import logging
-import subprocess
 import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
 
+from ..utils.app_state import app_state
+from ..utils.cancellation import run_process
+
 class SpotifyToolkit:
     """Toolkit for Spotify music control."""
     
@@ -12,7 +14,7 @@ class SpotifyToolkit:
         """Helper function to get current Spotify track information."""
         try:
             applescript_track = 'tell application "Spotify" to name of current track'
-            track_result = subprocess.run(
+            track_result = run_process(
                 ['osascript', '-e', applescript_track],
                 capture_output=True,
                 text=True,
@@ -21,7 +23,7 @@ class SpotifyToolkit:
             track_name = track_result.stdout.strip()
             
             applescript_artist = 'tell application "Spotify" to artist of current track'
-            artist_result = subprocess.run(
+            artist_result = run_process(
                 ['osascript', '-e', applescript_artist],
                 capture_output=True,
                 text=True,
@@ -47,8 +49,7 @@ class SpotifyToolkit:
             """
             logging.info("calling play spotify track tool")
             try:
-                subprocess.run(['open', '-a', 'Spotify'], check=True)
-                time.sleep(1.5)
+                app_state.ensure_running('Spotify', 1.5)
                 
                 applescript = f'''
                 tell application "Spotify"
@@ -57,7 +58,7 @@ class SpotifyToolkit:
                 end tell
                 '''
                 
-                subprocess.run(['osascript', '-e', applescript], capture_output=True, text=True)
+                run_process(['osascript', '-e', applescript], capture_output=True, text=True)
                 time.sleep(2)
                 
                 track_info = SpotifyToolkit._get_current_track()
@@ -76,14 +77,13 @@ class SpotifyToolkit:
             """
             logging.info("calling spotify search tool")
             try:
-                subprocess.run(['open', '-a', 'Spotify'], check=True)
-                time.sleep(2)
+                app_state.ensure_running('Spotify', 2)
                 
                 import urllib.parse
                 encoded_query = urllib.parse.quote(query)
                 search_url = f"spotify:search:{encoded_query}"
                 
-                subprocess.run(['open', search_url], check=True)
+                run_process(['open', search_url], check=True)
                 time.sleep(1)
                 
                 return f"🔍 Opened Spotify and searched for: {query}"
@@ -96,7 +96,7 @@ class SpotifyToolkit:
             logging.info("calling spotify play track tool")
             try:
                 applescript = 'tell application "Spotify" to play'
-                subprocess.run(['osascript', '-e', applescript], check=True)
+                run_process(['osascript', '-e', applescript], check=True)
                 
                 track_info = SpotifyToolkit._get_current_track()
                 return f"▶️ Playing: {track_info}"
@@ -109,7 +109,7 @@ class SpotifyToolkit:
             logging.info("calling spotify pause track tool")
             try:
                 applescript = 'tell application "Spotify" to pause'
-                subprocess.run(['osascript', '-e', applescript], check=True)
+                run_process(['osascript', '-e', applescript], check=True)
                 
                 track_info = SpotifyToolkit._get_current_track()
                 return f"⏸️ Paused: {track_info}"
@@ -122,7 +122,7 @@ class SpotifyToolkit:
             logging.info("calling spotify skip track tool")
             try:
                 applescript = 'tell application "Spotify" to next track'
-                subprocess.run(['osascript', '-e', applescript], check=True)
+                run_process(['osascript', '-e', applescript], check=True)
                 time.sleep(0.5)
                 
                 track_info = SpotifyToolkit._get_current_track()
@@ -136,7 +136,7 @@ class SpotifyToolkit:
             logging.info("calling spotify previous track tool")
             try:
                 applescript = 'tell application "Spotify" to previous track'
-                subprocess.run(['osascript', '-e', applescript], check=True)
+                run_process(['osascript', '-e', applescript], check=True)
                 time.sleep(0.5)
                 
                 track_info = SpotifyToolkit._get_current_track()
@@ -166,7 +166,7 @@ class SpotifyToolkit:
             try:
                 volume = max(0, min(100, volume))
                 applescript = f'tell application "Spotify" to set sound volume to {volume}'
-                subprocess.run(['osascript', '-e', applescript], check=True)
+                run_process(['osascript', '-e', applescript], check=True)
                 return f"🔊 Set Spotify volume to {volume}%"
             except Exception as e:
                 return f"Error setting Spotify volume: {str(e)}"
@@ -184,11 +184,10 @@ class SpotifyToolkit:
                 import urllib.parse
                 encoded_name = urllib.parse.quote(playlist_name)
                 
-                subprocess.run(['open', '-a', 'Spotify'], check=True)
-                time.sleep(1)
+                app_state.ensure_running('Spotify', 1)
                 
                 search_url = f"spotify:search:playlist:{encoded_name}"
-                subprocess.run(['open', search_url], check=True)
+                run_process(['open', search_url], check=True)
                 
                 return f"🎵 Searching for playlist: {playlist_name}"
             except Exception as e:
@@ -1,9 +1,12 @@
 import logging
-import subprocess
-import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
 
+from ..utils.app_state import app_state
+from ..utils.cancellation import run_process
+from ..utils.input_actor import input_actor
+from ..utils.mapping import normalize_app_name
+
 class SystemControlToolkit:
     """Toolkit for macOS system and application control."""
     
@@ -21,14 +24,22 @@ class SystemControlToolkit:
             """
             logging.info("calling open macos app tool")
             try:
-                result = subprocess.run(
+                # 'chrome', 'visual studio' -> the name open -a knows
+                app_name = normalize_app_name(app_name)
+                # Only a fresh answer: a polled AppState can be a second behind
+                front = input_actor.fresh_frontmost_app()
+                if front is not None and front.casefold() == app_name.casefold():
+                    # Already open and in front: nothing to launch or wait for
+                    return f"Successfully opened {app_name}"
+                result = run_process(
                     ['open', '-a', app_name],
                     capture_output=True,
                     text=True,
                     timeout=5
                 )
                 if result.returncode == 0:
-                    time.sleep(1)
+                    # Returns as soon as it's in front; a fixed 1s if app state isn't tracked
+                    app_state.wait_until_frontmost(app_name, 1)
                     return f"Successfully opened {app_name}"
                 else:
                     return f"Failed to open {app_name}. Error: {result.stderr}"
@@ -45,7 +56,9 @@ class SystemControlToolkit:
             """
             logging.info("calling close macos app tool")
             try:
-                subprocess.run(['osascript', '-e', f'quit app "{app_name}"'], check=True)
+                # Exact names and aliases only: a near miss would quit some other app
+                app_name = normalize_app_name(app_name, fuzzy=False)
+                run_process(['osascript', '-e', f'quit app "{app_name}"'], check=True)
                 return f"Successfully closed {app_name}"
             except Exception as e:
                 return f"Error closing {app_name}: {str(e)}"
@@ -61,7 +74,7 @@ class SystemControlToolkit:
             logging.info("calling set volume tool")
             try:
                 level = max(0, min(100, level))
-                subprocess.run(['osascript', '-e', f'set volume output volume {level}'], check=True)
+                run_process(['osascript', '-e', f'set volume output volume {level}'], check=True)
                 return f"Volume set to {level}%"
             except Exception as e:
                 return f"Error setting volume: {str(e)}"
@@ -76,7 +89,7 @@ class SystemControlToolkit:
             """
             logging.info("calling adjust volume tool")
             try:
-                result = subprocess.run(
+                result = run_process(
                     ['osascript', '-e', 'output volume of (get volume settings)'],
                     capture_output=True,
                     text=True,
@@ -85,7 +98,7 @@ class SystemControlToolkit:
                 current = int(result.stdout.strip())
                 new_level = max(0, min(100, current + change))
                 
-                subprocess.run(['osascript', '-e', f'set volume output volume {new_level}'], check=True)
+                run_process(['osascript', '-e', f'set volume output volume {new_level}'], check=True)
                 return f"Volume adjusted from {current}% to {new_level}%"
             except Exception as e:
                 return f"Error adjusting volume: {str(e)}"
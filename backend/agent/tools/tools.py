@@ -1,32 +1,174 @@
+import ast
+import asyncio
+import copy
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
+import typing
+from typing import Any, Dict, List, Optional
+
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool
-from typing import List
-
-from .system_toolkit import SystemControlToolkit
-from .browser_toolkit import BrowserToolkit
-from .spotify_toolkit import SpotifyToolkit
-from .youtube_toolkit import YouTubeToolkit
-from .discord_toolkit import DiscordToolkit
-from .cool_toolkit import CoolToolkit
-from .camera_toolkit import CameraToolkit
-from .rag import RagTool
-from .tauri_toolkit import TauriControlToolkit
-from .google_toolkit import GoogleToolkit
+from langchain_core.tools import tool as create_tool
+
+logger = logging.getLogger("uvicorn")
+
+# Toolkit name -> (module, class, method returning its tools). Modules are
+# only imported when one of their tools first runs (or by preload_toolkits).
+TOOLKITS = {
+    "system": ("system_toolkit", "SystemControlToolkit", "get_tools"),
+    "browser": ("browser_toolkit", "BrowserToolkit", "get_tools"),
+    "spotify": ("spotify_toolkit", "SpotifyToolkit", "get_tools"),
+    "youtube": ("youtube_toolkit", "YouTubeToolkit", "get_tools"),
+    "discord": ("discord_toolkit", "DiscordToolkit", "get_tools"),
+    "cool": ("cool_toolkit", "CoolToolkit", "get_tools"),
+    "rag": ("rag", "RagTool", "get_tool"),
+    "tauri": ("tauri_toolkit", "TauriControlToolkit", "get_tools"),
+    "camera": ("camera_toolkit", "CameraToolkit", "get_tools"),
+    "google": ("google_toolkit", "GoogleToolkit", "get_tools"),
+}
+
+
+class LazyToolkit:
+    """One toolkit's real tools, imported and built on first use."""
+
+    def __init__(self, name: str, module: str, cls: str, method: str):
+        self.name = name
+        self.module, self.cls, self.method = module, cls, method
+        self._tools: Optional[Dict[str, BaseTool]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tools is not None
+
+    def load(self) -> Dict[str, BaseTool]:
+        if self._tools is None:
+            with self._lock:
+                if self._tools is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(f"{__package__}.{self.module}")
+                    tools = getattr(getattr(module, self.cls), self.method)()
+                    # Plain functions are wrapped the same way ToolNode does
+                    tools = [t if isinstance(t, BaseTool) else create_tool(t) for t in tools]
+                    self._tools = {t.name: t for t in tools}
+                    logger.info(f"Loaded {self.name} toolkit in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return self._tools
+
+    def describe(self) -> List[BaseTool]:
+        """
+        Tool stubs built from the module's source, without importing it: each
+        tool function is re-declared with its signature and docstring but no
+        body, so @tool derives exactly the schema the real one has.
+        """
+        path = os.path.join(os.path.dirname(__file__), f"{self.module}.py")
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        cls = next(n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == self.cls)
+        members = {n.name: n for n in cls.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        method = members[self.method]
+        nested = {n.name: n for n in method.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        returned = next(n.value for n in reversed(method.body) if isinstance(n, ast.Return))
+
+        stubs = []
+        for element in returned.elts:
+            if isinstance(element, ast.Name):
+                node = nested[element.id]
+            elif isinstance(element, ast.Attribute):
+                node = members[element.attr]
+            else:
+                raise ValueError(f"Can't tell which tool {ast.unparse(element)} is")
+            for decorator in node.decorator_list:
+                if ast.unparse(decorator) not in ("tool", "staticmethod"):
+                    raise ValueError(f"Unsupported decorator @{ast.unparse(decorator)} on {node.name}")
+            stub = copy.copy(node)
+            stub.decorator_list = []
+            stub.body = [node.body[0]] if ast.get_docstring(node) is not None else [ast.Expr(ast.Constant(...))]
+            namespace = dict(vars(typing))
+            exec(compile(ast.fix_missing_locations(ast.Module(body=[stub], type_ignores=[])), path, "exec"), namespace)
+            stubs.append(create_tool(namespace[node.name]))
+        return stubs
+
+
+class LazyTool(BaseTool):
+    """
+    A tool with its real name, description and schema, whose implementation
+    is only imported (with its toolkit) the first time it runs.
+    """
+    toolkit: LazyToolkit
+
+    # Every prompt build converts the schema; derive it once
+    @functools.cached_property
+    def tool_call_schema(self):
+        return super().tool_call_schema
+
+    @property
+    def target(self) -> BaseTool:
+        return self.toolkit.load()[self.name]
+
+    def _run(self, *args, config: RunnableConfig, run_manager=None, **kwargs) -> Any:
+        return self.target._run(*args, config=config, run_manager=run_manager, **kwargs)
+
+    async def _arun(self, *args, config: RunnableConfig, run_manager=None, **kwargs) -> Any:
+        if not self.toolkit.loaded:
+            # Keep a first-use import off the event loop
+            await asyncio.to_thread(self.toolkit.load)
+        return await self.target._arun(*args, config=config, run_manager=run_manager, **kwargs)
+
+
+_toolkits: Dict[str, LazyToolkit] = {
+    name: LazyToolkit(name, *spec) for name, spec in TOOLKITS.items()
+}
+
+
+def lazy_tools(toolkit: LazyToolkit) -> List[BaseTool]:
+    try:
+        stubs = toolkit.describe()
+    except Exception as e:
+        logger.warning(f"Can't describe {toolkit.name} toolkit without importing it: {e!r}")
+        return list(toolkit.load().values())
+    return [
+        LazyTool(name=s.name, description=s.description, args_schema=s.args_schema, toolkit=toolkit)
+        for s in stubs
+    ]
+
+
+# Tools grouped by toolkit, e.g. so a turn can bind just the ones it needs
+def get_toolkits() -> Dict[str, List[BaseTool]]:
+    """
+    Returns every toolkit's tools, keyed by toolkit name. With
+    TOOL_LOADING=eager they're the real tools; by default they are
+    LazyTools that import their module on first call.
+    """
+    if os.getenv("TOOL_LOADING", "lazy") == "eager":
+        return {name: list(toolkit.load().values()) for name, toolkit in _toolkits.items()}
+    return {name: lazy_tools(toolkit) for name, toolkit in _toolkits.items()}
 
 # Get all tools from all toolkits
 def get_all_tools() -> List[BaseTool]:
     """Returns all tools from all toolkits."""
-    return (
-        SystemControlToolkit.get_tools() +
-        BrowserToolkit.get_tools() +
-        SpotifyToolkit.get_tools() +
-        YouTubeToolkit.get_tools() +
-        DiscordToolkit.get_tools() +
-        CoolToolkit.get_tools() + 
-        RagTool.get_tool() +
-        TauriControlToolkit.get_tools() +
-        CameraToolkit.get_tools() +
-        GoogleToolkit.get_tools()
-    )
+    return [tool for toolkit in get_toolkits().values() for tool in toolkit]
+
+
+def load_toolkit(name: str) -> bool:
+    """Imports one toolkit now if it isn't yet; returns whether it had to."""
+    toolkit = _toolkits[name]
+    if toolkit.loaded:
+        return False
+    toolkit.load()
+    return True
+
+
+def preload_toolkits():
+    """Imports every toolkit now, e.g. from a background thread after startup."""
+    for name, toolkit in _toolkits.items():
+        try:
+            toolkit.load()
+        except Exception as e:
+            logger.error(f"Failed to load {name} toolkit: {e!r}")
 
 # # Or get specific toolkits
 # def get_media_tools() -> List[BaseTool]:
@@ -39,4 +181,5 @@ def get_all_tools() -> List[BaseTool]:
 
 
 # Main tools list for your agent
-tools = get_all_tools()
\ No newline at end of file
+toolkits = get_toolkits()
+tools = [tool for toolkit in toolkits.values() for tool in toolkit]
@@ -1,62 +1,32 @@
-import subprocess
-import time
 from typing import List
 from langchain_core.tools import tool, BaseTool
 import urllib.parse
 
+from ..utils.browser_bridge import BridgeError, get_browser_bridge
+from ..utils.cancellation import run_process
 from ..utils.mapping import normalize_app_name
 
 class YouTubeToolkit:
-    """Toolkit for YouTube video control using AppleScript and JavaScript."""
+    """Toolkit for YouTube video control through the browser bridge (DevTools or AppleScript)."""
     
+    # youtube_control_playback action -> controller method and arguments
+    PLAYBACK_ACTIONS = {
+        'play_pause': ('play_pause',),
+        'next': ('next',),
+        'previous': ('previous',),
+        'fullscreen': ('fullscreen',),
+        'mute': ('mute',),
+        'increase_volume': ('volume', 0.1),
+        'decrease_volume': ('volume', -0.1),
+        'skip_forward': ('seek', 10),
+        'skip_backward': ('seek', -10),
+    }
+
     @staticmethod
-    def _execute_js_in_browser(js_code: str, browser: str) -> str:
-        """Execute JavaScript in the active browser tab using AppleScript."""
-        actual_browser = normalize_app_name(browser)
-        
-        # Escape quotes in JavaScript code
-        js_escaped = js_code.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
-        
-        # Different AppleScript syntax for different browsers
-        if actual_browser in ["Google Chrome", "Brave Browser", "Microsoft Edge"]:
-            applescript = f'''
-            tell application "{actual_browser}"
-                tell active tab of window 1
-                    execute javascript "{js_escaped}"
-                end tell
-            end tell
-            '''
-        elif actual_browser == "Safari":
-            applescript = f'''
-            tell application "Safari"
-                tell current tab of window 1
-                    do JavaScript "{js_escaped}"
-                end tell
-            end tell
-            '''
-        elif actual_browser == "Arc":
-            # Arc uses Chrome-like AppleScript
-            applescript = f'''
-            tell application "Arc"
-                tell active tab of window 1
-                    execute javascript "{js_escaped}"
-                end tell
-            end tell
-            '''
-        else:
-            return "Browser not supported for JavaScript execution"
-        
-        try:
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.stdout.strip() if result.returncode == 0 else result.stderr
-        except Exception as e:
-            return str(e)
-    
+    def _bridge(browser: str):
+        """The browser's JavaScript bridge, or None if it can't run scripts."""
+        return get_browser_bridge(normalize_app_name(browser))
+
     @staticmethod
     def get_tools() -> List[BaseTool]:
         """Returns all YouTube control tools."""
@@ -75,8 +45,15 @@ class YouTubeToolkit:
                 encoded_query = urllib.parse.quote(query)
                 search_url = f"https://www.youtube.com/results?search_query={encoded_query}"
                 
-                subprocess.run(['open', '-a', actual_browser, search_url], check=True)
-                time.sleep(2)
+                run_process(['open', '-a', actual_browser, search_url], check=True)
+
+                # Return once the results page is up, not after a fixed wait
+                bridge = YouTubeToolkit._bridge(actual_browser)
+                if bridge is not None:
+                    try:
+                        bridge.poll("status", url_hint=search_url)
+                    except BridgeError:
+                        pass
                 
                 return f"Opened YouTube search results for: {query}"
             except Exception as e:
@@ -97,29 +74,19 @@ class YouTubeToolkit:
                 search_url = f"https://www.youtube.com/results?search_query={encoded_query}"
                 
                 # Open search results
-                subprocess.run(['open', '-a', actual_browser, search_url], check=True)
-                time.sleep(3)  # Wait for page to load
-                
-                # JavaScript to click the first video
-                js_code = """
-                (function() {
-                    const videos = document.querySelectorAll('a#video-title');
-                    if (videos && videos.length > 0) {
-                        const title = videos[0].getAttribute('title') || 'video';
-                        videos[0].click();
-                        return title;
-                    }
-                    return 'No videos found';
-                })();
-                """
-                
-                result = YouTubeToolkit._execute_js_in_browser(js_code, actual_browser)
-                
-                if result and "No videos found" not in result:
+                run_process(['open', '-a', actual_browser, search_url], check=True)
+
+                # Click the first video as soon as the results render
+                bridge = YouTubeToolkit._bridge(actual_browser)
+                result = bridge.poll("play_first", "video", url_hint=search_url) if bridge else None
+
+                if result:
                     return f"Playing: {result}"
                 else:
                     return f"Opened YouTube search for: {query}. Click a video to play."
-                    
+
+            except BridgeError:
+                return f"Opened YouTube search for: {query}. Click a video to play."
             except Exception as e:
                 return f"Error playing video '{query}': {str(e)}"
         
@@ -133,27 +100,11 @@ class YouTubeToolkit:
                 browser: Browser to use (Chrome, Safari, Firefox, Arc, Brave, Edge)
             """
             try:
-                actual_browser = normalize_app_name(browser)
-                
-                # JavaScript to click YouTube's fullscreen button
-                fullscreen_js = """
-                (function() {
-                    const fullscreenBtn = document.querySelector('.ytp-fullscreen-button');
-                    if (fullscreenBtn) {
-                        fullscreenBtn.click();
-                        if (document.fullscreenElement) {
-                            return 'Exited fullscreen';
-                        } else {
-                            return 'Entered fullscreen';
-                        }
-                    }
-                    return 'Fullscreen button not found - make sure a video is playing';
-                })();
-                """
-                
-                result = YouTubeToolkit._execute_js_in_browser(fullscreen_js, actual_browser)
-                return result or "Toggled fullscreen"
-                    
+                bridge = YouTubeToolkit._bridge(browser)
+                if bridge is None:
+                    return "Browser not supported for JavaScript execution"
+                return bridge.call("fullscreen") or "Toggled fullscreen"
+
             except Exception as e:
                 return f"Error toggling fullscreen: {str(e)}"
 
@@ -175,7 +126,7 @@ class YouTubeToolkit:
                 encoded_channel = urllib.parse.quote(channel_name)
                 channel_url = f"https://www.youtube.com/{encoded_channel}"
                 
-                subprocess.run(['open', '-a', actual_browser, channel_url], check=True)
+                run_process(['open', '-a', actual_browser, channel_url], check=True)
                 
                 return f"Opened YouTube channel: {channel_name}"
             except Exception as e:
@@ -196,7 +147,7 @@ class YouTubeToolkit:
                 if not video_url.startswith('http'):
                     video_url = f"https://www.youtube.com/watch?v={video_url}"
                 
-                subprocess.run(['open', '-a', actual_browser, video_url], check=True)
+                run_process(['open', '-a', actual_browser, video_url], check=True)
                 
                 return f"Opened YouTube video"
             except Exception as e:
@@ -216,29 +167,18 @@ class YouTubeToolkit:
                 encoded_query = urllib.parse.quote(f"{playlist_name} playlist")
                 search_url = f"https://www.youtube.com/results?search_query={encoded_query}&sp=EgIQAw%253D%253D"
                 
-                subprocess.run(['open', '-a', actual_browser, search_url], check=True)
-                time.sleep(3)
-                
-                # JavaScript to click first playlist
-                js_code = """
-                (function() {
-                    const playlist = document.querySelector('ytd-playlist-renderer a');
-                    if (playlist) {
-                        const title = playlist.getAttribute('title') || 'playlist';
-                        playlist.click();
-                        return title;
-                    }
-                    return 'No playlist found';
-                })();
-                """
-                
-                result = YouTubeToolkit._execute_js_in_browser(js_code, actual_browser)
-                
-                if result and "No playlist found" not in result:
+                run_process(['open', '-a', actual_browser, search_url], check=True)
+
+                bridge = YouTubeToolkit._bridge(actual_browser)
+                result = bridge.poll("play_first", "playlist", url_hint=search_url) if bridge else None
+
+                if result:
                     return f"Opened playlist: {result}"
                 else:
                     return f"Searched for YouTube playlist: {playlist_name}"
-                    
+
+            except BridgeError:
+                return f"Searched for YouTube playlist: {playlist_name}"
             except Exception as e:
                 return f"Error searching for playlist: {str(e)}"
 
@@ -254,96 +194,43 @@ class YouTubeToolkit:
                 browser: Browser to use
             """
             try:
-                actual_browser = normalize_app_name(browser)
-                
-                # JavaScript commands for different actions
-                js_commands = {
-                    'play_pause': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            if (video.paused) {
-                                video.play();
-                                'Playing';
-                            } else {
-                                video.pause();
-                                'Paused';
-                            }
-                        }
-                    """,
-                    'mute': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            video.muted = !video.muted;
-                            video.muted ? 'Muted' : 'Unmuted';
-                        }
-                    """,
-                    'skip_forward': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            video.currentTime += 10;
-                            'Skipped forward 10s';
-                        }
-                    """,
-                    'skip_backward': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            video.currentTime -= 10;
-                            'Skipped backward 10s';
-                        }
-                    """,
-                    'increase_volume': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            video.volume = Math.min(1, video.volume + 0.1);
-                            'Volume increased';
-                        }
-                    """,
-                    'decrease_volume': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            video.volume = Math.max(0, video.volume - 0.1);
-                            'Volume decreased';
-                        }
-                    """,
-                    'next': """
-                        const nextBtn = document.querySelector('.ytp-next-button');
-                        if (nextBtn) {
-                            nextBtn.click();
-                            'Next video';
-                        }
-                    """,
-                    'previous': """
-                        const prevBtn = document.querySelector('.ytp-prev-button');
-                        if (prevBtn) {
-                            prevBtn.click();
-                            'Previous video';
-                        }
-                    """,
-                    'fullscreen': """
-                        const video = document.querySelector('video');
-                        if (video) {
-                            if (document.fullscreenElement) {
-                                document.exitFullscreen();
-                                'Exited fullscreen';
-                            } else {
-                                video.requestFullscreen();
-                                'Entered fullscreen';
-                            }
-                        }
-                    """,
-                }
-                
-                if action not in js_commands:
-                    available = ', '.join(js_commands.keys())
+                if action not in YouTubeToolkit.PLAYBACK_ACTIONS:
+                    available = ', '.join(YouTubeToolkit.PLAYBACK_ACTIONS.keys())
                     return f"Unknown action: {action}. Available: {available}"
-                
-                result = YouTubeToolkit._execute_js_in_browser(js_commands[action], actual_browser)
-                
+
+                bridge = YouTubeToolkit._bridge(browser)
+                if bridge is None:
+                    return "Browser not supported for JavaScript execution"
+                result = bridge.call(*YouTubeToolkit.PLAYBACK_ACTIONS[action])
+
                 return result or f"Executed: {action}"
-                
+
             except Exception as e:
                 return f"Error controlling playback: {str(e)}"
         
+        @tool
+        def youtube_status(browser: str) -> str:
+            """
+            Reports what the YouTube tab is showing: title, whether it's playing,
+            position and volume.
+
+            Args:
+                browser: Browser to use
+            """
+            try:
+                bridge = YouTubeToolkit._bridge(browser)
+                if bridge is None:
+                    return "Browser not supported for JavaScript execution"
+                status = bridge.call("status")
+                if not status or not status.get("video"):
+                    return f"No video playing on {status['title']}" if status else "No video playing"
+                state = "Paused" if status["paused"] else "Playing"
+                muted = ", muted" if status["muted"] else ""
+                return (f"{state}: {status['title']} at {status['time']:.0f}s of {status['duration']:.0f}s, "
+                        f"volume {status['volume'] * 100:.0f}%{muted}")
+            except Exception as e:
+                return f"Error reading YouTube status: {str(e)}"
+
         return [
             youtube_search,
             youtube_play_video,
@@ -352,4 +239,5 @@ class YouTubeToolkit:
             youtube_open_url,
             youtube_play_playlist,
             youtube_control_playback,
+            youtube_status,
         ]
\ No newline at end of file
@@ -0,0 +1,305 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from .cancellation import run_process
+
+logger = logging.getLogger("uvicorn")
+
+# Apps that come to front while the user talks to us rather than the app they're working in
+IGNORED_APPS = {"frontend", "python", "python3", "loginwindow"} | {
+    name.strip().casefold() for name in os.getenv("APP_STATE_IGNORE", "").split(",") if name.strip()
+}
+
+
+def _key(app: str) -> str:
+    return app.strip().casefold()
+
+
+class AppState:
+    """
+    Which apps are running and which is in front, kept current by a source
+    pushing changes (see default_source). Reads are dict lookups, so tools
+    can check before every `open -a` or activate. Until a source has
+    reported (`live`), queries answer None and callers fall back to their
+    fixed waits. A source whose `pushes` is true reports each change as it
+    happens; otherwise its answers are only as fresh as its last sample.
+    """
+    # How long a polling source keeps its fast rate after a request starts
+    ACTIVE_FOR = 30.0
+
+    def __init__(self):
+        self._running: Dict[str, str] = {}
+        self._frontmost: Optional[str] = None
+        # When a source last reported the frontmost app, changed or not
+        self._frontmost_at = 0.0
+        # Recent frontmost apps, newest last
+        self._history: Deque[str] = deque(maxlen=8)
+        self._changed = threading.Condition()
+        self.source = None
+        self.live = False
+        self._active_until = 0.0
+        self._stats = Counter()
+
+    # --- Updates, from the source or optimistically from our own actions ---
+
+    def set_running(self, apps: Iterable[str]):
+        with self._changed:
+            self._running = {_key(app): app for app in apps if app}
+            self.live = True
+            self._changed.notify_all()
+
+    def launched(self, app: str):
+        with self._changed:
+            self._running[_key(app)] = app
+            self._changed.notify_all()
+
+    def terminated(self, app: str):
+        with self._changed:
+            self._running.pop(_key(app), None)
+            if self._frontmost is not None and _key(self._frontmost) == _key(app):
+                self._frontmost = None
+            self._changed.notify_all()
+
+    def activated(self, app: str):
+        with self._changed:
+            self._running[_key(app)] = app
+            self._frontmost_at = time.monotonic()
+            if self._frontmost != app:
+                self._frontmost = app
+                self._history.append(app)
+            self._changed.notify_all()
+
+    def request_started(self):
+        """A request is being handled: a polling source samples now and keeps its fast rate for ACTIVE_FOR."""
+        self._active_until = time.monotonic() + AppState.ACTIVE_FOR
+        wake = getattr(self.source, "wake", None)
+        if wake is not None:
+            wake()
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() < self._active_until
+
+    # --- Queries ---
+
+    def is_running(self, app: str) -> Optional[bool]:
+        return _key(app) in self._running if self.live else None
+
+    def frontmost(self, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        The app in front; None if unknown or, given max_age, if a polling
+        source last sampled it longer ago than that. A pushing source's
+        answer is current however old it is.
+        """
+        if not self.live:
+            return None
+        if max_age is not None and not self.pushes and time.monotonic() - self._frontmost_at > max_age:
+            return None
+        return self._frontmost
+
+    @property
+    def pushes(self) -> bool:
+        return bool(getattr(self.source, "pushes", False))
+
+    def is_frontmost(self, app: str) -> Optional[bool]:
+        if not self.live:
+            return None
+        return self._frontmost is not None and _key(self._frontmost) == _key(app)
+
+    def current_app(self) -> str:
+        """The app the user was last working in, skipping our own window; '' if unknown."""
+        if not self.live:
+            return ""
+        return next((app for app in reversed(self._history) if _key(app) not in IGNORED_APPS), "")
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float) -> bool:
+        """Waits for a pushed change that makes predicate true; sleeps the timeout if nothing pushes."""
+        if not self.live:
+            time.sleep(timeout)
+            return False
+        with self._changed:
+            return self._changed.wait_for(predicate, timeout)
+
+    def wait_until_frontmost(self, app: str, timeout: float) -> bool:
+        return self.wait_for(lambda: self.is_frontmost(app), timeout)
+
+    def wait_until_running(self, app: str, timeout: float) -> bool:
+        return self.wait_for(lambda: self.is_running(app), timeout)
+
+    def ensure_running(self, app: str, settle: float) -> bool:
+        """
+        Launches app unless it's already running, waiting at most `settle`
+        for it to come up. Returns whether it had to be launched.
+        """
+        if self.is_running(app):
+            self._stats["launch_skipped"] += 1
+            return False
+        self._stats["launched"] += 1
+        run_process(['open', '-a', app], check=True)
+        self.wait_until_running(app, settle)
+        return True
+
+    # --- Lifecycle ---
+
+    def start(self, source=None):
+        """Starts tracking with `source`, by default the best one for this platform."""
+        if self.source is not None:
+            return
+        self.source = source or default_source()
+        logger.info(f"Tracking apps with {type(self.source).__name__}")
+        self.source.start(self)
+
+    def stop(self):
+        if self.source is not None:
+            self.source.stop()
+        self.source = None
+        self.live = False
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "source": type(self.source).__name__ if self.source else None,
+            "live": self.live,
+            "running": len(self._running),
+            "frontmost": self._frontmost,
+        }
+
+
+class WorkspaceSource:
+    """
+    macOS with pyobjc: NSWorkspace launch, terminate and activate
+    notifications, on a thread running its own run loop. A snapshot every
+    RECONCILE seconds corrects anything a missed notification left stale.
+    """
+    RECONCILE = 30.0
+    pushes = True
+
+    def __init__(self):
+        self._stop = threading.Event()
+
+    def start(self, state: AppState):
+        threading.Thread(target=self._run, args=(state,), name="app-state", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, state: AppState):
+        from AppKit import (NSApplicationActivationPolicyRegular, NSWorkspace, NSWorkspaceApplicationKey,
+                            NSWorkspaceDidActivateApplicationNotification, NSWorkspaceDidLaunchApplicationNotification,
+                            NSWorkspaceDidTerminateApplicationNotification)
+        from Foundation import NSDate, NSRunLoop
+
+        workspace = NSWorkspace.sharedWorkspace()
+        center = workspace.notificationCenter()
+
+        def observe(name, update):
+            def handler(notification):
+                app = notification.userInfo()[NSWorkspaceApplicationKey]
+                update(str(app.localizedName()))
+            return center.addObserverForName_object_queue_usingBlock_(name, None, None, handler)
+
+        observers = [
+            observe(NSWorkspaceDidLaunchApplicationNotification, state.launched),
+            observe(NSWorkspaceDidTerminateApplicationNotification, state.terminated),
+            observe(NSWorkspaceDidActivateApplicationNotification, state.activated),
+        ]
+        reconciled = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - reconciled > WorkspaceSource.RECONCILE:
+                reconciled = time.monotonic()
+                state.set_running(str(a.localizedName()) for a in workspace.runningApplications()
+                                  if a.activationPolicy() == NSApplicationActivationPolicyRegular)
+                front = workspace.frontmostApplication()
+                if front is not None:
+                    state.activated(str(front.localizedName()))
+            NSRunLoop.currentRunLoop().runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(1.0))
+        for observer in observers:
+            center.removeObserver_(observer)
+
+
+def osascript_probe() -> Tuple[Iterable[str], Optional[str]]:
+    """Running GUI apps and the frontmost one, from System Events (macOS without pyobjc)."""
+    script = '''
+    tell application "System Events"
+        set frontName to name of first application process whose frontmost is true
+        set appNames to name of every application process whose background only is false
+    end tell
+    set AppleScript's text item delimiters to linefeed
+    return frontName & linefeed & (appNames as text)
+    '''
+    result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True, timeout=2)
+    lines = [line for line in result.stdout.splitlines() if line]
+    return lines[1:], (lines[0] if lines else None)
+
+
+def proc_probe() -> Tuple[Iterable[str], Optional[str]]:
+    """Process names, and the focused window's process if xdotool is there (Linux stand-in)."""
+    running = subprocess.run(['ps', '-eo', 'comm='], capture_output=True, text=True, timeout=2).stdout.split()
+    front = None
+    try:
+        pid = subprocess.run(['xdotool', 'getactivewindow', 'getwindowpid'], capture_output=True, text=True, timeout=1).stdout.strip()
+        if pid:
+            front = subprocess.run(['ps', '-o', 'comm=', '-p', pid], capture_output=True, text=True, timeout=1).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return running, front
+
+
+class PollingSource:
+    """
+    Samples `probe` every `interval` seconds while requests are being
+    handled, else every `idle_interval`; for when notifications aren't
+    available. The System Events probe is an osascript, not worth running
+    every second while nobody is talking to us.
+    """
+    pushes = False
+
+    def __init__(self, probe: Callable[[], Tuple[Iterable[str], Optional[str]]], interval: float = 1.0,
+                 idle_interval: float = 15.0):
+        self.probe = probe
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self, state: AppState):
+        threading.Thread(target=self._run, args=(state,), name="app-state", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Samples now rather than at the next tick."""
+        self._wake.set()
+
+    def _run(self, state: AppState):
+        while not self._stop.is_set():
+            try:
+                running, front = self.probe()
+                state.set_running(running)
+                if front:
+                    state.activated(front)
+            except Exception as e:
+                logger.debug(f"App state probe failed: {e!r}")
+            self._wake.wait(self.interval if state.active else self.idle_interval)
+            self._wake.clear()
+
+
+def default_source():
+    if sys.platform == "darwin":
+        try:
+            import AppKit  # noqa: F401
+            return WorkspaceSource()
+        except ImportError:
+            return PollingSource(osascript_probe)
+    return PollingSource(proc_probe)
+
+
+app_state = AppState()
@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from .cancellation import run_process
+
+logger = logging.getLogger("uvicorn")
+
+# Installed once per page (and on every new document) so each command is a
+# single short call instead of a whole script. Methods return plain values.
+CONTROLLER_JS = r"""
+(() => {
+    if (window.__jarvis) return 'ready';
+    const video = () => document.querySelector('video');
+    const click = (selector) => {
+        const el = document.querySelector(selector);
+        if (el) el.click();
+        return Boolean(el);
+    };
+    window.__jarvis = {
+        status() {
+            const v = video();
+            const page = { title: document.title, url: location.href };
+            if (!v) return { ...page, video: false };
+            return { ...page, video: true, paused: v.paused, time: v.currentTime, duration: v.duration, volume: v.volume, muted: v.muted };
+        },
+        play_pause() {
+            const v = video();
+            if (!v) return 'No video found';
+            if (v.paused) { v.play(); return 'Playing'; }
+            v.pause();
+            return 'Paused';
+        },
+        seek(seconds, relative = true) {
+            const v = video();
+            if (!v) return 'No video found';
+            v.currentTime = relative ? v.currentTime + seconds : seconds;
+            if (!relative) return `Jumped to ${seconds}s`;
+            return `Skipped ${seconds >= 0 ? 'forward' : 'backward'} ${Math.abs(seconds)}s`;
+        },
+        volume(delta) {
+            const v = video();
+            if (!v) return 'No video found';
+            v.volume = Math.min(1, Math.max(0, v.volume + delta));
+            return delta >= 0 ? 'Volume increased' : 'Volume decreased';
+        },
+        mute() {
+            const v = video();
+            if (!v) return 'No video found';
+            v.muted = !v.muted;
+            return v.muted ? 'Muted' : 'Unmuted';
+        },
+        next() { return click('.ytp-next-button') ? 'Next video' : 'Next button not found'; },
+        previous() { return click('.ytp-prev-button') ? 'Previous video' : 'Previous button not found'; },
+        fullscreen() {
+            if (document.fullscreenElement) { document.exitFullscreen(); return 'Exited fullscreen'; }
+            if (click('.ytp-fullscreen-button')) return 'Entered fullscreen';
+            return 'Fullscreen button not found - make sure a video is playing';
+        },
+        play_first(kind) {
+            const el = document.querySelector(kind === 'playlist' ? 'ytd-playlist-renderer a' : 'a#video-title');
+            if (!el) return null;
+            const title = el.getAttribute('title') || kind;
+            el.click();
+            return title;
+        },
+    };
+    return 'installed';
+})()
+"""
+
+# What a call returns on a document the controller isn't installed in yet
+NOT_INSTALLED = "__jarvis: not installed"
+
+CHROMIUM_BROWSERS = {"Google Chrome", "Brave Browser", "Microsoft Edge", "Arc"}
+
+
+class BridgeError(Exception):
+    """The browser couldn't be reached or has no YouTube tab."""
+
+
+class BrowserBridge(ABC):
+    """Calls CONTROLLER_JS methods in the browser's YouTube tab."""
+    name = "bridge"
+
+    @abstractmethod
+    def call(self, method: str, *args, url_hint: Optional[str] = None):
+        """
+        Runs window.__jarvis.<method>(*args) and returns its value. url_hint
+        picks the tab whose URL contains it, e.g. a page that was just opened.
+        """
+
+    def poll(self, method: str, *args, url_hint: Optional[str] = None, timeout: float = 6.0, interval: float = 0.1):
+        """call() until it returns something truthy, e.g. while a page loads"""
+        error = None
+        for _ in range(max(1, int(timeout / interval))):
+            try:
+                result = self.call(method, *args, url_hint=url_hint)
+                if result:
+                    return result
+                error = None
+            except BridgeError as e:
+                error = e
+            time.sleep(interval)
+        if error is not None:
+            raise error
+        return None
+
+
+class DevToolsBridge(BrowserBridge):
+    """
+    Holds one DevTools-protocol connection to the YouTube tab of a Chromium
+    browser started with --remote-debugging-port. The controller is injected
+    once per document, so each command is one Runtime.evaluate round trip
+    over an open socket (a few milliseconds) rather than a compiled
+    AppleScript. The tab is found by URL, not by which one is in front.
+    """
+    name = "devtools"
+    TIMEOUT = 2.0
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint.rstrip("/")
+        self._ws = None
+        self._target: Optional[dict] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def targets(self) -> List[dict]:
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/json/list", timeout=0.5) as response:
+                return [t for t in json.load(response) if t.get("type") == "page"]
+        except (OSError, ValueError) as e:
+            raise BridgeError(f"DevTools endpoint {self.endpoint} unreachable: {e}") from e
+
+    def available(self) -> bool:
+        try:
+            self.targets()
+            return True
+        except BridgeError:
+            return False
+
+    @staticmethod
+    def pick(targets: List[dict], url_hint: Optional[str] = None) -> dict:
+        """The tab matching url_hint, else a watch page, else any YouTube page (most recent first)."""
+        youtube = [t for t in targets if "youtube.com" in t.get("url", "")]
+        for candidates in (
+            [t for t in youtube if url_hint and url_hint in t["url"]],
+            [] if url_hint else [t for t in youtube if "/watch" in t["url"]],
+            [] if url_hint else youtube,
+        ):
+            if candidates:
+                return candidates[0]
+        raise BridgeError("No YouTube tab open" if not url_hint else f"No tab at {url_hint} yet")
+
+    def _attach(self, target: dict):
+        from websockets.sync.client import connect
+
+        self._close()
+        self._ws = connect(target["webSocketDebuggerUrl"], open_timeout=DevToolsBridge.TIMEOUT, max_size=None)
+        self._target = target
+        self._send("Page.addScriptToEvaluateOnNewDocument", {"source": CONTROLLER_JS})
+        self._evaluate(CONTROLLER_JS)
+
+    def _close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        self._ws = None
+        self._target = None
+
+    def _send(self, method: str, params: dict) -> dict:
+        self._next_id += 1
+        message_id = self._next_id
+        self._ws.send(json.dumps({"id": message_id, "method": method, "params": params}))
+        while True:
+            # Skip protocol events until our reply
+            message = json.loads(self._ws.recv(timeout=DevToolsBridge.TIMEOUT))
+            if message.get("id") == message_id:
+                if "error" in message:
+                    raise BridgeError(f"{method}: {message['error'].get('message')}")
+                return message.get("result", {})
+
+    def _evaluate(self, expression: str):
+        # userGesture lets play() and fullscreen through the autoplay rules
+        result = self._send("Runtime.evaluate", {"expression": expression, "returnByValue": True, "userGesture": True})
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise BridgeError(details.get("exception", {}).get("description") or details.get("text", "JavaScript error"))
+        return result.get("result", {}).get("value")
+
+    def call(self, method: str, *args, url_hint: Optional[str] = None):
+        expression = (f"window.__jarvis ? window.__jarvis.{method}(...{json.dumps(list(args))})"
+                      f" : {json.dumps(NOT_INSTALLED)}")
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._ws is None or url_hint:
+                        target = self.pick(self.targets(), url_hint)
+                        if self._target is None or target["id"] != self._target["id"]:
+                            self._attach(target)
+                    result = self._evaluate(expression)
+                    if result == NOT_INSTALLED:
+                        # A document the new-document hook missed
+                        self._evaluate(CONTROLLER_JS)
+                        result = self._evaluate(expression)
+                    return result
+                except BridgeError:
+                    raise
+                except Exception as e:
+                    # Tab closed or socket dropped: find the tab again, once
+                    self._close()
+                    if attempt:
+                        raise BridgeError(f"DevTools connection failed: {e!r}") from e
+        return None
+
+
+class AppleScriptBridge(BrowserBridge):
+    """
+    Fallback when no DevTools endpoint is up (and the only option for
+    Safari). Still one osascript per command, but the tab is found by URL
+    across every window and the JavaScript is passed as an argument instead
+    of being escaped into the script.
+    """
+    name = "applescript"
+
+    SCRIPT = """
+on run argv
+    set js to item 1 of argv
+    set hint to item 2 of argv
+    tell application "{browser}"
+        set fallback to missing value
+        repeat with w in windows
+            repeat with t in tabs of w
+                set u to URL of t
+                if u contains hint then return {run_in_t}
+                if fallback is missing value and u contains "youtube.com" then set fallback to t
+            end repeat
+        end repeat
+        if fallback is missing value then return "__jarvis: no YouTube tab"
+        set t to fallback
+        return {run_in_t}
+    end tell
+end run
+"""
+
+    def __init__(self, browser: str):
+        self.browser = browser
+        run_in_t = "do JavaScript js in t" if browser == "Safari" else "execute t javascript js"
+        self.script = AppleScriptBridge.SCRIPT.format(browser=browser, run_in_t=run_in_t)
+
+    def call(self, method: str, *args, url_hint: Optional[str] = None):
+        js = f"{CONTROLLER_JS}; JSON.stringify(window.__jarvis.{method}(...{json.dumps(list(args))}))"
+        try:
+            result = run_process(
+                ["osascript", "-e", self.script, js, url_hint or "youtube.com/watch"],
+                capture_output=True, text=True, timeout=5,
+            )
+        except Exception as e:
+            raise BridgeError(str(e)) from e
+        if result.returncode != 0:
+            raise BridgeError(result.stderr.strip())
+        output = result.stdout.strip()
+        if output == "__jarvis: no YouTube tab":
+            raise BridgeError("No YouTube tab open")
+        try:
+            return json.loads(output) if output else None
+        except ValueError:
+            return output
+
+
+_bridges: Dict[str, BrowserBridge] = {}
+_devtools_checked = 0.0
+DEVTOOLS_RECHECK = 30  # seconds between looking for a DevTools endpoint that wasn't there
+
+
+def get_browser_bridge(browser: str) -> Optional[BrowserBridge]:
+    """
+    The bridge for a browser (already normalized, e.g. "Google Chrome"):
+    DevTools at BROWSER_DEVTOOLS_URL (default http://127.0.0.1:9222) for
+    Chromium browsers when it's reachable, else AppleScript. None if the
+    browser can't run JavaScript from outside.
+    """
+    global _devtools_checked
+    if browser in CHROMIUM_BROWSERS:
+        devtools = _bridges.get("devtools")
+        if devtools is None and time.monotonic() - _devtools_checked > DEVTOOLS_RECHECK:
+            _devtools_checked = time.monotonic()
+            candidate = DevToolsBridge(os.getenv("BROWSER_DEVTOOLS_URL", "http://127.0.0.1:9222"))
+            if candidate.available():
+                logger.info(f"Using DevTools bridge at {candidate.endpoint}")
+                devtools = _bridges["devtools"] = candidate
+        if devtools is not None:
+            return devtools
+    if browser in CHROMIUM_BROWSERS or browser == "Safari":
+        if browser not in _bridges:
+            _bridges[browser] = AppleScriptBridge(browser)
+        return _bridges[browser]
+    return None
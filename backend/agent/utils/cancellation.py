@@ -0,0 +1,131 @@
+import contextvars
+import logging
+import subprocess
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Optional
+
+from .scheduler import RequestCancelled
+
+logger = logging.getLogger("uvicorn")
+
+
+class CancelToken:
+    """
+    Cooperative cancellation for the work one request started. Tools run on
+    worker threads that asyncio can't interrupt, so cancelling a request
+    (the user said "stop", the client went away, a deadline passed) also
+    cancels its token: subprocesses started through run_process are killed,
+    the input actor drops the request's remaining actions, and code that
+    checks the token stops at its next check. Cancelling a token cancels
+    its children, e.g. each tool call's own token under the request's.
+    """
+
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._children = weakref.WeakSet()
+        if parent is not None:
+            with parent._lock:
+                parent._children.add(self)
+            if parent.cancelled:
+                self.cancel(parent.reason)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            processes, children = list(self._processes), list(self._children)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        for child in children:
+            child.cancel(reason)
+
+    def check(self):
+        """Raises RequestCancelled if the token has been cancelled."""
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+    def attach(self, process):
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self._event.is_set()
+        if cancelled:
+            process.kill()
+
+    def detach(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+
+# Never cancelled; what current_token() returns outside any request
+NEVER = CancelToken()
+_current: contextvars.ContextVar[CancelToken] = contextvars.ContextVar("cancel_token", default=NEVER)
+
+
+def current_token() -> CancelToken:
+    """The token of the request (or tool call) this code runs for."""
+    return _current.get()
+
+
+@contextmanager
+def cancellation_scope():
+    """
+    Runs the block under a new token, a child of the current one, which
+    asyncio tasks and tool threads started inside inherit. If the block is
+    left by an exception (including CancelledError and timeouts), the token
+    is cancelled so threads still working for it stop too.
+    """
+    token = CancelToken(parent=current_token())
+    reset = _current.set(token)
+    try:
+        yield token
+    except BaseException as e:
+        token.cancel(type(e).__name__)
+        raise
+    finally:
+        _current.reset(reset)
+
+
+def run_process(args, *, input=None, capture_output: bool = False, timeout: Optional[float] = None,
+                check: bool = False, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run, except that the process is killed when the current
+    token is cancelled, raising RequestCancelled.
+    """
+    token = current_token()
+    token.check()
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    with subprocess.Popen(args, **kwargs) as process:
+        token.attach(process)
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            token.detach(process)
+    if token.cancelled:
+        logger.info(f"Killed {args[0] if isinstance(args, (list, tuple)) else args}: {token.reason}")
+        raise RequestCancelled(token.reason)
+    completed = subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+    if check:
+        completed.check_returncode()
+    return completed
@@ -1,31 +1,228 @@
 from fastapi import WebSocket
-from typing import List
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Optional, Set, Union
+import asyncio
+import json
 import logging
+import struct
+import time
 
 logger = logging.getLogger("uvicorn")
 
+# Only the newest of these matters, so a pending one is replaced rather than queued behind
+COALESCED_EVENTS = {"status", "queue"}
+# Event type -> topic clients subscribe to; other types are their own topic
+EVENT_TOPICS = {
+    "status": "status",
+    "queue": "status",
+    "transcript": "transcript",
+    "trace": "trace",
+    "set_hidden": "window-control",
+    "audio": "audio",
+}
+TOPICS = {"status", "transcript", "trace", "window-control", "audio"}
+# What a client gets if it doesn't say; audio is binary, so only on request
+DEFAULT_TOPICS = TOPICS - {"audio"}
+
+
+def encode_binary(header: dict, payload: bytes) -> bytes:
+    """Binary frame: 4-byte big-endian header length, JSON header, raw payload."""
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return struct.pack(">I", len(encoded)) + encoded + payload
+
+
+def parse_topics(value: Union[str, Iterable[str], None]) -> Set[str]:
+    if value is None or value == "":
+        return set(DEFAULT_TOPICS)
+    if isinstance(value, str):
+        value = value.split(",")
+    return {t.strip() for t in value if t.strip() in TOPICS}
+
+
+@dataclass
+class Frame:
+    """One serialized message, shared by every client it's queued for."""
+    type: str
+    data: Union[str, bytes]
+    key: Optional[tuple] = None
+
+
+@dataclass
+class Client:
+    websocket: WebSocket
+    topics: Set[str] = field(default_factory=lambda: set(DEFAULT_TOPICS))
+    outbox: Deque[Frame] = field(default_factory=deque)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    writer: Optional[asyncio.Task] = None
+    last_seen: float = field(default_factory=time.monotonic)
+    dropped: int = 0
+
+
+def coalesce_key(event_type: str, data: dict):
+    if event_type not in COALESCED_EVENTS:
+        return None
+    # Queue positions are per request; status is one line for everyone
+    return event_type, data.get("trace_id") if event_type == "queue" else None
+
+
 class ConnectionManager:
+    """
+    Fans events out to /ws clients without waiting on any of them.
+
+    Each client gets a bounded outbox and its own writer task, so a slow or
+    half-dead socket only delays itself. A pending status (or queue) event
+    is replaced by a newer one instead of queueing behind it; when an outbox
+    is full the oldest status-like event goes first, then the oldest of any
+    kind. A client whose send errors or times out is evicted, as is one
+    that stops answering the heartbeat pings.
+
+    Clients subscribe to topics (see EVENT_TOPICS) when they connect or
+    later with a subscribe message. An event is serialized once, and only
+    if someone is subscribed. Audio and bulky trace data go out as binary
+    frames (see encode_binary) rather than base64 or nested JSON.
+    """
+    MAX_QUEUE = 64
+    SEND_TIMEOUT = 5.0
+    HEARTBEAT_INTERVAL = 20.0
+    HEARTBEAT_TIMEOUT = 60.0
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, Client] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = Counter()
 
-    async def connect(self, websocket: WebSocket):
+    @property
+    def active_connections(self):
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket, topics: Union[str, Iterable[str], None] = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self._loop = asyncio.get_running_loop()
+        client = Client(websocket, parse_topics(topics))
+        client.writer = asyncio.create_task(self._write(client))
+        self.clients[websocket] = client
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._ping())
         logger.info("WebSocket client connected")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
         logger.info("WebSocket client disconnected")
 
+    def touch(self, websocket: WebSocket):
+        """Marks a client alive; call on anything it sends."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.last_seen = time.monotonic()
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str], replace: bool = False):
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.topics = parse_topics(topics) if replace else client.topics | parse_topics(topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.topics -= set(topics)
+
+    def subscribers(self, topic: str):
+        return [c for c in self.clients.values() if topic in c.topics]
+
     async def send_event(self, event_type: str, data: dict):
-        """Send event to all connected clients"""
-        message = {"type": event_type, "data": data}
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-                logger.info(f"Sent event: {event_type}")
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}")
-                
-                
-manager = ConnectionManager()
\ No newline at end of file
+        """Queue event for subscribed clients; never waits on a socket"""
+        recipients = self.subscribers(EVENT_TOPICS.get(event_type, event_type))
+        if not recipients:
+            return
+        frame = Frame(event_type, json.dumps({"type": event_type, "data": data}), coalesce_key(event_type, data))
+        for client in recipients:
+            self._enqueue(client, frame)
+
+    async def send_binary(self, event_type: str, header: dict, payload: bytes):
+        """Queue a binary frame (see encode_binary) for subscribed clients"""
+        self._broadcast_binary(event_type, header, payload)
+
+    def send_binary_threadsafe(self, event_type: str, header: dict, payload: bytes):
+        """send_binary for worker threads, e.g. TTS synthesis"""
+        if self._loop is None or self._loop.is_closed() or not self.subscribers(EVENT_TOPICS.get(event_type, event_type)):
+            return
+        self._loop.call_soon_threadsafe(self._broadcast_binary, event_type, header, payload)
+
+    def _broadcast_binary(self, event_type: str, header: dict, payload: bytes):
+        recipients = self.subscribers(EVENT_TOPICS.get(event_type, event_type))
+        if not recipients:
+            return
+        frame = Frame(event_type, encode_binary({"type": event_type, **header}, payload))
+        for client in recipients:
+            self._enqueue(client, frame)
+
+    def _enqueue(self, client: Client, frame: Frame):
+        if frame.key is not None:
+            for i, pending in enumerate(client.outbox):
+                if pending.key == frame.key:
+                    del client.outbox[i]
+                    self._stats["coalesced"] += 1
+                    break
+        if len(client.outbox) >= ConnectionManager.MAX_QUEUE:
+            victim = next((f for f in client.outbox if f.type in COALESCED_EVENTS), client.outbox[0])
+            client.outbox.remove(victim)
+            client.dropped += 1
+            self._stats["dropped"] += 1
+        client.outbox.append(frame)
+        self._stats["queued"] += 1
+        client.ready.set()
+
+    async def _write(self, client: Client):
+        websocket = client.websocket
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.outbox:
+                    frame = client.outbox.popleft()
+                    if isinstance(frame.data, bytes):
+                        send = websocket.send_bytes(frame.data)
+                    else:
+                        send = websocket.send_text(frame.data)
+                    await asyncio.wait_for(send, ConnectionManager.SEND_TIMEOUT)
+                    self._stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to client, dropping it: {e!r}")
+            await self._evict(client)
+
+    async def _evict(self, client: Client):
+        self._stats["evicted"] += 1
+        self.disconnect(client.websocket)
+        try:
+            await asyncio.wait_for(client.websocket.close(code=1011), 1.0)
+        except Exception:
+            pass
+
+    async def _ping(self):
+        while self.clients:
+            await asyncio.sleep(ConnectionManager.HEARTBEAT_INTERVAL)
+            cutoff = time.monotonic() - ConnectionManager.HEARTBEAT_TIMEOUT
+            for client in list(self.clients.values()):
+                if client.last_seen < cutoff:
+                    logger.info("WebSocket client missed its heartbeat")
+                    await self._evict(client)
+                else:
+                    self._enqueue(client, Frame("ping", json.dumps({"type": "ping", "data": {"ts": time.time()}})))
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "clients": len(self.clients),
+            "subscribers": {topic: len(self.subscribers(topic)) for topic in sorted(TOPICS)},
+            "pending": sum(len(c.outbox) for c in self.clients.values()),
+        }
+
+
+manager = ConnectionManager()
@@ -0,0 +1,234 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from .app_state import AppState, app_state as shared_app_state
+from .cancellation import CancelToken, current_token
+from .text_input import PyAutoGUIBackend, TextInjector
+
+logger = logging.getLogger("uvicorn")
+
+
+@dataclass
+class Action:
+    """One step of an input script; build them with the helpers below."""
+    kind: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+
+def activate(app: str) -> Action:
+    """Brings app to the front, unless it already is."""
+    return Action("activate", (app,))
+
+
+def open_app(app: str, target: Optional[str] = None) -> Action:
+    """`open -a app [target]`, e.g. a URL; the app ends up in front."""
+    return Action("open", (app, target))
+
+
+def hotkey(*keys: str) -> Action:
+    return Action("hotkey", keys)
+
+
+def press(key: str) -> Action:
+    return Action("press", (key,))
+
+
+def write(text: str, interval: float = 0.02) -> Action:
+    """Types or pastes text (see TextInjector)."""
+    return Action("type", (text,), {"interval": interval})
+
+
+def click(x: int, y: int) -> Action:
+    return Action("click", (x, y))
+
+
+def read_clipboard() -> Action:
+    return Action("clipboard")
+
+
+def wait(seconds: float) -> Action:
+    return Action("wait", (seconds,))
+
+
+def wait_for(predicate: Callable[[], Any], timeout: float = 3.0, interval: float = 0.1) -> Action:
+    """Waits until predicate() is truthy; the script carries on either way."""
+    return Action("wait_for", (predicate,), {"timeout": timeout, "interval": interval})
+
+
+class InputActor:
+    """
+    Owns the keyboard, mouse and clipboard. Tools submit scripts of actions
+    (activate, hotkey, type, wait...) and one thread runs each script start
+    to finish before the next, so keystrokes from requests in different
+    sessions never interleave.
+
+    Activating the app that's already in front is skipped, along with the
+    settle delay that goes with it. Within a script the actor knows what's
+    in front; for a script's first activate it asks, since the user or
+    another tool may have switched apps in between. That answer has to be
+    fresh: AppState's if its source pushes changes or sampled within
+    FRONTMOST_FRESH, else the backend's, as a polling source lags behind.
+
+    A script carries a child of the submitting request's cancellation
+    token. Once that's cancelled, or the caller stops waiting for the
+    script, the script's remaining actions are dropped (raising
+    RequestCancelled).
+    """
+    ACTIVATE_SETTLE = 0.5
+    # Launching can take longer than bringing a running app forward
+    OPEN_SETTLE = 2.0
+    FRONTMOST_POLL = 0.05
+    FRONTMOST_FRESH = 0.1
+    SCRIPT_TIMEOUT = 60.0
+
+    def __init__(self, backend=None, app_state: Optional[AppState] = None):
+        self.backend = backend or PyAutoGUIBackend()
+        self.app_state = app_state
+        self.injector = TextInjector(self.backend)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._frontmost: Optional[str] = None
+        # The running script's token
+        self._token: CancelToken = current_token()
+        self._stats = Counter()
+
+    def run(self, *actions: Action, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Runs the actions in order without anything else touching the input
+        in between, and returns each one's result. Blocks the calling
+        thread; an action that raises aborts the rest of its script.
+        """
+        if threading.current_thread() is self._thread:
+            # A wait_for predicate or callback submitting its own script, under the running script's token
+            return self._execute(actions, self._token)
+        token = CancelToken(parent=current_token())
+        self._ensure_started()
+        future: Future = Future()
+        submitted = time.perf_counter()
+        self._queue.put((actions, token, future, submitted))
+        try:
+            return future.result(timeout=timeout or InputActor.SCRIPT_TIMEOUT)
+        except TimeoutError:
+            # Otherwise it keeps typing after its caller has given up on it
+            token.cancel("input script timed out")
+            raise
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="input-actor", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            actions, token, future, submitted = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._stats["queue_wait_ms"] += (time.perf_counter() - submitted) * 1000
+            try:
+                future.set_result(self._execute(actions, token))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _execute(self, actions, token: CancelToken) -> List[Any]:
+        self._stats["scripts"] += 1
+        # Anything may have been brought to front since the last script
+        self._frontmost = None
+        outer, self._token = self._token, token
+        try:
+            return [self._do(action) for action in actions]
+        finally:
+            self._token = outer
+
+    def _do(self, action: Action) -> Any:
+        if self._token.cancelled:
+            self._stats["cancelled"] += 1
+            self._token.check()
+        self._stats[action.kind] += 1
+        handler = getattr(self, f"_do_{action.kind}", None)
+        if handler is None:
+            raise ValueError(f"Unknown input action {action.kind!r}")
+        return handler(*action.args, **action.kwargs)
+
+    def _do_activate(self, app: str):
+        front = self._frontmost if self._frontmost is not None else self.fresh_frontmost_app()
+        if front is not None and front.casefold() == app.casefold():
+            self._frontmost = app
+            self._stats["activate_skipped"] += 1
+            return False
+        self.backend.activate(app)
+        self._settle(app, InputActor.ACTIVATE_SETTLE)
+        return True
+
+    def _do_open(self, app: str, target: Optional[str]):
+        self.backend.open(app, target)
+        self._settle(app, InputActor.OPEN_SETTLE)
+
+    def _do_hotkey(self, *keys: str):
+        self.backend.hotkey(*keys)
+
+    def _do_press(self, key: str):
+        self.backend.press(key)
+
+    def _do_type(self, text: str, interval: float):
+        return self.injector.insert(text, interval=interval)
+
+    def _do_click(self, x: int, y: int):
+        self.backend.click(x, y)
+
+    def _do_clipboard(self):
+        return self.backend.paste()
+
+    def _do_wait(self, seconds: float):
+        time.sleep(seconds)
+
+    def _do_wait_for(self, predicate: Callable[[], Any], timeout: float, interval: float):
+        for _ in range(max(1, int(timeout / interval))):
+            result = predicate()
+            if result:
+                return result
+            time.sleep(interval)
+        return None
+
+    def _settle(self, app: str, timeout: float):
+        """Waits until app is in front, or the whole timeout when that can't be checked."""
+        self._frontmost = app
+        if self.app_state is not None and self.app_state.live:
+            self.app_state.wait_until_frontmost(app, timeout)
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = self.frontmost_app()
+            if current is None:
+                time.sleep(timeout)
+                return
+            if current.casefold() == app.casefold():
+                return
+            time.sleep(InputActor.FRONTMOST_POLL)
+
+    def frontmost_app(self) -> Optional[str]:
+        if self.app_state is not None and self.app_state.live:
+            return self.app_state.frontmost()
+        return self.backend.frontmost()
+
+    def fresh_frontmost_app(self) -> Optional[str]:
+        if self.app_state is not None and self.app_state.live:
+            front = self.app_state.frontmost(max_age=InputActor.FRONTMOST_FRESH)
+            if front is not None:
+                return front
+        return self.backend.frontmost()
+
+    def stats(self) -> dict:
+        return {**self._stats, "pending": self._queue.qsize()}
+
+
+input_actor = InputActor(app_state=shared_app_state)
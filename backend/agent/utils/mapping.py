@@ -1,4 +1,11 @@
 # Shared utilities for toolkits
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger("uvicorn")
 
 APP_NAME_MAPPING = {
     # Browsers
@@ -41,19 +48,226 @@ APP_NAME_MAPPING = {
     'vlc': 'VLC',
     'photoshop': 'Adobe Photoshop 2024',
     'illustrator': 'Adobe Illustrator 2024',
+    'word': 'Microsoft Word',
+    'excel': 'Microsoft Excel',
+    'powerpoint': 'Microsoft PowerPoint',
+    'outlook': 'Microsoft Outlook',
+    'teams': 'Microsoft Teams',
+    'whatsapp': 'WhatsApp',
+    'settings': 'System Settings',
+    'system preferences': 'System Settings',
 }
 
-def normalize_app_name(app_name: str) -> str:
+# Where installed apps live; one level of subfolders is searched too (e.g. Adobe's)
+APPLICATION_DIRS = [
+    "/Applications",
+    "/Applications/Utilities",
+    "/System/Applications",
+    "/System/Applications/Utilities",
+    os.path.expanduser("~/Applications"),
+]
+# Below this a fuzzy match is treated as no match
+MIN_SCORE = 0.5
+# Words that say what kind of app it is, not which one: sharing only these
+# ("zen browser" / "Brave Browser") doesn't make two names alike
+GENERIC_WORDS = {"app", "browser", "desktop", "studio", "the", "for", "pro", "microsoft", "adobe", "google"}
+
+
+def _clean(name: str) -> str:
+    name = name.lower().strip()
+    if name.endswith(".app"):
+        name = name[:-4]
+    name = re.sub(r"[^\w.+]+", " ", name)
+    for suffix in (" app", " application"):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[: -len(suffix)]
+    return " ".join(name.split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_ratio(a: str, b: str) -> float:
+    """1 - edit distance / longer length, a swapped pair of letters counting as one edit."""
+    if a == b:
+        return 1.0
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        before, previous = previous, current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+def _alike(query: str, text: str) -> bool:
+    """Whether a word of query starts like a distinctive word of text ("spotfy" / "spotify")."""
+    words = [w for w in text.split() if w not in GENERIC_WORDS]
+    return any(q[:3] == w[:3] for q in query.split() for w in words)
+
+
+def scan_applications(dirs: Iterable[str] = APPLICATION_DIRS) -> List[str]:
+    """Names of the .app bundles in dirs (and their direct subfolders)."""
+    names = set()
+    for directory in dirs:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.endswith(".app"):
+                names.add(entry.name[:-4])
+            elif entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                try:
+                    names.update(e.name[:-4] for e in os.scandir(entry.path) if e.name.endswith(".app"))
+                except OSError:
+                    pass
+    return sorted(names)
+
+
+class AppNameIndex:
+    """
+    Resolves what the user called an app to the name `open -a` wants:
+    exact names and aliases first, then a trigram index over installed app
+    names and aliases, with the best few candidates re-ranked by edit
+    distance. Results are cached, so a repeated lookup is one dict access.
+
+    Installed apps are scanned from APPLICATION_DIRS (on first use, then by
+    `start()` in the background). Aliases whose target isn't installed are
+    pointed at the closest installed app, e.g. a newer Photoshop.
+    """
+    CANDIDATES = 5
+
+    def __init__(self, aliases: Dict[str, str] = APP_NAME_MAPPING, scan: Callable[[], List[str]] = scan_applications):
+        self.aliases = aliases
+        self.scan = scan
+        self.installed: List[str] = []
+        self._exact: Dict[str, str] = {}
+        # Searchable text -> the name it resolves to, and trigram -> texts containing it
+        self._entries: Dict[str, str] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._cache: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._built = False
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """Rescans installed apps and rebuilds the index."""
+        try:
+            installed = self.scan()
+        except Exception as e:
+            logger.warning(f"Couldn't scan installed apps: {e!r}")
+            installed = self.installed
+        self._build(installed)
+
+    def _build(self, installed: List[str]):
+        entries = {_clean(name): name for name in installed}
+        installed_keys = set(entries)
+        grams: Dict[str, Set[str]] = {}
+        for text in entries:
+            for gram in _trigrams(text):
+                grams.setdefault(gram, set()).add(text)
+
+        for alias, target in self.aliases.items():
+            target_key = _clean(target)
+            if installed_keys and target_key not in installed_keys:
+                # e.g. 'Adobe Photoshop 2024' when 2025 is what's installed
+                closer = self._fuzzy(target_key, entries, grams)
+                target = closer or target
+            entries.setdefault(target_key, target)
+            entries.setdefault(_clean(alias), target)
+        for text in entries:
+            for gram in _trigrams(text):
+                grams.setdefault(gram, set()).add(text)
+
+        with self._lock:
+            self.installed = list(installed)
+            self._entries, self._grams = entries, grams
+            self._exact = dict(entries)
+            self._cache = {}
+            self._built = True
+
+    def _fuzzy(self, query: str, entries: Dict[str, str], grams: Dict[str, Set[str]]) -> Optional[str]:
+        query_grams = _trigrams(query)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for text in grams.get(gram, ()):
+                shared[text] = shared.get(text, 0) + 1
+        if not shared:
+            return None
+        # Dice coefficient on trigrams picks the candidates, edit distance and word overlap settle it
+        dice = {text: 2 * n / (len(query_grams) + len(_trigrams(text))) for text, n in shared.items()}
+        best, best_score = None, 0.0
+        query_words = set(query.split())
+        for text in sorted(dice, key=dice.get, reverse=True)[:AppNameIndex.CANDIDATES]:
+            if not _alike(query, text):
+                # Similar letters alone: "gmail" isn't Mail, "1password" isn't Passwords
+                continue
+            words = set(text.split())
+            covered = len(query_words & words) / len(query_words)
+            score = 0.5 * dice[text] + 0.3 * _edit_ratio(query, text) + 0.2 * covered
+            if score > best_score:
+                best, best_score = text, score
+        return entries[best] if best_score >= MIN_SCORE else None
+
+    def resolve(self, app_name: str, fuzzy: bool = True) -> Optional[str]:
+        """
+        The app's real name, or None if nothing is close enough. With
+        fuzzy=False only exact names and aliases count, for when a wrong
+        guess does harm (quitting an app the user didn't name).
+        """
+        if not self._built:
+            with self._lock:
+                built = self._built
+            if not built:
+                self.refresh()
+        query = _clean(app_name)
+        if not fuzzy:
+            return self._exact.get(query)
+        cached = self._cache.get(query, False)
+        if cached is not False:
+            return cached
+        result = self._exact.get(query)
+        if result is None and query:
+            result = self._fuzzy(query, self._entries, self._grams)
+        if result is None and " " in query:
+            # 'power point', 'whats app'
+            result = self._fuzzy(query.replace(" ", ""), self._entries, self._grams)
+        self._cache[query] = result
+        return result
+
+    def start(self, interval: float = 600.0):
+        """Scans now, then again every `interval` seconds on a daemon thread."""
+        def run():
+            while True:
+                self.refresh()
+                if self._stop.wait(interval):
+                    return
+
+        threading.Thread(target=run, name="app-index", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+app_index = AppNameIndex()
+
+
+def normalize_app_name(app_name: str, fuzzy: bool = True) -> str:
     """
     Normalizes application names to their actual macOS names.
     
     Args:
-        app_name: User-provided app name (e.g., 'chrome', 'Chrome')
+        app_name: User-provided app name (e.g., 'chrome', 'visual studio', 'photoshop 2025')
+        fuzzy: Also accept close matches ('spotfy'); False for exact names and aliases only
     
     Returns:
-        Actual macOS application name (e.g., 'Google Chrome')
+        Actual macOS application name (e.g., 'Google Chrome'), or the name
+        title-cased if nothing installed or aliased is close
     """
-    app_lower = app_name.lower().strip()
-    if app_lower in APP_NAME_MAPPING:
-        return APP_NAME_MAPPING[app_lower]
-    return app_name.title()
\ No newline at end of file
+    return app_index.resolve(app_name, fuzzy=fuzzy) or app_name.title()
@@ -0,0 +1,236 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from ..tools.tools import load_toolkit as load_lazy_toolkit, toolkits as all_toolkits
+from .app_state import AppState, app_state as shared_app_state
+from .cancellation import run_process
+from .mapping import normalize_app_name
+from .tool_selector import TOOLKIT_KEYWORDS, tokenize
+
+logger = logging.getLogger("uvicorn")
+
+# Toolkit -> the app its tools drive. None means the browser the request
+# names, else PREFETCH_BROWSER.
+TOOLKIT_APPS = {
+    "spotify": "Spotify",
+    "discord": "Discord",
+    "youtube": None,
+    "browser": None,
+    "google": None,
+}
+# Toolkit -> words that mean the request needs its app running. Narrower
+# than the selection keywords: "server" or "channel" is reason enough to
+# bind the Discord tools, not to launch Discord.
+LAUNCH_KEYWORDS = {
+    "spotify": {"spotify", "song", "track", "playlist", "album"},
+    "discord": {"discord", "dm"},
+    "youtube": {"youtube", "video"},
+    "browser": {"chrome", "safari", "firefox", "arc", "brave", "edge", "browser", "search"},
+    "google": {"gmail", "email", "inbox", "slide", "slides", "presentation"},
+}
+# A request to get rid of an app shouldn't start it
+CLOSE_WORDS = {"close", "quit", "exit", "kill", "stop", "hide"}
+# Short commands that carry on with whatever the previous turn was using
+FOLLOW_UP_WORDS = set(tokenize("pause play resume next previous skip back again louder quieter volume mute unmute"))
+FOLLOW_UP_MAX_WORDS = 5
+# Toolkit -> hosts its tools will load in the browser
+TOOLKIT_HOSTS = {
+    "youtube": ("www.youtube.com", "i.ytimg.com"),
+    "browser": ("www.google.com",),
+    "google": ("mail.google.com", "docs.google.com"),
+}
+BROWSER_WORDS = {word: browser for browser in ("Chrome", "Safari", "Firefox", "Arc", "Brave", "Edge")
+                 for word in tokenize(browser)}
+
+
+def last_turn_tools(history: List) -> List[str]:
+    """Tools called in the last completed turn of a conversation, newest first."""
+    names = []
+    for message in reversed(history):
+        if getattr(message, "type", None) == "human":
+            break
+        names.extend(call["name"] for call in getattr(message, "tool_calls", None) or ())
+    return names
+
+
+class Prefetch:
+    """
+    The preparations started for one request. Each is keyed like
+    "launch:Spotify" and belongs to the toolkit it was predicted for;
+    settle() scores them against the tools the request actually used.
+    """
+
+    def __init__(self, prefetcher: "Prefetcher", toolkits: Set[str]):
+        self.prefetcher = prefetcher
+        self.toolkits = toolkits
+        self.jobs: Dict[str, tuple] = {}
+        self.used: Set[str] = set()
+        # Preparations still running when their toolkit's first tool was called
+        self.late: Set[str] = set()
+        self.settled = False
+
+    def tool_called(self, name: str):
+        toolkit = self.prefetcher.toolkit_of.get(name)
+        if toolkit is None or toolkit in self.used:
+            return
+        self.used.add(toolkit)
+        self.late |= {key for key, (kit, future) in self.jobs.items() if kit == toolkit and not future.done()}
+
+    def settle(self):
+        if self.settled:
+            return
+        self.settled = True
+        self.prefetcher._score(self)
+
+
+class Prefetcher:
+    """
+    Starts cheap, idempotent preparations for the apps a request is likely
+    to need while the LLM is still deciding what to do: launching the app
+    in the background (`open -g -a`, without taking focus), importing its
+    toolkit and resolving the hosts its tools will load. Predictions come
+    from the same keywords tool selection uses, and when the transcript
+    names nothing ("pause it", "next one") from the toolkits the session's
+    previous turn used. Launching is held to a stricter test (see
+    launches()), since starting an app the user didn't ask for is visible.
+
+    A preparation is a hit if the request goes on to call a tool of its
+    toolkit, late if that tool was called before the preparation finished,
+    and waste otherwise. Preparations that turn out to be no-ops (the app
+    is already running, the host was resolved a minute ago) are counted as
+    skipped and cost next to nothing. PREFETCH=off turns it all off.
+    """
+    WORKERS = 4
+    # getaddrinfo results are cached by the OS resolver about this long
+    DNS_FRESH = 60.0
+
+    def __init__(self, toolkit_of: Optional[Dict[str, str]] = None, app_state: Optional[AppState] = None,
+                 load_toolkit: Optional[Callable[[str], bool]] = None, resolve: Callable = socket.getaddrinfo):
+        self.enabled = os.getenv("PREFETCH", "on") != "off"
+        self.default_browser = normalize_app_name(os.getenv("PREFETCH_BROWSER", "Chrome"))
+        self.toolkit_of = toolkit_of or {}
+        self.app_state = app_state
+        self.load_toolkit = load_toolkit
+        self.resolve = resolve
+        self._executor = ThreadPoolExecutor(max_workers=Prefetcher.WORKERS, thread_name_prefix="prefetch")
+        self._resolved: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def predict(self, text: str, history: Iterable = ()) -> Set[str]:
+        words = set(tokenize(text))
+        toolkits = {toolkit for toolkit, keywords in TOOLKIT_KEYWORDS.items() if words & keywords}
+        if not toolkits:
+            toolkits = {self.toolkit_of[name] for name in last_turn_tools(list(history)) if name in self.toolkit_of}
+        return toolkits
+
+    def launches(self, text: str, toolkits: Set[str]) -> Set[str]:
+        """The predicted toolkits whose app is worth launching."""
+        tokens = tokenize(text)
+        words = set(tokens)
+        if words & CLOSE_WORDS:
+            return set()
+        if not any(words & keywords for keywords in TOOLKIT_KEYWORDS.values()):
+            # "next one" carries on with the previous turn's app; "thanks" shouldn't
+            # relaunch an app the user has since quit
+            if len(tokens) <= FOLLOW_UP_MAX_WORDS and words & FOLLOW_UP_WORDS:
+                return toolkits
+            return set()
+        return {toolkit for toolkit in toolkits if words & LAUNCH_KEYWORDS.get(toolkit, set())}
+
+    def start(self, text: str, history: Iterable = ()) -> Prefetch:
+        """Predicts the toolkits for a transcript and starts preparing them; returns at once."""
+        toolkits = self.predict(text, history) if self.enabled else set()
+        prefetch = Prefetch(self, toolkits)
+        if not toolkits:
+            return prefetch
+        browser = next((BROWSER_WORDS[w] for w in tokenize(text) if w in BROWSER_WORDS), None)
+        browser = normalize_app_name(browser) if browser else self.default_browser
+        launches = self.launches(text, toolkits)
+        for toolkit in sorted(toolkits):
+            for key, prepare in self._preparations(toolkit, browser, toolkit in launches):
+                if key not in prefetch.jobs:
+                    prefetch.jobs[key] = (toolkit, self._executor.submit(self._run, key, prepare))
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["started"] += len(prefetch.jobs)
+        logger.info(f"Prefetching for {', '.join(sorted(toolkits))}: {', '.join(prefetch.jobs)}")
+        return prefetch
+
+    def _preparations(self, toolkit: str, browser: str, launch: bool):
+        if self.load_toolkit is not None and toolkit in self.toolkit_of.values():
+            yield f"toolkit:{toolkit}", lambda: self.load_toolkit(toolkit)
+        if launch and toolkit in TOOLKIT_APPS:
+            app = TOOLKIT_APPS[toolkit] or browser
+            yield f"launch:{app}", lambda: self._launch(app)
+        for host in TOOLKIT_HOSTS.get(toolkit, ()):
+            yield f"dns:{host}", lambda host=host: self._resolve(host)
+
+    def _run(self, key: str, prepare: Callable[[], bool]) -> bool:
+        """Runs one preparation; True if it did something, False if there was nothing to do."""
+        started = time.perf_counter()
+        try:
+            did = bool(prepare())
+        except Exception as e:
+            logger.debug(f"Prefetch {key} failed: {e!r}")
+            with self._lock:
+                self._stats["errors"] += 1
+            return False
+        with self._lock:
+            self._stats["prepare_ms"] += (time.perf_counter() - started) * 1000
+        return did
+
+    def _launch(self, app: str) -> bool:
+        if self.app_state is not None and self.app_state.is_running(app):
+            return False
+        # -g leaves whatever the user is in at the front
+        run_process(['open', '-g', '-a', app], check=True, timeout=5)
+        return True
+
+    def _resolve(self, host: str) -> bool:
+        if time.monotonic() - self._resolved.get(host, float("-inf")) < Prefetcher.DNS_FRESH:
+            return False
+        self.resolve(host, 443)
+        self._resolved[host] = time.monotonic()
+        return True
+
+    def _score(self, prefetch: Prefetch):
+        outcomes = Counter()
+        for key, (toolkit, future) in prefetch.jobs.items():
+            did = future.done() and not future.cancelled() and future.result()
+            if future.done() and not did:
+                outcomes["skipped"] += 1
+            elif toolkit not in prefetch.used:
+                outcomes["waste"] += 1
+            elif key in prefetch.late:
+                outcomes["late"] += 1
+            else:
+                outcomes["hits"] += 1
+        # Toolkits the request used that nothing was predicted for
+        outcomes["missed"] += len({t for t in prefetch.used if t in TOOLKIT_APPS or t in TOOLKIT_HOSTS} - prefetch.toolkits)
+        with self._lock:
+            self._stats.update(outcomes)
+        if prefetch.jobs:
+            logger.info(f"Prefetch outcome: {dict(outcomes)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            useful = self._stats["hits"] + self._stats["late"] + self._stats["waste"]
+            return {
+                **self._stats,
+                "enabled": self.enabled,
+                "hit_rate": (self._stats["hits"] + self._stats["late"]) / useful if useful else 0.0,
+            }
+
+
+prefetcher = Prefetcher(
+    toolkit_of={tool.name: name for name, tools in all_toolkits.items() for tool in tools},
+    app_state=shared_app_state,
+    load_toolkit=load_lazy_toolkit,
+)
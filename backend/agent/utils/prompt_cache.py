@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from langchain_core.messages import SystemMessage
+from langchain_core.tools import BaseTool
+from langchain_core.tools import tool as create_tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger("uvicorn")
+
+
+@dataclass
+class PrefixEntry:
+    fingerprint: str
+    system_message: SystemMessage
+    tool_names: tuple
+    tokens: int
+    uses: int = 0
+    cache_name: Optional[str] = None
+    expires_at: float = 0.0
+    creating: bool = False
+    failed: bool = False
+
+
+class PromptCache:
+    """
+    Keeps the agent's prompt prefix (system prompt + tool schemas) identical
+    from call to call, and caches it provider-side when it can.
+
+    With the optional google-genai package, the first call creates one
+    Gemini explicit context cache, in the background, holding the system
+    prompt and every tool. Later calls then send only the conversation and
+    reference the cache with `cached_content`, since Gemini rejects requests
+    that repeat the cached system instruction or tools; they see all the
+    tools rather than the selected subset. One cache per tool subset would
+    mean dozens of billed caches with a hit or two each. The cache is
+    deleted by close() at shutdown.
+
+    Until that cache exists, or without google-genai, each selected subset
+    is fingerprinted by its system prompt and tool schemas, and the local
+    fingerprint cache reuses the same SystemMessage. That keeps the request
+    prefix byte-stable, so Gemini's implicit prefix caching can still hit.
+    """
+    # Gemini won't cache less than this (2.5 Flash minimum)
+    MIN_TOKENS = 1024
+    MAX_ENTRIES = 32
+    REFRESH_MARGIN = 60  # stop using a cache this close to expiry
+
+    def __init__(self, model: str, system_prompt: str, tools: List, mode: str = "explicit", ttl_s: int = 3600, client=None):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.ttl_s = ttl_s
+        tools = [t if isinstance(t, BaseTool) else create_tool(t) for t in tools]
+        self.tools = {t.name: t for t in tools}
+        self._schemas = {name: convert_to_openai_tool(t) for name, t in self.tools.items()}
+        self._entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        # The explicit cache's prefix: the system prompt and every tool
+        self._explicit: Optional[PrefixEntry] = None
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        self.client = client
+        if mode == "explicit" and client is None:
+            self.client = self._make_client()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prompt-cache")
+
+    @staticmethod
+    def _make_client():
+        try:
+            from google import genai
+        except ImportError:
+            logger.info("google-genai not installed; prompt caching stays implicit (pip install google-genai)")
+            return None
+        return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+    def fingerprint(self, tool_names) -> str:
+        payload = json.dumps({
+            "model": self.model,
+            "system": self.system_prompt,
+            "tools": [self._schemas[name] for name in tool_names],
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _new_entry(self, tool_names: tuple) -> PrefixEntry:
+        tokens = (len(self.system_prompt) + sum(len(json.dumps(self._schemas[n])) for n in tool_names)) // 4
+        return PrefixEntry(self.fingerprint(tool_names), SystemMessage(content=self.system_prompt), tool_names, tokens)
+
+    def _entry(self, tool_names: tuple) -> PrefixEntry:
+        fingerprint = self.fingerprint(tool_names)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self._stats["prefix_misses"] += 1
+                entry = self._new_entry(tool_names)
+                self._entries[fingerprint] = entry
+                while len(self._entries) > PromptCache.MAX_ENTRIES:
+                    self._entries.popitem(last=False)
+            else:
+                self._stats["prefix_hits"] += 1
+                self._entries.move_to_end(fingerprint)
+            entry.uses += 1
+            return entry
+
+    def prepare(self, llm, tool_names: List[str], bound):
+        """
+        Returns (model, prefix messages) for one call. `bound` is llm already
+        bound to tool_names; it's used whenever no explicit cache is live.
+        """
+        entry = self._entry(tuple(tool_names))
+        if self.client is None:
+            return bound, [entry.system_message]
+
+        with self._lock:
+            if self._explicit is None:
+                self._explicit = self._new_entry(tuple(self.tools))
+            explicit = self._explicit
+        if explicit.cache_name and explicit.expires_at - PromptCache.REFRESH_MARGIN > time.time():
+            self._stats["explicit_hits"] += 1
+            return llm.bind(cached_content=explicit.cache_name), []
+
+        if not explicit.creating and not explicit.failed and explicit.tokens >= PromptCache.MIN_TOKENS:
+            explicit.creating = True
+            self._pool.submit(self._create, explicit)
+        return bound, [entry.system_message]
+
+    def _create(self, entry: PrefixEntry):
+        try:
+            declarations = [
+                {k: v for k, v in self._schemas[name]["function"].items() if k in ("name", "description", "parameters")}
+                for name in entry.tool_names
+            ]
+            # Replacing one that's about to expire
+            self._delete(entry)
+            cache = self.client.caches.create(
+                model=self.model,
+                config={
+                    "display_name": f"jarvis-{entry.fingerprint[:12]}",
+                    "system_instruction": self.system_prompt,
+                    "tools": [{"function_declarations": declarations}] if declarations else None,
+                    "ttl": f"{self.ttl_s}s",
+                },
+            )
+            entry.cache_name = cache.name
+            entry.expires_at = time.time() + self.ttl_s
+            self._stats["explicit_created"] += 1
+            logger.info(f"Created Gemini context cache {cache.name} ({entry.tokens} tokens, {len(entry.tool_names)} tools)")
+        except Exception as e:
+            # Usually the prefix is under the model's minimum; don't retry this one
+            entry.failed = True
+            self._stats["explicit_failures"] += 1
+            logger.warning(f"Gemini context cache not created, using implicit caching: {e}")
+        finally:
+            entry.creating = False
+
+    def _delete(self, entry: PrefixEntry):
+        if not entry.cache_name or self.client is None:
+            return
+        name, entry.cache_name = entry.cache_name, None
+        try:
+            self.client.caches.delete(name=name)
+        except Exception as e:
+            logger.info(f"Failed to delete context cache {name}: {e}")
+
+    def close(self):
+        """Deletes the explicit cache rather than leaving it billed until its TTL runs out."""
+        with self._lock:
+            explicit, self._explicit = self._explicit, None
+        if explicit is not None:
+            # After any creation still in flight
+            self._pool.submit(self._delete, explicit).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "explicit": self.client is not None,
+                "live_caches": int(bool(self._explicit and self._explicit.cache_name and self._explicit.expires_at > time.time())),
+            }
+
+
+def get_prompt_cache(model: str, system_prompt: str, tools: List) -> PromptCache:
+    """PROMPT_CACHE=explicit (default, needs google-genai) or local; PROMPT_CACHE_TTL in seconds."""
+    return PromptCache(
+        model=model if model.startswith("models/") else f"models/{model}",
+        system_prompt=system_prompt,
+        tools=tools,
+        mode=os.getenv("PROMPT_CACHE", "explicit"),
+        ttl_s=int(os.getenv("PROMPT_CACHE_TTL", "3600")),
+    )
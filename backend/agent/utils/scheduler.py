@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("uvicorn")
+
+# Utterances that abort whatever the session is doing instead of being run
+STOP_COMMANDS = {"stop", "stop it", "stop that", "cancel", "cancel that", "never mind", "nevermind", "abort"}
+
+
+def is_stop_command(text: str) -> bool:
+    words = re.sub(r"[^a-z ]", " ", (text or "").lower()).split()
+    if words and words[0] in ("jarvis", "hey"):
+        words = [w for w in words if w not in ("jarvis", "hey")]
+    return " ".join(words) in STOP_COMMANDS
+
+
+class RequestCancelled(Exception):
+    """Raised to a request that was pre-empted before or while it ran."""
+
+
+@dataclass
+class Job:
+    trace_id: Optional[str]
+    turn: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+    cancelled: bool = False
+
+
+@dataclass
+class Session:
+    id: str
+    history: List = field(default_factory=list)
+    pending: Deque[Job] = field(default_factory=deque)
+    current: Optional[Job] = None
+    last_active: float = field(default_factory=time.monotonic)
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None or bool(self.pending)
+
+
+class SessionScheduler:
+    """
+    Runs requests one at a time per session and sessions in parallel.
+
+    Each session keeps its own conversation history. A request waits for
+    its turn in the session's FIFO, then runs as its own task, so `preempt()`
+    can cancel it mid-graph and drop anything still queued behind it.
+    `on_queue(session_id, trace_id, position)` is awaited whenever a
+    request's place in the queue changes (0 means it is running).
+    """
+    SESSION_TTL = 30 * 60
+
+    def __init__(self, on_queue: Optional[Callable[[str, Optional[str], int], Awaitable]] = None):
+        self.on_queue = on_queue
+        self.sessions: Dict[str, Session] = {}
+
+    def session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            self._evict_idle()
+            session = self.sessions[session_id] = Session(session_id)
+        session.last_active = time.monotonic()
+        return session
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - SessionScheduler.SESSION_TTL
+        for session_id, session in list(self.sessions.items()):
+            if not session.busy and session.last_active < cutoff:
+                del self.sessions[session_id]
+
+    async def run(self, session_id: str, fn: Callable[[Session], Awaitable], trace_id: Optional[str] = None):
+        """Runs fn(session) once every earlier request in the session is done."""
+        session = self.session(session_id)
+        job = Job(trace_id)
+        session.pending.append(job)
+        if session.current is None and session.pending[0] is job:
+            self._advance(session)
+        else:
+            await self._report(session)
+
+        try:
+            await job.turn.wait()
+        except asyncio.CancelledError:
+            # The caller went away while waiting
+            self._drop(session, job)
+            raise
+
+        try:
+            # Pre-empted after its turn came but before it resumed; still give the turn up below
+            if job.cancelled:
+                raise RequestCancelled()
+            # The task inherits this request's context, so its spans stay on its trace
+            job.task = asyncio.create_task(fn(session))
+            return await job.task
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                job.task.cancel()
+                raise
+            raise RequestCancelled()
+        finally:
+            if session.current is job:
+                session.current = None
+            session.last_active = time.monotonic()
+            self._advance(session)
+            await self._report(session)
+
+    def preempt(self, session_id: str) -> int:
+        """Cancels the running request and everything queued in a session. Returns how many."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return 0
+        jobs = list(session.pending) + ([session.current] if session.current else [])
+        session.pending.clear()
+        for job in jobs:
+            job.cancelled = True
+            job.turn.set()
+            if job.task is not None:
+                job.task.cancel()
+        if jobs:
+            logger.info(f"Pre-empted {len(jobs)} request(s) in session {session_id}")
+        return len(jobs)
+
+    def reset(self, session_id: str):
+        self.preempt(session_id)
+        self.sessions.pop(session_id, None)
+
+    def _advance(self, session: Session):
+        while session.current is None and session.pending:
+            job = session.pending.popleft()
+            if job.cancelled:
+                continue
+            session.current = job
+            job.turn.set()
+
+    def _drop(self, session: Session, job: Job):
+        job.cancelled = True
+        if job in session.pending:
+            session.pending.remove(job)
+        if session.current is job:
+            session.current = None
+            self._advance(session)
+
+    async def _report(self, session: Session):
+        if self.on_queue is None:
+            return
+        jobs = ([session.current] if session.current else []) + list(session.pending)
+        offset = 0 if session.current else 1
+        for position, job in enumerate(jobs, start=offset):
+            try:
+                await self.on_queue(session.id, job.trace_id, position)
+            except Exception as e:
+                logger.error(f"Failed to report queue position: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "running": sum(1 for s in self.sessions.values() if s.current),
+            "queued": sum(len(s.pending) for s in self.sessions.values()),
+        }
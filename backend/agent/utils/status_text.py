@@ -0,0 +1,52 @@
+# Human-readable status lines for tool activity (shown in the UI and spoken back)
+from typing import Iterable, Optional, Tuple
+
+TOOL_COMPLETE_MESSAGES = {
+    "open_macos_app": "Application opened",
+    "close_macos_app": "Application closed",
+    "browser_search": "Search completed",
+    "open_url": "URL opened",
+    "type_text": "Text typed",
+    "press_key": "Key pressed",
+    "set_volume": "Volume adjusted",
+    "adjust_volume": "Volume adjusted",
+    "spotify_pause": "Paused",
+    "create_note": "Note created",
+}
+
+def get_tool_action_text(tool_name: str, args: dict) -> str:
+    """Generate human-readable action text for tool calls"""
+    tool_messages = {
+        "open_macos_app": f"Opening {args.get('app_name', 'application')}",
+        "close_macos_app": f"Closing {args.get('app_name', 'application')}",
+        "browser_search": f"Searching for '{args.get('query', 'information')}'",
+        "open_url": f"Opening {args.get('url', 'URL')}",
+        "type_text": f"Typing text",
+        "press_key": f"Pressing {args.get('key', 'key')}",
+        "set_volume": f"Setting volume to {args.get('level', 'specified level')}",
+        "create_note": f"Creating note",
+    }
+    return tool_messages.get(tool_name, f"Executing {tool_name}")
+
+def get_tool_complete_text(tool_name: str) -> str:
+    """Generate completion message for tools"""
+    return TOOL_COMPLETE_MESSAGES.get(tool_name, f"{tool_name} completed")
+
+def spoken_phrase(phrase: str) -> str:
+    """A confirmation as it's spoken, and cached by elabs.prewarm."""
+    return f"{phrase}."
+
+def get_spoken_confirmation(results: Iterable[Tuple[str, str]]) -> Optional[str]:
+    """
+    What to say for a turn, given (tool name, output) for each tool it ran:
+    the confirmation phrase if every tool was a plain action with the same
+    phrase and none reported an error, so it plays straight from the TTS
+    cache. None means speak the formatted reply.
+    """
+    phrases = set()
+    for name, output in results:
+        lowered = output.lower()
+        if name not in TOOL_COMPLETE_MESSAGES or "error" in lowered or "failed" in lowered:
+            return None
+        phrases.add(TOOL_COMPLETE_MESSAGES[name])
+    return spoken_phrase(phrases.pop()) if len(phrases) == 1 else None
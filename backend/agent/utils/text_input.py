@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from .cancellation import run_process
+
+logger = logging.getLogger("uvicorn")
+
+# pyautogui.write can only type these; anything else has to be pasted
+TYPEABLE = {chr(c) for c in range(0x20, 0x7F)} | {"\t"}
+
+
+class PyAutoGUIBackend:
+    """
+    The real desktop: keystrokes through pyautogui and the clipboard through
+    pyperclip (both imported on first use), app focus through AppleScript or
+    NSWorkspace when pyobjc is installed.
+    """
+
+    def __init__(self):
+        self._workspace = None
+
+    def activate(self, app: str):
+        run_process(['osascript', '-e', f'tell application "{app}" to activate'])
+
+    def open(self, app: str, target: Optional[str] = None):
+        run_process(['open', '-a', app] + ([target] if target else []), check=True)
+
+    def frontmost(self) -> Optional[str]:
+        """Name of the app in front, or None if it can't be told."""
+        if self._workspace is None:
+            try:
+                from AppKit import NSWorkspace
+                self._workspace = NSWorkspace.sharedWorkspace()
+            except ImportError:
+                self._workspace = False
+        if self._workspace:
+            app = self._workspace.frontmostApplication()
+            return str(app.localizedName()) if app is not None else None
+        try:
+            result = run_process(
+                ['osascript', '-e', 'tell application "System Events" to get name of first process whose frontmost is true'],
+                capture_output=True, text=True, timeout=2,
+            )
+        except Exception:
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+
+    def write(self, text: str, interval: float):
+        import pyautogui
+        pyautogui.write(text, interval=interval)
+
+    def hotkey(self, *keys: str):
+        import pyautogui
+        pyautogui.hotkey(*keys)
+
+    def press(self, key: str):
+        import pyautogui
+        pyautogui.press(key)
+
+    def click(self, x: int, y: int):
+        import pyautogui
+        pyautogui.click(x, y)
+
+    def paste(self) -> str:
+        import pyperclip
+        return pyperclip.paste()
+
+    def copy(self, text: str):
+        import pyperclip
+        pyperclip.copy(text)
+
+
+class TextInjector:
+    """
+    Puts text into the focused app. Short plain-ASCII strings are typed a
+    key at a time, which keeps working in fields that ignore paste. Anything
+    longer, non-ASCII or multi-line is pasted in one keystroke (typing costs
+    `interval` per character and can't produce non-ASCII at all; a typed
+    newline would also press Enter mid-message). The user's clipboard is put
+    back afterwards unless they copied something else in the meantime.
+
+    Tools don't use this directly but through the input actor's type
+    action, which also keeps other scripts' keystrokes out of the way.
+    """
+    TYPE_MAX_CHARS = 16
+    # How long the target app gets to read the clipboard before it's restored
+    PASTE_SETTLE = 0.15
+
+    def __init__(self, backend=None):
+        self.backend = backend or PyAutoGUIBackend()
+        self._lock = threading.Lock()
+
+    def should_type(self, text: str) -> bool:
+        return len(text) <= TextInjector.TYPE_MAX_CHARS and all(c in TYPEABLE for c in text)
+
+    def insert(self, text: str, interval: float = 0.02) -> str:
+        """Types or pastes text; returns which one it did."""
+        if not text:
+            return "typed"
+        if self.should_type(text):
+            self.backend.write(text, interval)
+            return "typed"
+        # One paste at a time, or two tools could restore each other's text
+        with self._lock:
+            self._paste(text)
+        return "pasted"
+
+    def _paste(self, text: str):
+        try:
+            saved: Optional[str] = self.backend.paste()
+        except Exception as e:
+            logger.warning(f"Couldn't read the clipboard, it won't be restored: {e!r}")
+            saved = None
+        self.backend.copy(text)
+        self.backend.hotkey("command", "v")
+        time.sleep(TextInjector.PASTE_SETTLE)
+        if saved is None or saved == text:
+            return
+        try:
+            if self.backend.paste() == text:
+                self.backend.copy(saved)
+        except Exception as e:
+            logger.warning(f"Couldn't restore the clipboard: {e!r}")
+
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.messages.tool import invalid_tool_call, tool_call
+from langchain_core.tools import BaseTool
+from langchain_core.tools import tool as create_tool
+
+from .cancellation import cancellation_scope
+
+logger = logging.getLogger("uvicorn")
+
+
+def parse_complete_args(args) -> Optional[dict]:
+    """Tool-call arguments once they form a whole JSON object, else None."""
+    if isinstance(args, dict):
+        return args
+    if not args:
+        return None
+    try:
+        parsed = json.loads(args)
+    except (TypeError, ValueError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class ToolCallExecutor:
+    """
+    Runs tool calls as tasks keyed by tool_call_id, so the agent node can
+    start them while the model is still streaming and the tools node can
+    join on the results. Calls run strictly in the order they are dispatched,
+    since desktop actions depend on each other (open app -> type -> send).
+    Errors come back as error ToolMessages, the way ToolNode reports them.
+
+    Each call gets TOOL_TIMEOUT seconds (TIMEOUTS overrides it per tool) and
+    its own cancellation token; a call that runs over is reported to the
+    model as an error and its token cancelled, which kills its subprocesses
+    and drops its queued input actions.
+    """
+    STALE_AFTER = 300  # seconds before an unclaimed result is dropped
+    DEFAULT_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+    # Tools that wait on a model rather than the desktop
+    TIMEOUTS = {"rag": 60.0}
+
+    def __init__(self, tools):
+        # Plain functions are wrapped the same way ToolNode does
+        tools = [t if isinstance(t, BaseTool) else create_tool(t) for t in tools]
+        self.tools = {t.name: t for t in tools}
+        self._tasks: Dict[str, tuple] = {}
+
+    def dispatch(self, call: dict, config=None, after: Optional[asyncio.Task] = None) -> asyncio.Task:
+        self._prune()
+        task = asyncio.create_task(self.run(call, config, after))
+        self._tasks[call["id"]] = (task, time.monotonic())
+        return task
+
+    def take(self, tool_call_id: str) -> Optional[asyncio.Task]:
+        entry = self._tasks.pop(tool_call_id, None)
+        return entry[0] if entry else None
+
+    def cancel(self, tool_call_ids: List[str]):
+        for tool_call_id in tool_call_ids:
+            task = self.take(tool_call_id)
+            if task is not None:
+                task.cancel()
+
+    def _prune(self):
+        cutoff = time.monotonic() - ToolCallExecutor.STALE_AFTER
+        for tool_call_id, (task, created) in list(self._tasks.items()):
+            if task.done() and created < cutoff:
+                del self._tasks[tool_call_id]
+
+    async def run(self, call: dict, config=None, after: Optional[asyncio.Task] = None) -> ToolMessage:
+        if after is not None:
+            # Wait for the previous call without inheriting its failure
+            await asyncio.wait([after])
+        return await self.invoke(call, config)
+
+    async def invoke(self, call: dict, config=None) -> ToolMessage:
+        name, tool_call_id = call["name"], call["id"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return ToolMessage(
+                content=f"Error: {name} is not a valid tool, try one of [{', '.join(self.tools)}].",
+                name=name, tool_call_id=tool_call_id, status="error",
+            )
+        timeout = ToolCallExecutor.TIMEOUTS.get(name, ToolCallExecutor.DEFAULT_TIMEOUT)
+        try:
+            with cancellation_scope() as token:
+                try:
+                    result = await asyncio.wait_for(tool.ainvoke({**call, "type": "tool_call"}, config), timeout)
+                except asyncio.TimeoutError:
+                    token.cancel(f"{name} timed out")
+                    logger.warning(f"Tool {name} timed out after {timeout:g}s")
+                    return ToolMessage(content=f"Error: {name} didn't finish within {timeout:g}s and was stopped.",
+                                       name=name, tool_call_id=tool_call_id, status="error")
+        except Exception as e:
+            logger.error(f"Tool {name} failed: {e}")
+            return ToolMessage(content=f"Error: {e!r}\n Please fix your mistakes.", name=name, tool_call_id=tool_call_id, status="error")
+        if isinstance(result, ToolMessage):
+            return result
+        return ToolMessage(content=str(result), name=name, tool_call_id=tool_call_id)
+
+
+class EarlyToolDispatch:
+    """
+    Watches a streamed model response and hands each tool call to the
+    executor as soon as its arguments are complete, in emission order.
+    """
+
+    def __init__(self, executor: ToolCallExecutor, config=None):
+        self.executor = executor
+        self.config = config
+        self.ids: Dict[int, str] = {}
+        self.last: Optional[asyncio.Task] = None
+
+    @property
+    def dispatched(self) -> List[str]:
+        return list(self.ids.values())
+
+    def feed(self, message):
+        """Call with the response accumulated so far."""
+        chunks = getattr(message, "tool_call_chunks", None) or []
+        # Positions are stable: chunks merge by index, and index-less ones are appended
+        for position, chunk in enumerate(chunks):
+            if position in self.ids:
+                continue
+            args = parse_complete_args(chunk.get("args"))
+            if not chunk.get("name") or args is None:
+                # Keep emission order: nothing later starts before this one
+                return
+            call_id = chunk.get("id") or f"call_{uuid4().hex[:12]}"
+            self.ids[position] = call_id
+            self.last = self.executor.dispatch({"name": chunk["name"], "args": args, "id": call_id}, self.config, after=self.last)
+
+    def finish(self, message) -> AIMessage:
+        """The final AIMessage, with tool call ids matching what was dispatched."""
+        if not isinstance(message, AIMessageChunk):
+            return message
+        tool_calls, invalid = [], []
+        for position, chunk in enumerate(message.tool_call_chunks):
+            call_id = self.ids.get(position) or chunk.get("id") or f"call_{uuid4().hex[:12]}"
+            args = parse_complete_args(chunk.get("args") or "{}")
+            if chunk.get("name") and args is not None:
+                tool_calls.append(tool_call(name=chunk["name"], args=args, id=call_id))
+            else:
+                invalid.append(invalid_tool_call(name=chunk.get("name"), args=chunk.get("args"), id=call_id, error="Malformed tool call arguments"))
+        return AIMessage(
+            content=message.content,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            usage_metadata=message.usage_metadata,
+            id=message.id,
+            tool_calls=tool_calls,
+            invalid_tool_calls=invalid,
+        )
+
+    def cancel(self):
+        self.executor.cancel(self.dispatched)
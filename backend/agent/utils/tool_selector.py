@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.tools import BaseTool
+from langchain_core.tools import tool as create_tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from telemetry.tracing import tracer
+
+logger = logging.getLogger("uvicorn")
+
+# Words in a request (or in selected_app) that pull in a whole toolkit
+TOOLKIT_KEYWORDS = {
+    "spotify": {"spotify", "song", "track", "playlist", "album"},
+    "youtube": {"youtube", "video"},
+    "discord": {"discord", "server", "dm", "channel"},
+    "google": {"gmail", "email", "inbox", "slide", "slides", "presentation"},
+    "camera": {"camera", "picture", "photo", "selfie"},
+    "browser": {"chrome", "safari", "firefox", "arc", "brave", "edge", "browser", "search", "note", "notes", "type", "write"},
+    "system": {"volume", "louder", "quieter", "loud", "quiet", "app", "quit"},
+    "tauri": {"window", "hide", "show"},
+    "cool": {"surge", "surging"},
+}
+# Most multi-step tasks start by opening (or end by closing) an app, and rag
+# answers the open-ended questions nothing else ranks for
+ALWAYS_BOUND = {"open_macos_app", "close_macos_app", "rag"}
+
+
+def tokenize(text: str) -> List[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    # Crude stemming so "tracks"/"track" and "playing"/"play" meet
+    return [re.sub(r"(ing|s)$", "", w) if len(w) > 4 else w for w in words]
+
+
+class ToolSelector:
+    """
+    Picks the tools worth binding for one ReAct step.
+
+    Tool names and descriptions are embedded once by warm(), which the app
+    runs on its startup thread; each step ranks tools against the latest user request and binds
+    the top N, plus the toolkit of the selected app, toolkits the request
+    names outright, and any tool already called this turn. Until the
+    embeddings are ready, or if the query embedding misses its time budget,
+    ranking falls back to a BM25-style lexical score. Bound models are
+    cached per subset, so a repeated subset costs nothing to rebind.
+    """
+    CACHE_SIZE = 64
+
+    def __init__(self, toolkits: Dict[str, List], top_n: int = 12, embeddings=None, query_budget_s: float = 0.15):
+        """`embeddings` is an Embeddings instance or a zero-argument factory for one."""
+        self.top_n = top_n
+        self.query_budget_s = query_budget_s
+        self.tools: List[BaseTool] = []
+        self.toolkit_of: Dict[str, str] = {}
+        for toolkit, toolkit_tools in toolkits.items():
+            for t in toolkit_tools:
+                t = t if isinstance(t, BaseTool) else create_tool(t)
+                self.tools.append(t)
+                self.toolkit_of[t.name] = toolkit
+        self.order = {t.name: i for i, t in enumerate(self.tools)}
+        self.texts = [f"{t.name.replace('_', ' ')}: {t.description}" for t in self.tools]
+        # What each tool's schema costs in the prompt, at ~4 characters a token
+        self.schema_tokens = {t.name: len(json.dumps(convert_to_openai_tool(t))) // 4 for t in self.tools}
+        self.total_schema_tokens = sum(self.schema_tokens.values())
+
+        self._keywords = {toolkit: set(tokenize(" ".join(words))) for toolkit, words in TOOLKIT_KEYWORDS.items()}
+        self._documents = [Counter(tokenize(text)) for text in self.texts]
+        frequency = Counter(word for doc in self._documents for word in doc)
+        self._idf = {w: math.log(1 + (len(self.tools) - n + 0.5) / (n + 0.5)) for w, n in frequency.items()}
+
+        self.embeddings = None
+        self._vectors: Optional[np.ndarray] = None
+        self._bound = OrderedDict()
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        self._pending_embeddings = embeddings
+
+    def warm(self):
+        """Embeds the tool descriptions; run it off the request path, e.g. on the startup thread."""
+        embeddings, self._pending_embeddings = self._pending_embeddings, None
+        if embeddings is None:
+            return
+        try:
+            started = time.perf_counter()
+            # A factory is built here, off the import path
+            if not hasattr(embeddings, "embed_documents"):
+                embeddings = embeddings()
+            vectors = np.array(embeddings.embed_documents(self.texts), dtype=np.float32)
+            self.embeddings = embeddings
+            self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            logger.info(f"Embedded {len(self.tools)} tool descriptions in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.warning(f"Tool embeddings unavailable, using lexical tool selection: {e}")
+
+    def _lexical_scores(self, query: str) -> np.ndarray:
+        words = tokenize(query)
+        scores = np.zeros(len(self.tools), dtype=np.float32)
+        for i, doc in enumerate(self._documents):
+            length = sum(doc.values())
+            for w in words:
+                if w in doc:
+                    tf = doc[w]
+                    scores[i] += self._idf[w] * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / 20))
+        return scores
+
+    async def _scores(self, query: str):
+        # Every ReAct step of a turn ranks against the same request
+        if query in self._queries:
+            return self._queries[query]
+        result = await self._rank(query)
+        if result[1] == "embedding" or self._vectors is None:
+            self._queries[query] = result
+            if len(self._queries) > ToolSelector.CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return result
+
+    async def _rank(self, query: str):
+        if self._vectors is not None:
+            try:
+                vector = await asyncio.wait_for(asyncio.to_thread(self.embeddings.embed_query, query), self.query_budget_s)
+                vector = np.asarray(vector, dtype=np.float32)
+                return self._vectors @ (vector / np.linalg.norm(vector)), "embedding"
+            except Exception as e:
+                logger.info(f"Query embedding missed its budget, ranking tools lexically: {e!r}")
+        return self._lexical_scores(query), "lexical"
+
+    async def select(self, query: str, selected_app: str = "", used: Iterable[str] = ()) -> List[str]:
+        """Names of the tools to bind for this step, in the original tool order."""
+        with tracer.span("tools.select") as span:
+            scores, method = await self._scores(query)
+            ranked = [self.tools[i].name for i in np.argsort(-scores)[:self.top_n] if scores[i] > 0]
+
+            chosen = set(ranked) | ALWAYS_BOUND | (set(used) & self.order.keys())
+            words = set(tokenize(f"{query} {selected_app}"))
+            for toolkit, keywords in self._keywords.items():
+                if words & keywords:
+                    chosen |= {name for name, kit in self.toolkit_of.items() if kit == toolkit}
+            names = sorted(chosen & self.order.keys(), key=self.order.get)
+
+            bound_tokens = sum(self.schema_tokens[n] for n in names)
+            span.attributes.update(
+                method=method,
+                bound=len(names),
+                total=len(self.tools),
+                schema_tokens=bound_tokens,
+                saved_tokens=self.total_schema_tokens - bound_tokens,
+            )
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["bound_tools"] += len(names)
+            self._stats["saved_tokens"] += self.total_schema_tokens - bound_tokens
+            self._stats[f"method_{method}"] += 1
+        logger.info(f"Bound {len(names)}/{len(self.tools)} tools ({method}), ~{self.total_schema_tokens - bound_tokens} schema tokens saved")
+        return names
+
+    def bind(self, llm, names: List[str]):
+        """llm.bind_tools() for this subset, cached per (model, subset)."""
+        key = (id(llm), tuple(names))
+        with self._lock:
+            if key in self._bound:
+                self._bound.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return self._bound[key]
+        wanted = set(names)
+        bound = llm.bind_tools([t for t in self.tools if t.name in wanted])
+        with self._lock:
+            self._bound[key] = bound
+            if len(self._bound) > ToolSelector.CACHE_SIZE:
+                self._bound.popitem(last=False)
+        return bound
+
+    def stats(self) -> dict:
+        with self._lock:
+            turns = self._stats["turns"]
+            return {
+                **self._stats,
+                "total_tools": len(self.tools),
+                "total_schema_tokens": self.total_schema_tokens,
+                "avg_bound_tools": self._stats["bound_tools"] / turns if turns else 0.0,
+                "avg_saved_tokens": self._stats["saved_tokens"] / turns if turns else 0.0,
+            }
+
+
+def get_tool_selector(toolkits: Dict[str, List]) -> Optional[ToolSelector]:
+    """
+    Builds the selector from TOOL_SELECTION ("embedding" default, "lexical",
+    or "off" to bind every tool), TOOL_SELECTION_TOP_N and
+    TOOL_SELECTION_EMBEDDING (an embedding backend as in storage.main).
+    """
+    mode = os.getenv("TOOL_SELECTION", "embedding")
+    if mode == "off":
+        return None
+    embeddings = None
+    if mode == "embedding":
+        def embeddings():
+            # storage.main pulls in chromadb and friends, so import it in warm()
+            from storage.main import DEFAULT_EMBEDDING, make_embeddings
+            return make_embeddings(os.getenv("TOOL_SELECTION_EMBEDDING", DEFAULT_EMBEDDING))
+    return ToolSelector(toolkits, top_n=int(os.getenv("TOOL_SELECTION_TOP_N", "12")), embeddings=embeddings)
@@ -0,0 +1,75 @@
+import io
+import logging
+import wave
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import webrtcvad
+except ImportError:  # percentile split instead of VAD frames
+    webrtcvad = None
+
+FRAME_MS = 20
+VAD_RATES = {8000, 16000, 32000, 48000}
+
+
+@dataclass
+class SignalQuality:
+    snr_db: float
+    noise_dbfs: float
+    speech_ratio: float
+
+
+def _dbfs(rms: float) -> float:
+    return 20 * np.log10(max(rms, 1e-9) / 32768.0)
+
+
+def estimate_quality(audio_bytes: bytes, aggressiveness: int = 2) -> Optional[SignalQuality]:
+    """
+    Estimates SNR from 20ms frames of a 16-bit PCM WAV clip: VAD-voiced frames
+    are the signal, the rest the noise floor. Returns None for anything that
+    isn't a WAV we can decode (e.g. webm from the Tauri recorder).
+    """
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wf:
+            if wf.getsampwidth() != 2:
+                return None
+            rate = wf.getframerate()
+            channels = wf.getnchannels()
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    except (wave.Error, EOFError):
+        return None
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    frame_len = int(rate * FRAME_MS / 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames < 5:
+        return None
+
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+
+    voiced = None
+    if webrtcvad is not None and rate in VAD_RATES:
+        vad = webrtcvad.Vad(aggressiveness)
+        voiced = np.array([vad.is_speech(frame.tobytes(), rate) for frame in frames])
+        if voiced.all() or not voiced.any():
+            voiced = None
+    if voiced is None:
+        # No usable VAD split: loudest frames are speech, quietest are the floor
+        threshold = np.percentile(rms, 50)
+        voiced = rms > threshold
+        if not voiced.any():
+            return SignalQuality(snr_db=0.0, noise_dbfs=float(_dbfs(float(rms.mean()))), speech_ratio=0.0)
+
+    speech_rms = float(np.sqrt(np.mean(rms[voiced] ** 2)))
+    noise_rms = float(np.percentile(rms[~voiced], 50))
+    return SignalQuality(
+        snr_db=float(_dbfs(speech_rms) - _dbfs(noise_rms)),
+        noise_dbfs=float(_dbfs(noise_rms)),
+        speech_ratio=float(voiced.mean()),
+    )
@@ -0,0 +1,102 @@
+import io
+import logging
+import wave
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import webrtcvad
+except ImportError:  # fall back to the energy gate alone
+    webrtcvad = None
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = 16000) -> bytes:
+    """Wrap raw int16 mono PCM in a WAV container."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+class StreamingEndpointer:
+    """
+    Server-side end-of-speech detection for audio streamed over /ws/audio.
+
+    Mirrors the wake-word client's adaptive endpointer: the trailing silence
+    that ends an utterance follows the speaker's own pauses, clamped between
+    min_silence_ms and max_silence_ms, and VAD hits at the noise floor count
+    as silence.
+    """
+
+    def __init__(self, sample_rate: int = 16000, chunk_ms: int = 20, aggressiveness: int = 2,
+                 min_silence_ms: int = 350, max_silence_ms: int = 1000,
+                 leading_silence_ms: int = 2500, max_utterance_ms: int = 12000):
+        self.sample_rate = sample_rate
+        self.chunk_ms = chunk_ms
+        self.chunk_bytes = int(sample_rate * chunk_ms / 1000) * 2
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.leading_silence_ms = leading_silence_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.vad = webrtcvad.Vad(aggressiveness) if webrtcvad else None
+
+        self.audio = bytearray()
+        self._consumed = 0
+        self.noise_rms = None
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.elapsed_ms = 0
+        self.typical_pause_ms = 0.0
+        self.ended = False
+
+    @property
+    def threshold_ms(self) -> float:
+        if self.speech_ms == 0:
+            return self.leading_silence_ms
+        return min(self.max_silence_ms, max(self.min_silence_ms, self.typical_pause_ms * 1.5))
+
+    def _is_speech(self, chunk: bytes, rms: float) -> bool:
+        if self.vad is not None:
+            voiced = self.vad.is_speech(chunk, self.sample_rate)
+        else:
+            voiced = rms > 500
+        if voiced and self.noise_rms is not None and rms < self.noise_rms * 2.0:
+            voiced = False
+        return voiced
+
+    def feed(self, pcm: bytes) -> bool:
+        """Append streamed PCM. Returns True once the utterance has ended."""
+        if self.ended:
+            return True
+        self.audio.extend(pcm)
+
+        while len(self.audio) - self._consumed >= self.chunk_bytes:
+            chunk = bytes(self.audio[self._consumed:self._consumed + self.chunk_bytes])
+            self._consumed += self.chunk_bytes
+            samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+            rms = float(np.sqrt(np.mean(samples * samples)))
+
+            if self._is_speech(chunk, rms):
+                if self.speech_ms and self.silence_ms:
+                    self.typical_pause_ms = (
+                        self.silence_ms if self.typical_pause_ms == 0
+                        else 0.7 * self.typical_pause_ms + 0.3 * self.silence_ms
+                    )
+                self.speech_ms += self.chunk_ms
+                self.silence_ms = 0
+            else:
+                self.silence_ms += self.chunk_ms
+                self.noise_rms = rms if self.noise_rms is None else 0.95 * self.noise_rms + 0.05 * rms
+
+            self.elapsed_ms += self.chunk_ms
+            if self.silence_ms >= self.threshold_ms or self.elapsed_ms >= self.max_utterance_ms:
+                self.ended = True
+                break
+        return self.ended
+
+    def wav_bytes(self) -> bytes:
+        return pcm_to_wav(bytes(self.audio), self.sample_rate)
@@ -0,0 +1,94 @@
+"""
+Accuracy and speed of app-name resolution (agent/utils/mapping.py) on
+the names people actually say. By default it runs against a fixed list
+of typical installed apps; --scan uses this machine's /Applications.
+From the backend directory:
+
+    python -m benchmarks.app_names
+    python -m benchmarks.app_names --scan --show
+
+Exits non-zero if any expected resolution is wrong.
+"""
+import argparse
+import sys
+import time
+
+from agent.utils.mapping import APP_NAME_MAPPING, AppNameIndex, scan_applications
+
+INSTALLED = [
+    "Google Chrome", "Safari", "Firefox", "Arc", "Brave Browser", "Visual Studio Code", "Xcode",
+    "Adobe Photoshop 2025", "Adobe Illustrator 2025", "Figma", "Spotify", "Music", "Discord", "Slack",
+    "Notion", "Obsidian", "zoom.us", "Microsoft Word", "Microsoft Excel", "Microsoft PowerPoint",
+    "Microsoft Teams", "WhatsApp", "Telegram", "Messages", "Mail", "FaceTime", "Calendar", "Notes",
+    "System Settings", "Activity Monitor", "Finder", "Preview", "TextEdit", "Terminal", "iTerm",
+    "1Password 7", "Passwords", "Docker", "Postman", "OBS", "VLC", "Raycast", "Photos", "Calculator",
+    "Pages", "Keynote", "Numbers",
+]
+
+# What a user might say -> what `open -a` needs (None: nothing installed matches)
+EXPECTED = {
+    "chrome": "Google Chrome",
+    "visual studio": "Visual Studio Code",
+    "vs code": "Visual Studio Code",
+    "photoshop": "Adobe Photoshop 2025",
+    "photoshop 2025": "Adobe Photoshop 2025",
+    "illustrator": "Adobe Illustrator 2025",
+    "word": "Microsoft Word",
+    "power point": "Microsoft PowerPoint",
+    "teams": "Microsoft Teams",
+    "system preferences": "System Settings",
+    "activity monitor": "Activity Monitor",
+    "spotfy": "Spotify",
+    "discrod": "Discord",
+    "whats app": "WhatsApp",
+    "the notes app": "Notes",
+    "telegram desktop": "Telegram",
+    "zoom": "zoom.us",
+    "1password": "1Password 7",
+    "blender": None,
+    # Not installed, and no installed app is the same thing
+    "gmail": None,
+    "zen browser": None,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scan", action="store_true", help="index this machine's apps instead of the fixed list")
+    parser.add_argument("--show", action="store_true", help="print every resolution")
+    parser.add_argument("--repeat", type=int, default=1000, help="warm lookups per name")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = AppNameIndex(scan=scan_applications if args.scan else lambda: INSTALLED)
+    index.refresh()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    wrong = []
+    cold = []
+    for said, expected in EXPECTED.items():
+        t0 = time.perf_counter()
+        got = index.resolve(said)
+        cold.append(time.perf_counter() - t0)
+        # Against a real machine only the names it has can be checked
+        checkable = not args.scan or expected is None or expected in index.installed
+        if checkable and got != expected:
+            wrong.append(said)
+        if args.show or (checkable and got != expected):
+            print(f"  {said!r:24} -> {got!r}{'' if got == expected else f'  (expected {expected!r})'}")
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for said in EXPECTED:
+            index.resolve(said)
+    warm_us = (time.perf_counter() - t0) / (args.repeat * len(EXPECTED)) * 1e6
+
+    print(f"{len(index.installed)} installed apps, {len(APP_NAME_MAPPING)} aliases, index built in {build_ms:.1f} ms")
+    print(f"first lookup {sum(cold) / len(cold) * 1e6:.0f} us avg, cached {warm_us:.1f} us")
+    print(f"{len(EXPECTED) - len(wrong)}/{len(EXPECTED)} resolved as expected")
+    if wrong:
+        sys.exit(f"wrong: {', '.join(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
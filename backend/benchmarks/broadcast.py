@@ -0,0 +1,133 @@
+"""
+Broadcasts a stream of events to many simulated /ws clients, some of them
+slow, stalled or dead, and reports how long the producer is held up per
+event and how far behind the healthy clients fall. From the backend
+directory:
+
+    python -m benchmarks.broadcast --fast 20 --slow 20 --stalled 5 --dead 5
+
+--sequential replays the same load with the old one-client-at-a-time
+send loop for comparison.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from agent.utils.connection_manager import ConnectionManager
+
+
+class SimulatedClient:
+    """A websocket whose sends take `delay_s`, never finish (stalled) or raise (dead)."""
+
+    def __init__(self, kind: str, delay_s: float = 0.0):
+        self.kind = kind
+        self.delay_s = delay_s
+        self.received = 0
+        self.lags = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.kind == "dead":
+            raise ConnectionResetError("peer went away")
+        if self.kind == "stalled":
+            await asyncio.Event().wait()
+        if self.delay_s:
+            await asyncio.sleep(self.delay_s)
+        message = json.loads(data)
+        self.received += 1
+        if "sent_at" in message["data"]:
+            self.lags.append(time.perf_counter() - message["data"]["sent_at"])
+
+    async def send_json(self, data, mode: str = "text"):
+        await self.send_text(json.dumps(data))
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.closed = True
+
+
+async def send_sequential(clients, event_type: str, data: dict):
+    """The pre-fan-out send loop: each client awaited in turn, failures only logged."""
+    message = {"type": event_type, "data": data}
+    for client in clients:
+        try:
+            await asyncio.wait_for(client.send_json(message), ConnectionManager.SEND_TIMEOUT)
+        except Exception:
+            pass
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(args):
+    clients = (
+        [SimulatedClient("fast") for _ in range(args.fast)]
+        + [SimulatedClient("slow", args.slow_ms / 1000) for _ in range(args.slow)]
+        + [SimulatedClient("stalled") for _ in range(args.stalled)]
+        + [SimulatedClient("dead") for _ in range(args.dead)]
+    )
+    manager = ConnectionManager()
+    if not args.sequential:
+        for client in clients:
+            await manager.connect(client)
+
+    producer = []
+    for i in range(args.events):
+        # Mostly status lines, with a trace event now and then like a real request
+        event_type = "trace" if i % 10 == 0 else "status"
+        data = {"message": f"step {i}", "sent_at": time.perf_counter()}
+        t0 = time.perf_counter()
+        if args.sequential:
+            await send_sequential(clients, event_type, data)
+        else:
+            await manager.send_event(event_type, data)
+        producer.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    # Give the writers a moment to drain before counting
+    await asyncio.sleep(max(0.1, args.slow_ms / 1000 * 2))
+    stats = manager.stats()
+    for client in list(manager.clients):
+        manager.disconnect(client)
+
+    print(f"{'sequential' if args.sequential else 'fan-out'}: {len(clients)} clients, {args.events} events")
+    print(f"  producer wait per event: p50 {percentile(producer, 0.5) * 1000:.2f} ms, "
+          f"p95 {percentile(producer, 0.95) * 1000:.2f} ms, total {sum(producer):.2f} s")
+    for kind in ("fast", "slow", "stalled", "dead"):
+        group = [c for c in clients if c.kind == kind]
+        if not group:
+            continue
+        lags = [lag for c in group for lag in c.lags]
+        print(f"  {kind:<8} received {statistics.mean(c.received for c in group):6.1f}/{args.events}, "
+              f"lag p50 {percentile(lags, 0.5) * 1000:7.2f} ms, p95 {percentile(lags, 0.95) * 1000:7.2f} ms, "
+              f"closed {sum(c.closed for c in group)}/{len(group)}")
+    if not args.sequential:
+        print(f"  manager: {dict(stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fast", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=20)
+    parser.add_argument("--slow-ms", type=float, default=50.0, help="time each slow client takes per send")
+    parser.add_argument("--stalled", type=int, default=5, help="clients whose sends never complete")
+    parser.add_argument("--dead", type=int, default=5, help="clients whose sends raise")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="gap between events")
+    parser.add_argument("--send-timeout", type=float, default=1.0)
+    parser.add_argument("--sequential", action="store_true", help="use the old one-at-a-time send loop")
+    args = parser.parse_args()
+    ConnectionManager.SEND_TIMEOUT = args.send_timeout
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Round-trip latency of YouTube controller calls through the browser bridge.
+By default it runs against the headless FakeDevTools endpoint; point it at
+a real Chrome started with --remote-debugging-port=9222 and a YouTube tab
+open to measure the browser itself. From the backend directory:
+
+    python -m benchmarks.browser --calls 500
+    python -m benchmarks.browser --endpoint http://127.0.0.1:9222
+    python -m benchmarks.browser --applescript "Google Chrome"   # macOS, the per-command osascript path
+
+Only read-only calls (status) are timed unless --methods says otherwise.
+"""
+import argparse
+import time
+
+from agent.utils.browser_bridge import AppleScriptBridge, DevToolsBridge
+from benchmarks import fakes
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", help="DevTools HTTP endpoint of a real browser (default: a FakeDevTools)")
+    parser.add_argument("--applescript", metavar="BROWSER", help="time the AppleScript bridge for this browser instead")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--methods", nargs="+", default=["status"], help="controller methods to cycle through")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated delay per message in the fake")
+    args = parser.parse_args()
+
+    fake = None
+    if args.applescript:
+        bridge = AppleScriptBridge(args.applescript)
+    else:
+        if args.endpoint is None:
+            fake = fakes.FakeDevTools(latency_ms=args.latency_ms).start()
+        bridge = DevToolsBridge(args.endpoint or fake.endpoint)
+
+    started = time.perf_counter()
+    bridge.call("status")
+    connect_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for i in range(args.calls):
+        method = args.methods[i % len(args.methods)]
+        t0 = time.perf_counter()
+        bridge.call(method)
+        latencies.append(time.perf_counter() - t0)
+    if fake is not None:
+        fake.stop()
+
+    print(f"{bridge.name} bridge, {args.calls} calls of {', '.join(args.methods)}")
+    print(f"  first call (connect + inject): {connect_ms:.1f} ms")
+    print(f"  per call: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+          f"max {max(latencies) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+"""
+Offline stand-ins for everything the voice pipeline talks to, so the real
+FastAPI app, graph and tool layer can be replayed on a machine with no
+network, no display and no macOS.
+
+`install()` must run before the app is imported: it puts a stub pyautogui
+in sys.modules (the real one needs a display at import time), replaces the
+subprocess entry points the tools use, and parks a fake ChromaService
+singleton. It also starts a FakeDevTools endpoint for the YouTube tools'
+browser bridge. Every stub counts its calls so a run can report them.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import types
+import uuid
+import wave
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+calls = Counter()
+usage = Counter()
+_real_sleep = time.sleep
+# Gemini only caches prefixes at least this long
+IMPLICIT_MIN_TOKENS = 1024
+# Explicit context caches (name -> cached tokens) and prompt prefixes seen, shared by all fake models
+context_caches: Dict[str, int] = {}
+_seen_prefixes = set()
+
+
+def digest(audio: bytes) -> str:
+    return hashlib.sha256(audio).hexdigest()
+
+
+def synth_wav(seconds: float, seed: int = 0, sample_rate: int = 16000) -> bytes:
+    """A tone burst over low background noise, deterministic per seed."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    signal = rng.normal(0, 60, n)
+    voiced = slice(n // 5, n - n // 5)
+    signal[voiced] += 4000 * np.sin(2 * np.pi * (180 + 20 * seed) * t[voiced])
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(signal.astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+# --- ElevenLabs ---
+
+class FakeElevenLabsClient:
+    """Mimics the parts of elevenlabs.client.ElevenLabs the service uses."""
+
+    def __init__(self, transcripts: Dict[str, str], default: str = "", latency_ms: float = 0.0):
+        self.transcripts = transcripts
+        self.default = default
+        self.latency_ms = latency_ms
+        self.speech_to_text = SimpleNamespace(convert=self._transcribe)
+        self.audio_isolation = SimpleNamespace(convert=self._isolate)
+        self.text_to_speech = SimpleNamespace(convert=self._speak)
+
+    def _wait(self):
+        if self.latency_ms:
+            _real_sleep(self.latency_ms / 1000)
+
+    def _transcribe(self, file, **kwargs):
+        calls["elevenlabs.stt"] += 1
+        self._wait()
+        audio = file.getvalue() if hasattr(file, "getvalue") else file.read()
+        return SimpleNamespace(text=self.transcripts.get(digest(audio), self.default), language_code="eng")
+
+    def _isolate(self, audio, **kwargs):
+        calls["elevenlabs.isolation"] += 1
+        self._wait()
+        data = audio.getvalue() if hasattr(audio, "getvalue") else audio.read()
+        yield data
+
+    def _speak(self, text, **kwargs):
+        calls["elevenlabs.tts"] += 1
+        self._wait()
+        for _ in range(3):
+            yield b"\xff\xfb" + b"\x00" * 416  # an MP3 frame's worth of bytes
+
+
+# --- LLM ---
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Replays fixed tool-call sequences. `scripts` maps a user utterance to its
+    turns: each turn is either a list of {"name", "args"} tool calls or the
+    final text. The turn is picked by counting AI messages since the last
+    human message, so concurrent runs don't share any state. Formatter
+    prompts are answered with the text they were asked to format.
+    """
+    scripts: Dict[str, list] = {}
+    default_reply: str = "Done."
+    latency_ms: float = 0.0
+    prefill_us_per_token: float = 0.0
+    bound_tools: int = 0
+    bound_schema_chars: int = 0
+    bound_signature: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        schemas = [convert_to_openai_tool(t) for t in tools]
+        return self.model_copy(update={
+            "bound_tools": len(schemas),
+            "bound_schema_chars": len(str(schemas)),
+            "bound_signature": digest(json.dumps(schemas, sort_keys=True).encode()),
+        })
+
+    def _reply(self, messages) -> AIMessage:
+        # The selected-app context goes after the conversation; the request is the human message before it
+        last_human = max((i for i, m in enumerate(messages)
+                          if isinstance(m, HumanMessage) and not str(m.content).startswith("Context: ")), default=-1)
+        prompt = messages[last_human].content if last_human >= 0 else ""
+        if "Formatted response:" in prompt:
+            text = prompt.rsplit("Agent's response to format:", 1)[-1].split("Formatted response:")[0].strip()
+            return AIMessage(content=text or self.default_reply)
+
+        turns = self.scripts.get(prompt, [self.default_reply])
+        step = sum(isinstance(m, AIMessage) for m in messages[last_human + 1:])
+        turn = turns[min(step, len(turns) - 1)]
+        if isinstance(turn, str):
+            return AIMessage(content=turn)
+        return AIMessage(content="", tool_calls=[
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{uuid.uuid4().hex[:12]}"}
+            for call in turn
+        ])
+
+    def _cache_read(self, messages, cached_content: Optional[str]) -> int:
+        """
+        Tokens a provider would serve from cache: the explicit cache if one is
+        referenced, else the longest prompt prefix (tools, then whole messages)
+        already sent before, as Gemini's implicit caching does.
+        """
+        if cached_content:
+            return context_caches.get(cached_content, 0)
+        prefix = hashlib.sha256(self.bound_signature.encode())
+        chars, best = self.bound_schema_chars, 0
+        for m in messages:
+            unit = f"{m.type}:{m.content}:{getattr(m, 'tool_calls', '')}"
+            prefix.update(unit.encode())
+            chars += len(str(m.content))
+            key = prefix.hexdigest()
+            if key in _seen_prefixes and chars // 4 >= IMPLICIT_MIN_TOKENS:
+                best = chars // 4
+            _seen_prefixes.add(key)
+        return best
+
+    def _usage(self, messages, message: AIMessage, cached_content: Optional[str] = None) -> dict:
+        # Rough token counts (4 chars/token) so usage shows up on llm.* spans
+        input_tokens = (sum(len(str(m.content)) for m in messages) + self.bound_schema_chars) // 4
+        if cached_content:
+            input_tokens += context_caches.get(cached_content, 0)
+        output_tokens = max(1, len(str(message.content) + str(message.tool_calls)) // 4)
+        cache_read = self._cache_read(messages, cached_content)
+        usage["input_tokens"] += input_tokens
+        usage["cache_read_tokens"] += cache_read
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cache_read},
+        }
+
+    def _prefill(self, usage_metadata: dict):
+        """Simulated time to read the uncached part of the prompt, so a smaller or cached prompt is measurably faster."""
+        if self.prefill_us_per_token:
+            tokens = usage_metadata["input_tokens"] - usage_metadata["input_token_details"]["cache_read"]
+            _real_sleep(tokens * self.prefill_us_per_token / 1e6)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        calls["llm"] += 1
+        message = self._reply(messages)
+        message.usage_metadata = self._usage(messages, message, kwargs.get("cached_content"))
+        self._prefill(message.usage_metadata)
+        if self.latency_ms:
+            _real_sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        """Like Gemini: each tool call arrives whole in its own chunk, spread over latency_ms."""
+        calls["llm"] += 1
+        message = self._reply(messages)
+        usage_metadata = self._usage(messages, message, kwargs.get("cached_content"))
+        self._prefill(usage_metadata)
+        chunks = [
+            AIMessageChunk(content="", tool_call_chunks=[{"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": None}])
+            for c in message.tool_calls
+        ] or [AIMessageChunk(content=message.content)]
+        for chunk in chunks:
+            if self.latency_ms:
+                _real_sleep(self.latency_ms / 1000 / len(chunks))
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage_metadata))
+
+
+class FakeCacheClient:
+    """Stands in for google.genai.Client's context cache API."""
+
+    def __init__(self):
+        self.caches = SimpleNamespace(create=self._create, delete=self._delete)
+
+    def _create(self, model, config):
+        calls["genai.caches.create"] += 1
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        context_caches[name] = (len(config.get("system_instruction") or "") + len(str(config.get("tools") or ""))) // 4
+        return SimpleNamespace(name=name)
+
+    def _delete(self, name):
+        calls["genai.caches.delete"] += 1
+        context_caches.pop(name, None)
+
+
+# --- OS automation ---
+
+class _StubModule(types.ModuleType):
+    """Any attribute is a no-op function that counts its calls."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def stub(*args, **kwargs):
+            calls[f"{self.__name__}.{name}"] += 1
+        setattr(self, name, stub)
+        return stub
+
+
+class FakeProcess:
+    """
+    Popen, as run_process uses it: finishes at once with the canned output
+    fake_run would give, unless the command matches HANGING, in which case
+    it runs until it's killed or communicate() times out.
+    """
+
+    def __init__(self, args, stdin=None, stdout=None, stderr=None, text=False, **kwargs):
+        calls["subprocess.Popen"] += 1
+        self.args = args
+        self.returncode = 0
+        self.pid = 0
+        _update_desktop(args)
+        self.stdin = io.BytesIO() if stdin is not None else None
+        text = text or kwargs.get("universal_newlines")
+        command = " ".join(args) if isinstance(args, (list, tuple)) else str(args)
+        output = next((out for pattern, out in FAKE_STDOUT.items() if pattern in command), "")
+        empty = "" if text else b""
+        self.stdout = io.StringIO(output) if text else io.BytesIO(output.encode())
+        self.stderr = io.StringIO(empty) if text else io.BytesIO(empty)
+        self.hangs = any(pattern in command for pattern in HANGING)
+        self._exited = threading.Event()
+        if not self.hangs:
+            self._exited.set()
+
+    def poll(self):
+        return self.returncode if self._exited.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def communicate(self, input=None, timeout=None):
+        self.wait(timeout)
+        return self.stdout.read(), self.stderr.read()
+
+    def kill(self):
+        if not self._exited.is_set():
+            calls["subprocess.kill"] += 1
+            self.returncode = -9
+            self._exited.set()
+
+    terminate = kill
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Commands (by substring) whose FakeProcess never exits by itself
+HANGING = set()
+# Canned stdout for commands whose output the tools parse, matched by substring
+FAKE_STDOUT = {
+    "output volume of (get volume settings)": "50",
+    "sound volume": "50",
+    "player state": "playing",
+}
+
+
+def fake_run(args, *popenargs, capture_output=False, text=False, **kwargs):
+    calls["subprocess.run"] += 1
+    command = " ".join(args) if isinstance(args, (list, tuple)) else str(args)
+    _update_desktop(args)
+    stdout = next((out for pattern, out in FAKE_STDOUT.items() if pattern in command), "")
+    if not (text or kwargs.get("universal_newlines")):
+        return subprocess.CompletedProcess(args, 0, stdout=stdout.encode(), stderr=b"")
+    return subprocess.CompletedProcess(args, 0, stdout=stdout, stderr="")
+
+
+def fake_check_output(args, *popenargs, text=False, **kwargs):
+    calls["subprocess.check_output"] += 1
+    return "" if text else b""
+
+
+# --- Keyboard and clipboard ---
+
+class FakeInputBackend:
+    """
+    An input backend (for TextInjector and InputActor) driving a pretend
+    desktop with one text field. Typing costs nothing in real time;
+    `elapsed` adds up what it would have taken. Other events can be given a
+    real `latency_ms`, which makes unsynchronized callers interleave.
+    """
+
+    def __init__(self, clipboard: str = "what the user had copied", frontmost: Optional[str] = "Finder",
+                 latency_ms: float = 0.0):
+        self.clipboard = clipboard
+        self.field = ""
+        self.elapsed = 0.0
+        self.front = frontmost
+        self.latency_ms = latency_ms
+        # Every input event in order, e.g. to check that scripts didn't interleave
+        self.events: List[tuple] = []
+
+    def _event(self, *event):
+        calls[f"input.{event[0]}"] += 1
+        self.events.append(event)
+        if self.latency_ms:
+            _real_sleep(self.latency_ms / 1000)
+
+    def activate(self, app: str):
+        self._event("activate", app)
+        self.front = app
+
+    def open(self, app: str, target: Optional[str] = None):
+        self._event("open", app, target)
+        self.front = app
+
+    def frontmost(self) -> Optional[str]:
+        return self.front
+
+    def write(self, text: str, interval: float):
+        self._event("write", text)
+        self.field += text
+        self.elapsed += len(text) * interval
+
+    def hotkey(self, *keys: str):
+        self._event("hotkey", *keys)
+        if keys == ("command", "v"):
+            self.field += self.clipboard
+
+    def press(self, key: str):
+        self._event("press", key)
+        self.field += "\n" if key in ("return", "enter") else ""
+
+    def click(self, x: int, y: int):
+        self._event("click", x, y)
+
+    def paste(self) -> str:
+        return self.clipboard
+
+    def copy(self, text: str):
+        calls["input.copy"] += 1
+        self.clipboard = text
+
+
+# --- Desktop ---
+
+class FakeDesktop:
+    """
+    An AppState source for the harness: a few apps running with our own
+    window in front. The fake `open -a`, activate and quit commands update
+    it, the way workspace notifications would.
+    """
+    pushes = True
+
+    def __init__(self, running=("Finder", "Google Chrome", "frontend"), frontmost: str = "frontend"):
+        self.running = list(running)
+        self.front = frontmost
+        self.state = None
+
+    def start(self, state):
+        self.state = state
+        state.set_running(self.running)
+        state.activated(self.front)
+
+    def stop(self):
+        self.state = None
+
+    def activate(self, app: str):
+        self.front = app
+        if self.state is not None:
+            self.state.activated(app)
+
+    def launch(self, app: str):
+        """`open -g -a`: running, but left behind whatever is in front."""
+        if self.state is not None:
+            self.state.launched(app)
+
+    def quit(self, app: str):
+        if self.state is not None:
+            self.state.terminated(app)
+
+
+desktop = FakeDesktop()
+ACTIVATE_SCRIPT = re.compile(r'tell application "([^"]+)" to activate')
+QUIT_SCRIPT = re.compile(r'quit app "([^"]+)"')
+
+
+def _update_desktop(args):
+    """What a command would have done to the apps, for FakeDesktop and FakeDevTools."""
+    if not isinstance(args, (list, tuple)):
+        return
+    if args[:2] == ["open", "-a"] and len(args) > 2:
+        desktop.activate(args[2])
+        if devtools is not None and "://" in args[-1]:
+            devtools.open(args[-1])
+    elif args[:3] == ["open", "-g", "-a"] and len(args) > 3:
+        desktop.launch(args[3])
+    elif args[:2] == ["osascript", "-e"]:
+        for pattern, update in ((ACTIVATE_SCRIPT, desktop.activate), (QUIT_SCRIPT, desktop.quit)):
+            match = pattern.search(args[2])
+            if match:
+                update(match[1])
+
+
+# --- Browser ---
+
+class FakeVideo:
+    """The <video> element and player buttons of one fake YouTube tab."""
+
+    def __init__(self, title: str = "Lofi hip hop radio"):
+        self.title = title
+        # Named apart from the controller methods below
+        self.paused, self.time, self.duration, self.level, self.muted = False, 42.0, 3600.0, 0.5, False
+        self.is_fullscreen = False
+
+    def status(self):
+        return {"title": self.title, "video": True, "paused": self.paused, "time": self.time,
+                "duration": self.duration, "volume": self.level, "muted": self.muted}
+
+    def play_pause(self):
+        self.paused = not self.paused
+        return "Paused" if self.paused else "Playing"
+
+    def seek(self, seconds, relative=True):
+        self.time = max(0.0, self.time + seconds if relative else seconds)
+        return f"Skipped {'forward' if seconds >= 0 else 'backward'} {abs(seconds)}s" if relative else f"Jumped to {seconds}s"
+
+    def volume(self, delta):
+        self.level = min(1.0, max(0.0, self.level + delta))
+        return "Volume increased" if delta >= 0 else "Volume decreased"
+
+    def mute(self):
+        self.muted = not self.muted
+        return "Muted" if self.muted else "Unmuted"
+
+    def next(self):
+        return "Next video"
+
+    def previous(self):
+        return "Previous video"
+
+    def fullscreen(self):
+        self.is_fullscreen = not self.is_fullscreen
+        return "Entered fullscreen" if self.is_fullscreen else "Exited fullscreen"
+
+    def play_first(self, kind):
+        return f"First {kind} result"
+
+
+class FakeDevTools:
+    """
+    A headless stand-in for Chrome's remote debugging endpoint: /json/list
+    over HTTP and a DevTools websocket per tab that answers Runtime.evaluate
+    for the controller the bridge injects. `open(url)` adds a tab, as the
+    fake `open -a` does.
+    """
+    CALL = re.compile(r"window\.__jarvis \? window\.__jarvis\.(\w+)\(\.\.\.(\[.*?\])\)")
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tabs: Dict[str, dict] = {}
+        self._http = None
+        self._ws = None
+        self.open("https://www.youtube.com/watch?v=jfKfPfyJRdk")
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def open(self, url: str):
+        tab_id = uuid.uuid4().hex
+        self.tabs[tab_id] = {"url": url, "video": FakeVideo(), "installed": False}
+        return tab_id
+
+    def start(self):
+        import http.server
+        import threading
+        from websockets.sync.server import serve
+
+        devtools = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                ws_port = devtools._ws.socket.getsockname()[1]
+                body = json.dumps([
+                    {"id": tab_id, "type": "page", "url": tab["url"], "title": tab["video"].title,
+                     "webSocketDebuggerUrl": f"ws://127.0.0.1:{ws_port}/devtools/page/{tab_id}"}
+                    for tab_id, tab in reversed(devtools.tabs.items())
+                ]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._ws = serve(self._session, "127.0.0.1", 0)
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        threading.Thread(target=self._ws.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._http.shutdown()
+        self._ws.shutdown()
+
+    def _session(self, connection):
+        tab = self.tabs[connection.request.path.rsplit("/", 1)[-1]]
+        for raw in connection:
+            message = json.loads(raw)
+            result = self._handle(tab, message["method"], message.get("params", {}))
+            if self.latency_ms:
+                _real_sleep(self.latency_ms / 1000)
+            connection.send(json.dumps({"id": message["id"], "result": result}))
+
+    def _handle(self, tab: dict, method: str, params: dict) -> dict:
+        calls[f"devtools.{method}"] += 1
+        if method != "Runtime.evaluate":
+            return {}
+        expression = params["expression"]
+        if "window.__jarvis = {" in expression:
+            tab["installed"] = True
+            return {"result": {"type": "string", "value": "installed"}}
+        match = FakeDevTools.CALL.match(expression)
+        if match is None:
+            return {"exceptionDetails": {"text": f"Unsupported expression {expression[:40]}"}}
+        if not tab["installed"]:
+            return {"result": {"type": "string", "value": "__jarvis: not installed"}}
+        value = getattr(tab["video"], match[1])(*json.loads(match[2]))
+        return {"result": {"type": type(value).__name__, "value": value}}
+
+
+devtools: Optional[FakeDevTools] = None
+
+
+# --- RAG ---
+
+class FakeChroma:
+    """Stands in for ChromaService: no embeddings, no watcher, canned passages."""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def reindex_all(self):
+        pass
+
+    def retrieve(self, query: str, collections: Optional[List[str]] = None, k: int = 4):
+        calls["chroma.retrieve"] += 1
+        return [Document(page_content=f"Passage {i} about {query}", metadata={"source": f"fixture-{i}.md"}) for i in range(k)]
+
+
+def install(sleep_scale: float = 0.0):
+    """
+    Installs the stubs process-wide. `sleep_scale` multiplies the fixed
+    sleeps the tools use to wait for apps; 0 skips them so a run measures
+    the pipeline rather than the waits.
+    """
+    sys.modules["pyautogui"] = _StubModule("pyautogui")
+    if "pyperclip" not in sys.modules:
+        try:
+            import pyperclip  # noqa: F401
+        except ImportError:
+            sys.modules["pyperclip"] = _StubModule("pyperclip")
+    sys.modules["pyperclip"].paste = lambda: "Clipboard text"
+    sys.modules["pyperclip"].copy = lambda text: calls.update(["pyperclip.copy"])
+
+    subprocess.run = fake_run
+    subprocess.Popen = FakeProcess
+    subprocess.check_output = fake_check_output
+    subprocess.call = lambda *args, **kwargs: calls.update(["subprocess.call"]) or 0
+
+    if sleep_scale != 1.0:
+        time.sleep = lambda seconds: _real_sleep(seconds * sleep_scale) if sleep_scale else None
+
+    global devtools
+    if devtools is None:
+        devtools = FakeDevTools().start()
+        os.environ["BROWSER_DEVTOOLS_URL"] = devtools.endpoint
+
+    from storage.main import ChromaService
+    ChromaService.instance = FakeChroma()
+
+    # Prefetch warms DNS; keep it off the network
+    from agent.utils.prefetch import prefetcher
+    prefetcher.resolve = lambda host, port: calls.update(["getaddrinfo"]) or []
@@ -0,0 +1,361 @@
+"""
+End-to-end benchmark that replays scripted utterances through the real
+FastAPI app, LangGraph graph and tool layer with every external service
+faked (see benchmarks/fakes.py), so it runs offline on a Linux CI box.
+
+Two modes are measured:
+  upload  POST /api/upload-audio over an in-process ASGI transport, with
+          fake /ws clients attached so event streaming is exercised too
+  graph   create_graph().ainvoke() directly
+Both can keep several requests in flight with --concurrency.
+
+Throughput, latency percentiles and, with --alloc, tracemalloc allocations
+are reported for each pipeline stage using the tracer's span summary.
+From the backend directory:
+
+    python -m benchmarks.harness --iterations 20 --alloc
+    python -m benchmarks.harness --scenarios my_scenarios.json --json run.json
+    python -m benchmarks.harness --baseline run.json --max-regression 0.25
+
+A scenario is {"name", "transcript", "turns", "wav"?}: the fake STT returns
+the transcript for the scenario's audio (a recorded WAV, or a synthetic one)
+and the fake LLM replays the turns (lists of tool calls, then final text).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import fakes
+
+DEFAULT_SCENARIOS = [
+    {
+        "name": "chat",
+        "transcript": "hello jarvis",
+        "turns": ["Hi! What can I do for you?"],
+    },
+    {
+        "name": "volume",
+        "transcript": "turn the volume up a bit",
+        "turns": [[{"name": "adjust_volume", "args": {"change": 10}}], "Turned the volume up by 10."],
+    },
+    {
+        "name": "spotify",
+        "transcript": "open spotify and play some lofi",
+        "turns": [
+            [{"name": "open_macos_app", "args": {"app_name": "Spotify"}}],
+            [{"name": "spotify_play_track", "args": {"query": "lofi"}}],
+            "Opened Spotify and started some lofi.",
+        ],
+    },
+    {
+        "name": "browser",
+        "transcript": "search for mac shortcuts",
+        "turns": [[{"name": "browser_search", "args": {"query": "mac shortcuts", "browser": "Chrome"}}], "Searched Chrome for mac shortcuts."],
+    },
+    {
+        "name": "youtube",
+        "transcript": "pause the video",
+        "turns": [[{"name": "youtube_control_playback", "args": {"action": "play_pause", "browser": "Chrome"}}], "Paused it."],
+    },
+    {
+        "name": "discord",
+        "transcript": "send on my way in discord",
+        "turns": [
+            [{"name": "discord_open", "args": {}}],
+            [{"name": "discord_send_message", "args": {"message": "on my way"}}],
+            "Sent 'on my way' in Discord.",
+        ],
+    },
+    {
+        "name": "rag",
+        "transcript": "when does toby graduate",
+        "turns": [[{"name": "rag", "args": {"question": "when does toby graduate"}}], "Toby graduates in spring."],
+    },
+]
+
+
+class FakeWebSocket:
+    """A /ws client that serializes what it is sent, like the real socket would."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data, mode: str = "text"):
+        await self.send_text(json.dumps(data))
+
+    async def send_text(self, data: str):
+        self.messages += 1
+        self.bytes += len(data)
+
+    async def send_bytes(self, data: bytes):
+        self.messages += 1
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+
+def load_scenarios(path: str = None):
+    scenarios = DEFAULT_SCENARIOS
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            scenarios = json.load(f)
+    for seed, scenario in enumerate(scenarios):
+        if scenario.get("wav"):
+            with open(scenario["wav"], "rb") as f:
+                scenario["audio"] = f.read()
+        else:
+            # Distinct lengths so each scenario's audio hashes differently
+            scenario["audio"] = fakes.synth_wav(1.0 + seed * 0.05, seed=seed)
+    return scenarios
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def setup(scenarios, llm_ms: float, stt_ms: float, sleep_scale: float, prefill_us: float = 0.0, tool_selection: str = "lexical",
+          prompt_cache: str = "explicit"):
+    """Installs the fakes, then imports the app and points it at them."""
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.setdefault("ELEVENLABS_KEY", "offline")
+    os.environ["TRACE_EXPORT_PATH"] = os.environ.get("BENCH_TRACE_EXPORT_PATH", "")
+    os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="bench-tts-"))
+    os.environ["STT_BACKEND"] = "elevenlabs"
+    # Embedding-based selection needs the network
+    os.environ["TOOL_SELECTION"] = tool_selection
+    # The explicit cache client is swapped for a fake below, never a real one
+    os.environ["PROMPT_CACHE"] = "local"
+    fakes.install(sleep_scale=sleep_scale)
+
+    import main as app_module
+    from agent import nodes
+    from agent.tools import rag
+    from agent.utils.app_state import app_state
+
+    app_module.elevenlabs.client = fakes.FakeElevenLabsClient(
+        {fakes.digest(s["audio"]): s["transcript"] for s in scenarios}, latency_ms=stt_ms,
+    )
+    model = fakes.ScriptedChatModel(scripts={s["transcript"]: s["turns"] for s in scenarios},
+                                     latency_ms=llm_ms, prefill_us_per_token=prefill_us)
+    nodes.llm = model
+    nodes.llm_with_tools = model.bind_tools(nodes.tools)
+    # The formatter and RAG tools build their own chat models per call
+    nodes.chat_model = lambda **kwargs: model
+    rag.ChatGoogleGenerativeAI = lambda **kwargs: model
+    if prompt_cache == "explicit":
+        nodes.prompt_cache.client = fakes.FakeCacheClient()
+    app_state.start(fakes.desktop)
+    # Per-request INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+    return app_module
+
+
+def check_trace(app_module, trace_id: str):
+    """Errors recorded on any span of the request, e.g. a tool that raised."""
+    return [f"{s['name']}: {s['error']}" for s in app_module.tracer.trace(trace_id) if s["error"]]
+
+
+async def bench_upload(app_module, scenarios, iterations: int, clients: int, concurrency: int):
+    import httpx
+    from agent.utils.connection_manager import manager
+
+    sockets = [FakeWebSocket() for _ in range(clients)]
+    for ws in sockets:
+        await manager.connect(ws)
+
+    latencies, failures = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def run(index, scenario):
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await client.post(
+                    "/api/upload-audio",
+                    files={"audio": ("utterance.wav", scenario["audio"], "audio/wav")},
+                    # A session per replay: fresh conversation, no queueing behind other runs
+                    params={"toggle_voice": "false", "session_id": f"bench-{index}"},
+                )
+                latencies.append((time.perf_counter() - t0) * 1000)
+                result = response.json()
+                errors = check_trace(app_module, result.get("trace_id", ""))
+                if response.status_code != 200 or not result.get("success") or result.get("transcript") != scenario["transcript"]:
+                    errors.append(f"bad result: {result}")
+                if errors:
+                    failures.append((scenario["name"], errors))
+
+        jobs = [s for _ in range(iterations) for s in scenarios]
+        started = time.perf_counter()
+        await asyncio.gather(*(run(i, s) for i, s in enumerate(jobs)))
+        elapsed = time.perf_counter() - started
+
+    # Let the writer tasks deliver what's queued before counting it
+    while manager.stats()["pending"]:
+        await asyncio.sleep(0.001)
+    for ws in sockets:
+        manager.disconnect(ws)
+    for index in range(len(jobs)):
+        app_module.scheduler.reset(f"bench-{index}")
+    events = sum(ws.messages for ws in sockets) / max(1, len(sockets)) / max(1, len(latencies))
+    return latencies, elapsed, failures, {"concurrency": concurrency, "events_per_request": round(events, 1)}
+
+
+async def bench_graph(app_module, scenarios, iterations: int, concurrency: int):
+    from langchain_core.messages import HumanMessage
+    from agent.graph import create_graph
+    from telemetry.tracing import TracingCallbackHandler
+
+    graph = create_graph()
+    tracer = app_module.tracer
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], []
+
+    async def run(scenario):
+        async with semaphore:
+            t0 = time.perf_counter()
+            with tracer.span("graph.run", scenario=scenario["name"]) as root:
+                result = await graph.ainvoke(
+                    {"messages": [HumanMessage(content=scenario["transcript"])]},
+                    config={"callbacks": [TracingCallbackHandler(tracer)]},
+                )
+            latencies.append((time.perf_counter() - t0) * 1000)
+            errors = check_trace(app_module, root.trace_id)
+            expected = scenario["turns"][-1]
+            if result["messages"][-1].content != expected:
+                errors.append(f"final message {result['messages'][-1].content!r} != {expected!r}")
+            if errors:
+                failures.append((scenario["name"], errors))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(s) for _ in range(iterations) for s in scenarios))
+    return latencies, time.perf_counter() - started, failures, {"concurrency": concurrency}
+
+
+def report(mode: str, latencies, elapsed: float, failures, extra: dict, stages: dict) -> dict:
+    result = {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "failures": len(failures),
+        **extra,
+        "stages": stages,
+    }
+    print(f"\n== {mode}: {result['requests']} requests, {result['throughput_rps']} req/s, "
+          f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms "
+          + " ".join(f"{k}={v}" for k, v in extra.items()))
+    print(f"{'stage':<34}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p50 alloc':>12}")
+    for name, s in sorted(stages.items(), key=lambda item: -item[1]["p50_ms"]):
+        alloc = s.get("p50_alloc_bytes")
+        print(f"{name:<34}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{(f'{alloc / 1024:.1f} KiB' if alloc is not None else '-'):>12}")
+    for name, errors in failures[:10]:
+        print(f"FAILED {name}: {'; '.join(errors)}")
+    return result
+
+
+def compare(results: dict, baseline_path: str, max_regression: float) -> list:
+    """Stages (and totals) whose p95 grew by more than max_regression over the baseline."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for mode, current in results.items():
+        previous = baseline.get(mode)
+        if not previous:
+            continue
+        pairs = [("total", previous["p95_ms"], current["p95_ms"])]
+        pairs += [
+            (stage, previous["stages"][stage]["p95_ms"], stats["p95_ms"])
+            for stage, stats in current["stages"].items() if stage in previous["stages"]
+        ]
+        for stage, before, after in pairs:
+            # Ignore sub-millisecond stages, where noise dominates
+            if after > 1.0 and after > before * (1 + max_regression):
+                regressions.append(f"{mode}/{stage}: p95 {before} -> {after} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", help="JSON file with scenarios (default: built-in set)")
+    parser.add_argument("--modes", nargs="+", default=["upload", "graph"], choices=["upload", "graph"])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--clients", type=int, default=2, help="fake /ws clients in upload mode")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="simulated latency per LLM call")
+    parser.add_argument("--prefill-us", type=float, default=0.0, help="simulated LLM latency per prompt token, in microseconds")
+    parser.add_argument("--tool-selection", default="lexical", choices=["lexical", "off"], help="bind a tool subset per step, or all tools")
+    parser.add_argument("--prompt-cache", default="explicit", choices=["explicit", "local"],
+                        help="fake Gemini context caches, or only the stable prefix for implicit caching")
+    parser.add_argument("--stt-ms", type=float, default=0.0, help="simulated latency per ElevenLabs call")
+    parser.add_argument("--sleep-scale", type=float, default=0.0, help="scale for the tools' fixed sleeps (1 = real)")
+    parser.add_argument("--alloc", action="store_true", help="record allocations per stage with tracemalloc")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    app_module = setup(scenarios, args.llm_ms, args.stt_ms, args.sleep_scale, args.prefill_us, args.tool_selection,
+                       args.prompt_cache)
+    benches = {
+        "upload": lambda n: bench_upload(app_module, scenarios, n, args.clients, args.concurrency),
+        "graph": lambda n: bench_graph(app_module, scenarios, n, args.concurrency),
+    }
+
+    results, failed = {}, False
+    for mode in args.modes:
+        if args.warmup:
+            asyncio.run(benches[mode](args.warmup))
+        app_module.tracer.reset()
+        if args.alloc:
+            tracemalloc.start()
+        latencies, elapsed, failures, extra = asyncio.run(benches[mode](args.iterations))
+        if args.alloc:
+            tracemalloc.stop()
+        results[mode] = report(mode, latencies, elapsed, failures, extra, app_module.tracer.summary())
+        failed = failed or bool(failures)
+
+    from agent.nodes import prompt_cache, tool_selector
+    if tool_selector is not None:
+        stats = tool_selector.stats()
+        print(f"\ntool selection: {stats['avg_bound_tools']:.1f}/{stats['total_tools']} tools bound per step, "
+              f"~{stats['avg_saved_tokens']:.0f} of {stats['total_schema_tokens']} schema tokens saved")
+    if fakes.usage["input_tokens"]:
+        share = fakes.usage["cache_read_tokens"] / fakes.usage["input_tokens"]
+        print(f"prompt cache: {fakes.usage['cache_read_tokens']} of {fakes.usage['input_tokens']} input tokens "
+              f"read from cache ({share:.0%}), {dict(prompt_cache.stats())}")
+    from agent.utils.app_state import app_state
+    from agent.utils.input_actor import input_actor
+    from agent.utils.prefetch import prefetcher
+    print(f"app state: {dict(app_state.stats())}, input actor: {dict(input_actor.stats())}")
+    print(f"prefetch: {dict(prefetcher.stats())}")
+    print("\nstub calls:", ", ".join(f"{name}={count}" for name, count in sorted(fakes.calls.items())))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print("REGRESSION", line)
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
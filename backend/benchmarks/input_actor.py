@@ -0,0 +1,97 @@
+"""
+Several threads send Discord-style scripts (activate, focus, type, send)
+at the same time against a fake desktop, once through the InputActor and
+once calling the backend directly as the tools used to. Reports how many
+scripts had someone else's keystrokes land in the middle of them, how many
+activations were skipped, and the wall time. From the backend directory:
+
+    python -m benchmarks.input_actor --threads 8 --scripts 20
+    python -m benchmarks.input_actor --direct   # the old, unsynchronized way
+
+Exits non-zero if a script run through the actor was interleaved.
+"""
+import argparse
+import sys
+import threading
+import time
+
+from agent.utils.input_actor import InputActor, activate, press, write
+from benchmarks import fakes
+
+
+def script(worker: int, n: int, apps: int):
+    app = f"App{worker % apps}"
+    # Short enough to be typed, so each message is one write event
+    message = f"msg {n} w{worker}"
+    return app, [activate(app), press("tab"), write(message), press("return")]
+
+
+def run_direct(backend, actions):
+    """What each tool did before: activate and sleep, then keys, with nothing stopping other threads."""
+    for action in actions:
+        if action.kind == "activate":
+            backend.activate(*action.args)
+            time.sleep(InputActor.ACTIVATE_SETTLE)
+        elif action.kind == "type":
+            backend.write(action.args[0], action.kwargs["interval"])
+        else:
+            getattr(backend, action.kind)(*action.args)
+
+
+def interleaved(events, expected) -> int:
+    """Scripts whose events aren't one contiguous run in the event log."""
+    broken = 0
+    for app, message in expected:
+        at = events.index(("write", message))
+        # tab, write, return must be back to back, after our app came to front
+        front = next((e[1] for e in reversed(events[:at]) if e[0] == "activate"), None)
+        if events[at - 1] != ("press", "tab") or events[at + 1] != ("press", "return") or front != app:
+            broken += 1
+    return broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--scripts", type=int, default=20, help="scripts per thread")
+    parser.add_argument("--apps", type=int, default=2, help="distinct apps the threads target")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="time each fake input event takes")
+    parser.add_argument("--direct", action="store_true", help="call the backend from each thread, unsynchronized")
+    args = parser.parse_args()
+
+    backend = fakes.FakeInputBackend(latency_ms=args.latency_ms)
+    actor = InputActor(backend)
+    # Keep the run short; the fake brings apps forward instantly anyway
+    InputActor.ACTIVATE_SETTLE = 0.005
+    expected = []
+
+    def worker(i):
+        for n in range(args.scripts):
+            app, actions = script(i, n, args.apps)
+            expected.append((app, actions[2].args[0]))
+            if args.direct:
+                run_direct(backend, actions)
+            else:
+                actor.run(*actions)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    broken = interleaved(backend.events, expected)
+    activations = sum(1 for e in backend.events if e[0] == "activate")
+    print(f"{'direct' if args.direct else 'actor'}: {len(expected)} scripts from {args.threads} threads in {elapsed:.2f} s")
+    print(f"  interleaved scripts: {broken}")
+    print(f"  activations: {activations} run, {len(expected) - activations} skipped")
+    if not args.direct:
+        print(f"  actor: {actor.stats()}")
+        if broken:
+            sys.exit("scripts run through the actor were interleaved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Runs requests that would otherwise never finish through the real pipeline
+(fake STT, scripted LLM, stubbed subprocess) and checks that each limit
+stops them, how quickly, and that the hanging process got killed:
+
+    runaway     the model keeps calling a tool       -> MAX_REACT_STEPS
+    hung tool   a tool's osascript never exits       -> TOOL_TIMEOUT
+    stop        "stop" while that tool is running    -> cancellation
+    deadline    the turn outlives TURN_DEADLINE      -> deadline
+    disconnect  the client goes away mid-request     -> cancellation
+
+From the backend directory:
+
+    python -m benchmarks.limits
+    python -m benchmarks.limits --tool-timeout 1 --deadline 2 --cancel-after 0.5
+
+Exits non-zero if a request wasn't stopped the way it should have been,
+or the runaway one ran other than MAX_REACT_STEPS tool calls.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from io import BytesIO
+
+from benchmarks import fakes, harness
+
+RUNAWAY = "keep turning it up"
+HUNG = "set the volume to fifty"
+SCENARIOS = [
+    # The last turn repeats, so this model never stops calling tools
+    {"name": "runaway", "transcript": RUNAWAY, "turns": [[{"name": "adjust_volume", "args": {"change": 1}}]]},
+    {"name": "hung", "transcript": HUNG, "turns": [[{"name": "set_volume", "args": {"level": 50}}], "Volume set."]},
+]
+
+
+# Tool calls the executor started, early-dispatched or not
+tool_runs = Counter()
+
+
+async def run_case(app_module, scenario, session_id: str, interrupt=None):
+    """process_utterance for a scenario, awaited through `interrupt(work)` if given. Returns (result, ms, llm calls, tool calls, kills)."""
+    calls_before, tools_before, kills_before = fakes.calls["llm"], sum(tool_runs.values()), fakes.calls["subprocess.kill"]
+    started = time.perf_counter()
+    work = app_module.process_utterance(BytesIO(scenario["audio"]), session_id=session_id)
+    result = await (interrupt(work) if interrupt else work)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return (result, elapsed_ms, fakes.calls["llm"] - calls_before, sum(tool_runs.values()) - tools_before,
+            fakes.calls["subprocess.kill"] - kills_before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tool-timeout", type=float, default=0.5, help="TOOL_TIMEOUT for the hung-tool case, seconds")
+    parser.add_argument("--deadline", type=float, default=1.0, help="TURN_DEADLINE for the deadline case, seconds")
+    parser.add_argument("--cancel-after", type=float, default=0.3, help="when stop and disconnect happen, seconds")
+    args = parser.parse_args()
+
+    scenarios = [{**s, "audio": fakes.synth_wav(1.0 + i * 0.05, seed=i)} for i, s in enumerate(SCENARIOS)]
+    app_module = harness.setup(scenarios, llm_ms=0.0, stt_ms=0.0, sleep_scale=0.0)
+    from agent.graph import MAX_REACT_STEPS
+    from agent.utils.tool_executor import ToolCallExecutor
+    runaway, hung = scenarios
+    relaxed_tool_timeout, relaxed_deadline = 30.0, 30.0
+
+    invoke = ToolCallExecutor.invoke
+
+    async def counted_invoke(self, call, config=None):
+        tool_runs[call["name"]] += 1
+        return await invoke(self, call, config)
+
+    ToolCallExecutor.invoke = counted_invoke
+
+    async def stop_later(work):
+        task = asyncio.ensure_future(work)
+        await asyncio.sleep(args.cancel_after)
+        app_module.scheduler.preempt("stop")
+        return await task
+
+    async def leave_later():
+        await asyncio.sleep(args.cancel_after)
+        return True
+
+    async def run():
+        rows = []
+
+        def record(name, outcome, expected, elapsed_ms, llm_calls, tools, kills, want_kill, want_tools=None):
+            ok = outcome == expected and (kills > 0 or not want_kill) and want_tools in (None, tools)
+            rows.append((name, outcome, elapsed_ms, llm_calls, tools, kills, ok))
+
+        result, ms, llm, tools, kills = await run_case(app_module, runaway, "runaway")
+        record("runaway", result.get("error", "finished"), "step limit", ms, llm, tools, kills, want_kill=False,
+               want_tools=MAX_REACT_STEPS)
+
+        # From here the volume osascript runs until something kills it
+        fakes.HANGING.add("set volume output volume")
+
+        ToolCallExecutor.DEFAULT_TIMEOUT = args.tool_timeout
+        result, ms, llm, tools, kills = await run_case(app_module, hung, "hung")
+        record("hung tool", "finished" if result.get("success") else result.get("error"), "finished", ms, llm, tools, kills, want_kill=True)
+        ToolCallExecutor.DEFAULT_TIMEOUT = relaxed_tool_timeout
+
+        result, ms, llm, tools, kills = await run_case(app_module, hung, "stop", interrupt=stop_later)
+        record("stop", "cancelled" if result.get("cancelled") else "not cancelled", "cancelled", ms, llm, tools, kills, want_kill=True)
+
+        app_module.TURN_DEADLINE = args.deadline
+        result, ms, llm, tools, kills = await run_case(app_module, hung, "deadline")
+        record("deadline", result.get("error", "finished"), "deadline exceeded", ms, llm, tools, kills, want_kill=True)
+        app_module.TURN_DEADLINE = relaxed_deadline
+
+        result, ms, llm, tools, kills = await run_case(
+            app_module, hung, "disconnect", interrupt=lambda work: app_module.cancel_on_disconnect(work, leave_later()))
+        record("disconnect", "cancelled" if result.get("disconnected") else "not cancelled", "cancelled", ms, llm, tools, kills, want_kill=True)
+        # Cancelled tools' threads finish once their process is killed
+        await asyncio.sleep(0.1)
+        return rows
+
+    rows = asyncio.run(run())
+    print(f"MAX_REACT_STEPS={MAX_REACT_STEPS}, TOOL_TIMEOUT={args.tool_timeout}s, TURN_DEADLINE={args.deadline}s, "
+          f"stop/disconnect after {args.cancel_after}s")
+    print(f"{'case':12} {'outcome':18} {'ms':>8} {'llm calls':>10} {'tool calls':>11} {'killed':>7}")
+    for name, outcome, ms, llm, tools, kills, ok in rows:
+        print(f"{name:12} {outcome:18} {ms:8.0f} {llm:10d} {tools:11d} {kills:7d}{'' if ok else '  FAIL'}")
+    print(f"limits: {dict(app_module.limits)}")
+    failed = [row[0] for row in rows if not row[-1]]
+    if failed:
+        sys.exit(f"not stopped as expected: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
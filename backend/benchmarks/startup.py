@@ -0,0 +1,85 @@
+"""
+Measures how long `import main` takes and where the time goes, using
+Python's -X importtime in a fresh interpreter. From the backend directory:
+
+    python -m benchmarks.startup --top 20
+    python -m benchmarks.startup --tool-loading eager   # the old behaviour
+
+--stub-gui puts empty pyautogui/pyperclip modules in place first, for
+machines without a display where the real ones can't be imported.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+# Modules that used to load at import and should now wait for first use or the startup thread
+HEAVY = ["pyautogui", "pyperclip", "chromadb", "langchain_chroma", "watchdog", "PyPDF2", "elevenlabs", "langchain_google_genai"]
+
+STUB_GUI = """
+import sys, types
+for name in ("pyautogui", "pyperclip"):
+    sys.modules[name] = types.ModuleType(name)
+"""
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print("STARTUP " + json.dumps({"import_s": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(tool_loading: str, stub_gui: bool):
+    env = {**os.environ, "TOOL_LOADING": tool_loading}
+    env.setdefault("GOOGLE_API_KEY", "offline")
+    heavy = [m for m in HEAVY if not (stub_gui and m in ("pyautogui", "pyperclip"))]
+    code = (STUB_GUI if stub_gui else "") + PROBE % (heavy,)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True)
+    summary = next((json.loads(line[len("STARTUP "):]) for line in proc.stdout.splitlines() if line.startswith("STARTUP ")), None)
+    if summary is None:
+        sys.exit(f"import main failed:\n{proc.stderr[-2000:]}")
+
+    # Lines come children first, indented two spaces per level
+    self_us = defaultdict(int)
+    children, direct = [], []
+    for match in LINE.finditer(proc.stderr):
+        own, cumulative, depth, module = int(match[1]), int(match[2]), len(match[3]) // 2, match[4]
+        self_us[module.split(".")[0]] += own
+        if depth == 1:
+            children.append((cumulative, module))
+        elif depth == 0:
+            if module == "main":
+                direct = children
+            children = []
+    return summary, self_us, direct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tool-loading", default="lazy", choices=["lazy", "eager"])
+    parser.add_argument("--stub-gui", action="store_true", help="stub pyautogui/pyperclip (headless machines)")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    summary, self_us, direct = measure(args.tool_loading, args.stub_gui)
+    print(f"import main ({args.tool_loading} tools): {summary['import_s'] * 1000:.0f} ms")
+    print(f"heavy modules loaded at import: {', '.join(summary['loaded']) or 'none'}")
+
+    print(f"\n{'package (self time, all submodules)':<44}{'ms':>9}")
+    for package, us in sorted(self_us.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<44}{us / 1000:>9.1f}")
+
+    print(f"\n{'imported by main (cumulative)':<44}{'ms':>9}")
+    for cumulative, module in sorted(direct, reverse=True)[:args.top]:
+        print(f"{module:<44}{cumulative / 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Runs WAV fixtures through each STT backend and reports latency and word
+error rate. Each fixture is <name>.wav with the reference transcript in
+<name>.txt next to it. From the backend directory:
+
+    python -m benchmarks.stt path/to/fixtures --backends fake local elevenlabs
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import time
+from io import BytesIO
+
+from stt.providers import FakeSTT, get_stt_provider
+
+
+def normalize(text: str):
+    return re.sub(r"[^a-z0-9' ]", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Word-level Levenshtein distance
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_fixtures(directory: str):
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.exists(txt_path):
+            continue
+        with open(wav_path, "rb") as f:
+            audio = f.read()
+        with open(txt_path, "r", encoding="utf-8") as f:
+            reference = f.read().strip()
+        fixtures.append((os.path.basename(wav_path), audio, reference))
+    return fixtures
+
+
+def make_provider(backend: str, fixtures):
+    if backend == "fake":
+        # Scripted with the references, so it measures harness overhead only
+        return FakeSTT({FakeSTT.digest(audio): reference for _, audio, reference in fixtures})
+    if backend == "elevenlabs":
+        from elabs.main import ElevenLabsService
+        return get_stt_provider(ElevenLabsService(), backend)
+    return get_stt_provider(backend=backend)
+
+
+def run(backend: str, fixtures, repeat: int):
+    provider = make_provider(backend, fixtures)
+    latencies, errors = [], []
+    # Untimed warm-up so model loading isn't counted
+    provider.transcribe(BytesIO(fixtures[0][1]))
+    for _ in range(repeat):
+        for name, audio, reference in fixtures:
+            started = time.perf_counter()
+            transcript = provider.transcribe(BytesIO(audio))
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors.append(word_error_rate(reference, transcript.text))
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{backend:>12}: p50 {statistics.median(latencies):8.1f} ms  p95 {p95:8.1f} ms  "
+          f"WER {statistics.mean(errors) * 100:5.1f}%  ({len(latencies)} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures")
+    parser.add_argument("--backends", nargs="+", default=["fake", "local"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        raise SystemExit(f"No <name>.wav + <name>.txt pairs in {args.fixtures}")
+    for backend in args.backends:
+        run(backend, fixtures, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
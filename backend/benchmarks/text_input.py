@@ -0,0 +1,60 @@
+"""
+Checks and times TextInjector against a fake keyboard and clipboard: the
+text must land in the field intact and the clipboard must be restored.
+Typing time is what pyautogui.write would take at the given interval;
+pasting is measured for real (it waits for the app to read the clipboard).
+From the backend directory:
+
+    python -m benchmarks.text_input
+    python -m benchmarks.text_input --interval 0.05
+
+Exits non-zero if any case comes out wrong.
+"""
+import argparse
+import sys
+import time
+
+from agent.utils.text_input import TextInjector
+from benchmarks import fakes
+
+CASES = {
+    "short": "on my way",
+    "sentence": "Running ten minutes late, start without me and I'll catch up.",
+    "500 chars": ("The quick brown fox jumps over the lazy dog. " * 12)[:500],
+    "non-ASCII": "Café at 3? 🎉 ça marche",
+    "multi-line": "Shopping list\nmilk\neggs",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds per typed character")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'case':<12}{'chars':>7}  {'method':<8}{'typed before ms':>17}{'now ms':>10}  result")
+    for name, text in CASES.items():
+        backend = fakes.FakeInputBackend()
+        original = backend.clipboard
+        injector = TextInjector(backend)
+        started = time.perf_counter()
+        method = injector.insert(text, interval=args.interval)
+        took = time.perf_counter() - started + backend.elapsed
+
+        problems = []
+        if backend.field != text:
+            problems.append(f"field has {backend.field!r}")
+        if backend.clipboard != original:
+            problems.append(f"clipboard left as {backend.clipboard[:20]!r}")
+        # Per-character typing is all there was before, and it can't type non-ASCII
+        before = "impossible" if not text.isascii() else f"{len(text) * args.interval * 1000:.0f}"
+        print(f"{name:<12}{len(text):>7}  {method:<8}{before:>17}{took * 1000:>10.0f}  {'; '.join(problems) or 'ok'}")
+        if problems:
+            failures.append(name)
+
+    if failures:
+        sys.exit(f"failed: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
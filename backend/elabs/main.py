@@ -1,9 +1,19 @@
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-from elevenlabs.play import play
+from elabs.cache import TTSCache
+from audio.quality import estimate_quality
+from telemetry.tracing import tracer
 import logging
 import os
+import contextvars
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
 
 load_dotenv()
 
@@ -14,34 +24,299 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text, min_chars=20):
+    """Splits text into sentences, merging very short ones into the next so each request is worth it"""
+    sentences = []
+    pending = ""
+    for part in SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {part}".strip() if pending else part.strip()
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        sentences.append(pending)
+    return sentences
+
+
+class AudioSegment:
+    """MP3 bytes for one sentence, filled in by a synthesis worker while the player drains it"""
+    def __init__(self):
+        self._chunks = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def put(self, chunk):
+        self._chunks.put(chunk)
+
+    def finish(self):
+        self._chunks.put(None)
+
+    def __iter__(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None or self.cancelled.is_set():
+                return
+            yield chunk
+
+
+class AudioPlayer:
+    """
+    Non-blocking MP3 player. Each queued utterance is a list of AudioSegments
+    piped back-to-back into one ffplay process, so playback starts as soon as
+    the first bytes of the first sentence arrive. stop() interrupts the
+    current utterance and drops anything queued.
+    """
+    # Tell ffplay the format up front so it doesn't buffer stdin to probe it
+    COMMAND = [
+        "ffplay", "-autoexit", "-nodisp", "-loglevel", "quiet",
+        "-f", "mp3", "-probesize", "32", "-analyzeduration", "0", "-fflags", "nobuffer",
+        "-i", "-",
+    ]
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._proc = None
+        self._segments = []
+        self._thread = threading.Thread(target=self._run, name="tts-player", daemon=True)
+        self._thread.start()
+
+    def play(self, segments):
+        with self._lock:
+            self._queue.put((self._generation, segments))
+
+    def stop(self):
+        with self._lock:
+            self._generation += 1
+            for segment in self._segments:
+                segment.cancelled.set()
+                segment.finish()
+            if self._proc and self._proc.poll() is None:
+                self._proc.kill()
+        # Drop utterances queued behind the current one
+        while True:
+            try:
+                _, segments = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            for segment in segments:
+                segment.cancelled.set()
+
+    def _run(self):
+        while True:
+            generation, segments = self._queue.get()
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                if shutil.which(AudioPlayer.COMMAND[0]) is None:
+                    logger.error("ffplay not found; install ffmpeg to hear responses")
+                    continue
+                self._proc = subprocess.Popen(AudioPlayer.COMMAND, stdin=subprocess.PIPE)
+                self._segments = segments
+            proc = self._proc
+            try:
+                for segment in segments:
+                    for chunk in segment:
+                        if generation != self._generation:
+                            break
+                        proc.stdin.write(chunk)
+                        proc.stdin.flush()
+                proc.stdin.close()
+                proc.wait()
+            except (BrokenPipeError, OSError):
+                pass  # interrupted
+            finally:
+                with self._lock:
+                    self._segments = []
+
+
 class ElevenLabsService:
+    VOICE_ID = "iP95p4xoKVk53GoZ742B"
+    TTS_MODEL_ID = "eleven_flash_v2_5"
+    OUTPUT_FORMAT = "mp3_44100_128"
+    TTS_WORKERS = 4
+    # Clips cleaner than this skip the audio isolation round-trip
+    ISOLATION_SNR_DB = float(os.getenv("ISOLATION_SNR_DB", "18"))
+    ISOLATION_NOISE_DBFS = float(os.getenv("ISOLATION_NOISE_DBFS", "-45"))
+
     def __init__(self):
-        self.client = ElevenLabs(api_key=os.getenv("ELEVENLABS_KEY"))
-    
-    def stt(self, audio_data):
-        audio = bytearray()
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.player = AudioPlayer()
+        self.cache = TTSCache(directory=os.getenv("TTS_CACHE_DIR", ".tts_cache"))
+        self._tts_pool = ThreadPoolExecutor(max_workers=ElevenLabsService.TTS_WORKERS, thread_name_prefix="tts")
+        # Optional on_audio(header, chunk), called from the synthesis threads with each MP3 chunk
+        self.on_audio = None
+        self.stt_metrics = {
+            "clips": 0,
+            "isolation_runs": 0,
+            "isolation_skipped": 0,
+            "isolation_failures": 0,
+            "isolation_seconds": 0.0,
+        }
+
+    @property
+    def client(self):
+        """The ElevenLabs SDK client, imported and built on first use (or by warm())"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from elevenlabs.client import ElevenLabs
+                    self._client = ElevenLabs(api_key=os.getenv("ELEVENLABS_KEY"))
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def warm(self):
+        """Builds the SDK client ahead of the first request"""
+        return self.client
+
+    def needs_isolation(self, audio_bytes):
+        """Only noisy clips (or ones we can't analyse) go through audio isolation"""
+        quality = estimate_quality(audio_bytes)
+        if quality is None:
+            return True
+        noisy = quality.snr_db < ElevenLabsService.ISOLATION_SNR_DB or quality.noise_dbfs > ElevenLabsService.ISOLATION_NOISE_DBFS
+        logger.info(f"Clip SNR {quality.snr_db:.1f} dB, noise {quality.noise_dbfs:.1f} dBFS -> isolation {'on' if noisy else 'off'}")
+        return noisy
+
+    def isolate(self, audio_data):
+        """Runs audio isolation, falling back to the original clip on failure"""
+        started = time.perf_counter()
+        self.stt_metrics["isolation_runs"] += 1
         try:
+            audio = bytearray()
             for chunk in self.client.audio_isolation.convert(audio=audio_data):
                 audio.extend(chunk)
-            audio = BytesIO(audio)
-        except:
+            return BytesIO(audio)
+        except Exception:
+            logger.exception("Audio isolation failed; transcribing the original clip")
+            self.stt_metrics["isolation_failures"] += 1
+            audio_data.seek(0)
+            return audio_data
+        finally:
+            self.stt_metrics["isolation_seconds"] += time.perf_counter() - started
+
+    def stt(self, audio_data, diarize=False):
+        self.stt_metrics["clips"] += 1
+        with tracer.span("stt.quality"):
+            noisy = self.needs_isolation(audio_data.getvalue())
+        if noisy:
+            with tracer.span("stt.isolation"):
+                audio = self.isolate(audio_data)
+        else:
+            self.stt_metrics["isolation_skipped"] += 1
             audio = audio_data
-        transcription = self.client.speech_to_text.convert(
-            file=audio,
-            model_id="scribe_v1", # Model to use, for now only "scribe_v1" is supported
-            language_code="eng", # Language of the audio file. If set to None, the model will detect the language automatically.
-            diarize=True, # Whether to annotate who is speaking
-        )
+        with tracer.span("stt.transcription", diarize=diarize):
+            transcription = self.client.speech_to_text.convert(
+                file=audio,
+                model_id="scribe_v1", # Model to use, for now only "scribe_v1" is supported
+                language_code="eng", # Language of the audio file. If set to None, the model will detect the language automatically.
+                diarize=diarize, # Whether to annotate who is speaking (off for single-speaker commands)
+            )
         return transcription
 
-    def tts(self, text):
-        audio = self.client.text_to_speech.convert(
+    def _cache_key(self, text):
+        return TTSCache.key(text, ElevenLabsService.VOICE_ID, ElevenLabsService.TTS_MODEL_ID, ElevenLabsService.OUTPUT_FORMAT)
+
+    def _convert(self, text):
+        return self.client.text_to_speech.convert(
             text=text,
-            voice_id="iP95p4xoKVk53GoZ742B",
-            model_id="eleven_flash_v2_5",
-            output_format="mp3_44100_128",
-        ) 
-        play(audio)
+            voice_id=ElevenLabsService.VOICE_ID,
+            model_id=ElevenLabsService.TTS_MODEL_ID,
+            output_format=ElevenLabsService.OUTPUT_FORMAT,
+        )
+
+    def _emit(self, header, chunk):
+        if self.on_audio is not None:
+            try:
+                self.on_audio({**header, "format": ElevenLabsService.OUTPUT_FORMAT}, chunk)
+            except Exception:
+                logger.exception("Audio listener failed")
+
+    def _synthesize(self, text, segment, header):
+        key = self._cache_key(text)
+        seq = 0
+        try:
+            with tracer.span("tts.synthesize", chars=len(text)) as span:
+                cached = self.cache.get(key)
+                span.attributes["cached"] = cached is not None
+                if cached is not None:
+                    segment.put(cached)
+                    self._emit({**header, "seq": seq}, cached)
+                    seq += 1
+                    return
+
+                audio = bytearray()
+                for chunk in self._convert(text):
+                    if segment.cancelled.is_set():
+                        return
+                    if not audio:
+                        span.attributes["first_chunk_ms"] = round(span.duration_ms, 1)
+                    segment.put(chunk)
+                    self._emit({**header, "seq": seq}, chunk)
+                    seq += 1
+                    audio.extend(chunk)
+                self.cache.put(key, bytes(audio))
+        except Exception:
+            logger.exception(f"TTS failed for: {text!r}")
+        finally:
+            segment.finish()
+            self._emit({**header, "seq": seq, "end": True}, b"")
+
+    def tts(self, text):
+        """
+        Speaks text without blocking: sentences are synthesised in parallel and
+        played back-to-back as soon as the first one starts arriving.
+        """
+        sentences = split_sentences(text)
+        utterance = uuid.uuid4().hex[:12]
+        segments = []
+        for index, sentence in enumerate(sentences):
+            segment = AudioSegment()
+            header = {"utterance": utterance, "segment": index, "segments": len(sentences)}
+            # Carry the request's trace into the worker thread
+            self._tts_pool.submit(contextvars.copy_context().run, self._synthesize, sentence, segment, header)
+            segments.append(segment)
+        if segments:
+            self.player.play(segments)
+
+    def metrics(self):
+        runs = self.stt_metrics["isolation_runs"]
+        return {
+            **self.stt_metrics,
+            "isolation_rate": runs / self.stt_metrics["clips"] if self.stt_metrics["clips"] else 0.0,
+            "isolation_avg_seconds": self.stt_metrics["isolation_seconds"] / runs if runs else 0.0,
+        }
+
+    def prewarm(self, phrases):
+        """Synthesises phrases into the cache ahead of time. Returns how many were new."""
+        synthesised = 0
+        for phrase in phrases:
+            key = self._cache_key(phrase)
+            if self.cache.contains(key):
+                continue
+            self.cache.put(key, b"".join(self._convert(phrase)))
+            synthesised += 1
+        return synthesised
+
+    def tts_metrics(self):
+        """How often a spoken sentence came from the cache instead of ElevenLabs."""
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_hit_rate": self.cache.hits / lookups if lookups else 0.0,
+        }
+
+    def interrupt(self):
+        """Stops current playback, e.g. when a new wake word fires"""
+        self.player.stop()
 
     def mp3_to_bytes(self, path):
         with open(path, "rb") as f:
@@ -0,0 +1,23 @@
+"""
+Synthesises the fixed confirmation phrases into the TTS cache so they play
+instantly. Run once after install, from the backend directory:
+
+    python -m elabs.prewarm
+"""
+import logging
+
+from agent.utils.status_text import TOOL_COMPLETE_MESSAGES, spoken_phrase
+from elabs.main import ElevenLabsService
+
+logger = logging.getLogger(__name__)
+
+
+def prewarm_phrases():
+    # Exactly what get_spoken_confirmation has the service say
+    return sorted({spoken_phrase(phrase) for phrase in TOOL_COMPLETE_MESSAGES.values()})
+
+
+if __name__ == "__main__":
+    service = ElevenLabsService()
+    synthesised = service.prewarm(prewarm_phrases())
+    logger.info(f"Cached {synthesised} new phrases in {service.cache.directory}")
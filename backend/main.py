@@ -1,20 +1,47 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
 from io import BytesIO
-from storage.main import ChromaService
 from elabs.main import ElevenLabsService
-from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, Request, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from agent.graph import create_graph
+from agent.graph import MAX_REACT_STEPS, RECURSION_LIMIT, create_graph
+from agent.nodes import get_llm, prompt_cache, tool_selector
+from agent.tools.tools import preload_toolkits
 import logging
 from langchain_core.messages import HumanMessage
+from langgraph.errors import GraphRecursionError
+from agent.utils.app_state import app_state
+from agent.utils.cancellation import cancellation_scope
 from agent.utils.connection_manager import manager
+from agent.utils.input_actor import input_actor
+from agent.utils.mapping import app_index
+from agent.utils.prefetch import prefetcher
+from agent.utils.scheduler import RequestCancelled, SessionScheduler, is_stop_command
+from agent.utils.status_text import get_spoken_confirmation, get_tool_action_text, get_tool_complete_text
+from audio.stream import StreamingEndpointer
+from stt.providers import get_stt_provider
+from telemetry.tracing import tracer, TracingCallbackHandler
 
 app = FastAPI()
 logger = logging.getLogger("uvicorn")
 elevenlabs = ElevenLabsService()
-chroma_service = ChromaService.get_instance()
+stt_provider = get_stt_provider(elevenlabs)
+# Built in the background at startup, see start_services()
+chroma_service = None
 graph = create_graph()
 # save_graph_visualization()
-conversation_history = []
+# Per-session conversation history and request queue
+scheduler = SessionScheduler()
+# Wall-clock budget for one request's graph run, once it's its turn
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "60"))
+# How often an upload checks that its client is still there
+DISCONNECT_POLL = 0.5
+# Requests stopped by the deadline, the step limit or a client going away
+limits = Counter()
 
 # CORS middleware to allow requests from Tauri app
 app.add_middleware(
@@ -25,139 +52,364 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def start_chroma():
+    global chroma_service
+    from storage.main import ChromaService
+    chroma_service = ChromaService.get_instance()
+    chroma_service.start()
+
+def start_services():
+    """Imports the toolkits and builds the heavy clients, so /ping answers before they're ready"""
+    steps = (
+        ("app state", app_state.start),
+        ("app name index", app_index.start),
+        ("Gemini client", get_llm),
+        ("toolkits", preload_toolkits),
+        ("ElevenLabs client", elevenlabs.warm),
+        ("file watcher", start_chroma),
+        # Last: it calls the embedding API, and selection works lexically until it's done
+        ("tool embeddings", tool_selector.warm if tool_selector else lambda: None),
+    )
+    for name, start in steps:
+        started = time.perf_counter()
+        try:
+            start()
+            logger.info(f"✅ {name} ready in {time.perf_counter() - started:.2f}s.")
+        except Exception:
+            logger.exception(f"Failed to start {name}")
+
 @app.on_event("startup")
 def on_startup():
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
-    chroma_service.start()
-    logger.info("✅ File watcher started in background.")
+    threading.Thread(target=start_services, name="startup", daemon=True).start()
 
 @app.on_event("shutdown")
 def on_shutdown():
-    chroma_service.stop()
+    app_state.stop()
+    app_index.stop()
+    prompt_cache.close()
+    if chroma_service is not None:
+        chroma_service.stop()
 
 # Health check endpoint
 @app.get("/ping")
 def ping():
     return {"message": "pong"}
 
+# Pipeline metrics
+@app.get("/metrics")
+def metrics():
+    return {
+        "stt": {"provider": stt_provider.name, **stt_provider.metrics()},
+        "tts": elevenlabs.tts_metrics(),
+        "stages": tracer.summary(),
+        "scheduler": scheduler.stats(),
+        "tools": tool_selector.stats() if tool_selector else {"selection": "off"},
+        "prompt_cache": prompt_cache.stats(),
+        "websocket": manager.stats(),
+        "input": input_actor.stats(),
+        "apps": app_state.stats(),
+        "prefetch": prefetcher.stats(),
+        "limits": dict(limits),
+    }
+
 # WebSocket endpoint
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, topics: str = ""):
+    # topics: comma-separated (status, transcript, trace, window-control, audio); default all but audio
+    await manager.connect(websocket, topics)
     try:
         while True:
             data = await websocket.receive_text()
-            logger.info(f"Received from client: {data}")
+            manager.touch(websocket)
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = {}
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "subscribe":
+                manager.subscribe(websocket, message.get("topics", []), replace=message.get("replace", False))
+            elif kind == "unsubscribe":
+                manager.unsubscribe(websocket, message.get("topics", []))
+            # Heartbeat replies are just proof of life
+            elif kind != "pong":
+                logger.info(f"Received from client: {data}")
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
-def get_tool_action_text(tool_name: str, args: dict) -> str:
-    """Generate human-readable action text for tool calls"""
-    tool_messages = {
-        "open_app": f"Opening {args.get('app_name', 'application')}",
-        "close_app": f"Closing {args.get('app_name', 'application')}",
-        "search": f"Searching for '{args.get('query', 'information')}'",
-        "open_url": f"Opening {args.get('url', 'URL')}",
-        "type_text": f"Typing text",
-        "press_key": f"Pressing {args.get('key', 'key')}",
-        "set_volume": f"Setting volume to {args.get('level', 'specified level')}",
-        "create_note": f"Creating note",
-    }
-    return tool_messages.get(tool_name, f"Executing {tool_name}")
-
-def get_tool_complete_text(tool_name: str) -> str:
-    """Generate completion message for tools"""
-    complete_messages = {
-        "open_app": "Application opened",
-        "close_app": "Application closed",
-        "search": "Search completed",
-        "open_url": "URL opened",
-        "type_text": "Text typed",
-        "press_key": "Key pressed",
-        "set_volume": "Volume adjusted",
-        "create_note": "Note created",
-    }
-    return complete_messages.get(tool_name, f"{tool_name} completed")
+async def process_utterance(audio_raw: BytesIO, toggle_voice: str = "", session_id: str = "default", preempt: bool = False) -> dict:
+    """
+    Runs STT and then the agent graph on one utterance, streaming status over /ws.
+    STT runs straight away; the graph waits its turn in the session's queue.
+    """
+    trace_id = tracer.current_trace_id()
+    # A new utterance means the user has moved on from whatever is being spoken
+    elevenlabs.interrupt()
+    # A polling app-state source samples now and keeps sampling quickly while we work
+    app_state.request_started()
 
-# Audio upload endpoint with WebSocket streaming
-@app.post("/api/upload-audio")
-async def upload_audio(audio: UploadFile = File(...), toggle_voice: str = ""):
-    global conversation_history
-    try:
-        audio_bytes = await audio.read()
-        audio_raw = BytesIO(audio_bytes)
-        logger.info("Audio bytes read: %d bytes", len(audio_bytes))
-        
-        # Notify frontend that STT is starting
-        await manager.send_event("status", {"message": "Processing audio..."})
-        
-        stt_response = elevenlabs.stt(audio_raw)
-        logger.info(f"STT response: {stt_response}")
-        
-        # Send transcript to frontend
-        await manager.send_event("status", {"message": f"You said: {stt_response.text}"})
-        
-        conversation_history.append(HumanMessage(content=stt_response.text))
+    async def send_status(message):
+        await manager.send_event("status", {"message": message, "trace_id": trace_id, "session_id": session_id})
+
+    await manager.send_event("trace", {"trace_id": trace_id, "phase": "start"})
+
+    # Notify frontend that STT is starting
+    await send_status("Processing audio...")
+    
+    with tracer.span("stt", provider=stt_provider.name):
+        stt_response = await stt_provider.atranscribe(audio_raw)
+    logger.info(f"STT response: {stt_response}")
+    
+    # Send transcript to frontend
+    await manager.send_event("transcript", {"text": stt_response.text, "final": True, "trace_id": trace_id, "session_id": session_id})
+    await send_status(f"You said: {stt_response.text}")
+
+    # "Stop" while something is running aborts it rather than going to the agent
+    if is_stop_command(stt_response.text) and scheduler.session(session_id).busy:
+        cancelled = scheduler.preempt(session_id)
+        await send_status("Stopped.")
+        return {"transcript": stt_response.text, "success": True, "cancelled": cancelled, "trace_id": trace_id}
+    if preempt:
+        scheduler.preempt(session_id)
+
+    # Start launching the apps the request will likely need while it queues and the LLM decides
+    prefetch = prefetcher.start(stt_response.text, scheduler.session(session_id).history)
+
+    async def run_graph(session):
+        # Tools started under this token are stopped along with the request
+        with cancellation_scope():
+            await asyncio.wait_for(stream_graph(session), TURN_DEADLINE)
+
+    async def stream_graph(session):
+        messages = session.history + [HumanMessage(content=stt_response.text)]
         
         # Track tools used for summary
         tools_used = []
+        # (name, output) of each tool that finished, for the spoken confirmation
+        tool_results = []
         
         # Stream events from the graph
-        async for event in graph.astream_events(
-            {"messages": conversation_history},
-            version="v2"
-        ):
-            kind = event["event"]
-            
-            # When agent decides to call a tool
-            if kind == "on_chat_model_end":
-                output = event["data"]["output"]
-                if hasattr(output, 'tool_calls') and output.tool_calls:
-                    for tool_call in output.tool_calls:
-                        tool_name = tool_call["name"]
-                        args = tool_call["args"]
-                        action_text = get_tool_action_text(tool_name, args)
-                        
-                        tools_used.append({"name": tool_name, "action": action_text})
-                        
-                        await manager.send_event("status", {
-                            "message": action_text
-                        })
-            
-            # When a tool finishes executing
-            elif kind == "on_tool_end":
-                tool_name = event["name"]
-                complete_text = get_tool_complete_text(tool_name)
+        with tracer.span("graph", session_id=session_id):
+            async for event in graph.astream_events(
+                # The app the user was in when they spoke, if it's being tracked
+                {"messages": messages, "selected_app": app_state.current_app()},
+                config={"callbacks": [TracingCallbackHandler(tracer)], "recursion_limit": RECURSION_LIMIT},
+                version="v2"
+            ):
+                kind = event["event"]
                 
-                await manager.send_event("status", {
-                    "message": complete_text
-                })
-            
-            # When the entire graph finishes
-            elif kind == "on_chain_end" and event["name"] == "LangGraph":
-                result = event["data"]["output"]
-                conversation_history = result["messages"]
-                final_message = result["messages"][-1]
-                
-                logger.info(f"Final message: {final_message.content}")
-                if toggle_voice == 'true':
-                    elevenlabs.tts(final_message.content)
+                # When agent decides to call a tool
+                if kind == "on_chat_model_end":
+                    output = event["data"]["output"]
+                    if hasattr(output, 'tool_calls') and output.tool_calls:
+                        for tool_call in output.tool_calls:
+                            tool_name = tool_call["name"]
+                            args = tool_call["args"]
+                            action_text = get_tool_action_text(tool_name, args)
+                            
+                            tools_used.append({"name": tool_name, "action": action_text})
+                            prefetch.tool_called(tool_name)
+                            
+                            await send_status(action_text)
                 
-                # # Create summary of actions
-                # if tools_used:
-                #     summary = "Task completed. " + ", ".join([t["action"] for t in tools_used])
-                # else:
-                #     summary = "Task completed"
+                # When a tool finishes executing
+                elif kind == "on_tool_end":
+                    tool_name = event["name"]
+                    output = event["data"].get("output")
+                    tool_results.append((tool_name, str(getattr(output, "content", output))))
+                    complete_text = get_tool_complete_text(tool_name)
+                    
+                    await send_status(complete_text)
                 
-                await manager.send_event("status", {
-                    "message": final_message.content 
-                })
-        
-        return {"transcript": stt_response.text, "success": True}
-        
-    except Exception as e:
-        logger.exception("Error during audio upload")
-        await manager.send_event("status", {"message": f"Error: {str(e)}"})
-        return {"success": False, "error": str(e)}
+                # When the entire graph finishes
+                elif kind == "on_chain_end" and event["name"] == "LangGraph":
+                    result = event["data"]["output"]
+                    # Only a completed run makes it into the conversation
+                    session.history = result["messages"]
+                    final_message = result["messages"][-1]
+                    
+                    logger.info(f"Final message: {final_message.content}")
+                    if toggle_voice == 'true':
+                        # A plain action's confirmation is prewarmed, so it plays without a synthesis round trip
+                        elevenlabs.tts(get_spoken_confirmation(tool_results) or final_message.content)
+                    
+                    # # Create summary of actions
+                    # if tools_used:
+                    #     summary = "Task completed. " + ", ".join([t["action"] for t in tools_used])
+                    # else:
+                    #     summary = "Task completed"
+                    
+                    await send_status(final_message.content)
+
+    try:
+        await scheduler.run(session_id, run_graph, trace_id=trace_id)
+    except RequestCancelled:
+        await send_status("Cancelled.")
+        return {"transcript": stt_response.text, "success": False, "cancelled": True, "trace_id": trace_id}
+    except asyncio.TimeoutError:
+        limits["turn_deadline"] += 1
+        logger.warning(f"Request {trace_id} ran past its {TURN_DEADLINE:g}s deadline")
+        await send_status("That took too long, so I stopped.")
+        return {"transcript": stt_response.text, "success": False, "error": "deadline exceeded", "trace_id": trace_id}
+    except GraphRecursionError:
+        limits["step_limit"] += 1
+        logger.warning(f"Request {trace_id} hit the {MAX_REACT_STEPS}-step limit")
+        await send_status(f"I stopped after {MAX_REACT_STEPS} steps without finishing.")
+        return {"transcript": stt_response.text, "success": False, "error": "step limit", "trace_id": trace_id}
     finally:
-        await audio.close()
\ No newline at end of file
+        prefetch.settle()
+    
+    return {"transcript": stt_response.text, "success": True, "trace_id": trace_id}
+
+async def cancel_on_disconnect(work, disconnected) -> dict:
+    """
+    Awaits work (a process_utterance call), cancelling it if the
+    `disconnected` coroutine finishes first, i.e. the client went away or
+    asked to cancel. That result's "disconnected" says whether it's gone.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(disconnected)
+    try:
+        await asyncio.wait([task, watcher], return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if task.done():
+        return task.result()
+    task.cancel()
+    gone = bool(watcher.result())
+    limits["disconnected" if gone else "client_cancelled"] += 1
+    logger.info(f"Client {'went away' if gone else 'cancelled'}; stopping its request")
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return {"success": False, "cancelled": True, "disconnected": gone}
+
+async def request_disconnected(request: Request) -> bool:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL)
+    return True
+
+async def websocket_disconnected(websocket: WebSocket) -> bool:
+    """Returns True when the client disconnects, False when it sends {"type": "cancel"}."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return True
+        try:
+            if message.get("text") and json.loads(message["text"]).get("type") == "cancel":
+                return False
+        except (ValueError, AttributeError):
+            pass
+
+async def report_queue_position(session_id, trace_id, position):
+    await manager.send_event("queue", {"session_id": session_id, "trace_id": trace_id, "position": position})
+
+scheduler.on_queue = report_queue_position
+
+# TTS audio goes to clients subscribed to the audio topic as binary frames
+elevenlabs.on_audio = lambda header, chunk: manager.send_binary_threadsafe("audio", header, chunk)
+
+def client_trace_id(value):
+    """Accepts a W3C-style 32 hex digit trace id from the client, else starts a new trace"""
+    if value and len(value) == 32 and all(c in "0123456789abcdef" for c in value.lower()):
+        return value.lower()
+    return None
+
+def record_client_spans(headers, root):
+    """Adds the wake-word client's capture and upload timings to the request trace"""
+    try:
+        sent_at_ns = int(headers["x-sent-at"]) * 1_000_000
+        capture_ns = int(float(headers["x-capture-ms"]) * 1_000_000)
+    except (KeyError, ValueError):
+        return
+    tracer.record("wordwake.capture", sent_at_ns - capture_ns, sent_at_ns)
+    tracer.record("wordwake.upload", sent_at_ns, max(sent_at_ns, root.start_ns))
+
+async def publish_trace(trace_id):
+    """Sends the finished trace to the frontend for the timing waterfall; the spans ride as a binary payload"""
+    await manager.send_binary("trace", {"trace_id": trace_id, "phase": "end"}, json.dumps(tracer.trace(trace_id)).encode("utf-8"))
+
+# Called by the wake-word client as soon as the wake word fires
+@app.post("/api/interrupt")
+def interrupt():
+    elevenlabs.interrupt()
+    return {"success": True}
+
+# Cancels the running request and anything queued behind it in a session
+@app.post("/api/cancel")
+async def cancel(session_id: str = "default"):
+    elevenlabs.interrupt()
+    return {"success": True, "cancelled": scheduler.preempt(session_id)}
+
+# Audio upload endpoint with WebSocket streaming
+@app.post("/api/upload-audio")
+async def upload_audio(request: Request, audio: UploadFile = File(...), toggle_voice: str = "", session_id: str = "default", preempt: bool = False):
+    with tracer.span("request", trace_id=client_trace_id(request.headers.get("x-trace-id")), transport="upload") as root:
+        try:
+            record_client_spans(request.headers, root)
+            with tracer.span("upload.read"):
+                audio_bytes = await audio.read()
+            audio_raw = BytesIO(audio_bytes)
+            logger.info("Audio bytes read: %d bytes", len(audio_bytes))
+            result = await cancel_on_disconnect(process_utterance(audio_raw, toggle_voice, session_id, preempt),
+                                                request_disconnected(request))
+            
+        except Exception as e:
+            logger.exception("Error during audio upload")
+            await manager.send_event("status", {"message": f"Error: {str(e)}", "trace_id": root.trace_id})
+            result = {"success": False, "error": str(e), "trace_id": root.trace_id}
+        finally:
+            await audio.close()
+    await publish_trace(root.trace_id)
+    return result
+
+# Streaming audio endpoint: the wake-word client sends raw PCM frames from the
+# moment the wake word fires, and the server decides when the utterance ends
+@app.websocket("/ws/audio")
+async def stream_audio(websocket: WebSocket, toggle_voice: str = "", sample_rate: int = 16000, encoding: str = "pcm_s16le", trace_id: str = "", session_id: str = "default", preempt: bool = False):
+    await websocket.accept()
+    # The stream opens when the wake word fires, so cut off any reply still playing
+    elevenlabs.interrupt()
+    if encoding != "pcm_s16le":
+        await websocket.close(code=1003, reason=f"Unsupported encoding: {encoding}")
+        return
+
+    endpointer = StreamingEndpointer(sample_rate=sample_rate)
+    try:
+        with tracer.span("request", trace_id=client_trace_id(trace_id), transport="stream") as root:
+            with tracer.span("stream.capture"):
+                while not endpointer.ended:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        # Client fell back to a regular upload; don't process twice
+                        logger.info("Audio stream dropped before endpoint (%d bytes)", len(endpointer.audio))
+                        return
+                    if message.get("bytes"):
+                        endpointer.feed(message["bytes"])
+                    elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                        endpointer.ended = True
+
+            await websocket.send_json({"type": "endpoint", "audio_ms": endpointer.elapsed_ms})
+            logger.info("Streamed utterance ended after %d ms", endpointer.elapsed_ms)
+            try:
+                result = await cancel_on_disconnect(
+                    process_utterance(BytesIO(endpointer.wav_bytes()), toggle_voice, session_id, preempt),
+                    websocket_disconnected(websocket),
+                )
+            except Exception as e:
+                logger.exception("Error during streamed audio")
+                await manager.send_event("status", {"message": f"Error: {str(e)}", "trace_id": root.trace_id})
+                result = {"success": False, "error": str(e), "trace_id": root.trace_id}
+        await publish_trace(root.trace_id)
+        if result.get("disconnected"):
+            return
+        await websocket.send_json({"type": "result", **result})
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Audio stream client disconnected")
@@ -1,8 +1,12 @@
 import os
-import time
+import json
+import fnmatch
 import threading
 import logging
 import csv
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 import PyPDF2
 from watchdog.observers import Observer
@@ -17,42 +21,137 @@ logger = logging.getLogger("chroma_watcher")
 
 load_dotenv()
 
+DEFAULT_EMBEDDING = "google:models/gemini-embedding-001"
+SUPPORTED_EXTENSIONS = {".txt", ".md", ".pdf", ".csv"}
+
+
+@dataclass
+class FolderPolicy:
+    """One watched root and the rules used to index it."""
+    path: str
+    collection: str
+    include: Tuple[str, ...] = ("*",)
+    exclude: Tuple[str, ...] = (".*", "*/.*", "*~", "~$*", "*/~$*")
+    max_bytes: int = 20 * 1024 * 1024
+    embedding: str = DEFAULT_EMBEDDING
+    root: str = field(init=False)
+
+    def __post_init__(self):
+        self.root = os.path.abspath(os.path.expanduser(self.path))
+        self.include = tuple(self.include)
+        self.exclude = tuple(self.exclude)
+
+    def owns(self, abs_path: str) -> bool:
+        return abs_path == self.root or abs_path.startswith(self.root + os.sep)
+
+    def accepts(self, abs_path: str) -> bool:
+        """
+        Cheap pre-read filter: extension, include/exclude globs and file size.
+        Only touches the path string and a single stat() call.
+        """
+        if os.path.splitext(abs_path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return False
+
+        rel_path = os.path.relpath(abs_path, self.root).replace(os.sep, "/")
+        name = os.path.basename(abs_path)
+
+        def matches(patterns):
+            return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+        if not matches(self.include) or matches(self.exclude):
+            return False
+
+        try:
+            size = os.stat(abs_path).st_size
+        except OSError:
+            return False
+        if size > self.max_bytes:
+            logger.info(f"Skipping {abs_path}: {size} bytes exceeds limit of {self.max_bytes}")
+            return False
+        return True
+
+
+def make_embeddings(backend: str):
+    """
+    Builds an embedding function from a "<provider>:<model>" string,
+    e.g. "google:models/gemini-embedding-001" or "openai:text-embedding-3-small".
+    """
+    provider, _, model = backend.partition(":")
+    if provider == "google":
+        return GoogleGenerativeAIEmbeddings(model=model)
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
 class ChromaService:
     instance = None
     RAW_PATH = "files"
     DB_PATH = ".vector_db"
     COLLECTION_NAME = "GIRIS_FILES"
+    # JSON file with a list of FolderPolicy fields, e.g.
+    # [{"path": "~/Documents/notes", "collection": "NOTES", "include": ["*.md"]}]
+    FOLDERS_ENV = "CHROMA_FOLDERS"
+    INDEX_WORKERS = 2
+    QUERY_WORKERS = 4
+    REINDEX_DELAY = 1
+
+    _instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
+        # Built on a startup thread; a request that needs it first waits here
         if not ChromaService.instance:
-            ChromaService.instance = ChromaService()
+            with ChromaService._instance_lock:
+                if not ChromaService.instance:
+                    ChromaService.instance = ChromaService()
         return ChromaService.instance
 
-    def __init__(self):
-        self.collection_name = ChromaService.COLLECTION_NAME
-
-        # --- Initialize embeddings and vector store ---
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-        self.vector_store = Chroma(
-            collection_name=ChromaService.COLLECTION_NAME,
-            embedding_function=self.embeddings,
-            persist_directory=ChromaService.DB_PATH,
-        )
+    @staticmethod
+    def load_folders() -> List[FolderPolicy]:
+        """Reads folder policies from CHROMA_FOLDERS, defaulting to the local files/ folder."""
+        config_path = os.getenv(ChromaService.FOLDERS_ENV)
+        if not config_path:
+            return [FolderPolicy(path=ChromaService.RAW_PATH, collection=ChromaService.COLLECTION_NAME)]
+        with open(config_path, "r", encoding="utf-8") as f:
+            return [FolderPolicy(**entry) for entry in json.load(f)]
+
+    def __init__(self, folders: Optional[List[FolderPolicy]] = None):
+        self.folders = folders or ChromaService.load_folders()
+        # Most specific root first so nested folders win
+        self.folders.sort(key=lambda p: len(p.root), reverse=True)
+
+        # --- Initialize embeddings and one vector store per collection ---
+        self._embeddings = {}
+        self.vector_stores: Dict[str, Chroma] = {}
+        for policy in self.folders:
+            if policy.collection in self.vector_stores:
+                continue
+            if policy.embedding not in self._embeddings:
+                self._embeddings[policy.embedding] = make_embeddings(policy.embedding)
+            self.vector_stores[policy.collection] = Chroma(
+                collection_name=policy.collection,
+                embedding_function=self._embeddings[policy.embedding],
+                persist_directory=ChromaService.DB_PATH,
+            )
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,   # number of characters per chunk
             chunk_overlap=200  # overlap between chunks to preserve context
         )
 
-        # --- Watcher state ---
+        # --- Watcher state (one observer and one indexing pool for every folder) ---
         self._observer = None
         self._reindex_pending = {}
         self._reindex_lock = threading.Lock()
+        self._index_pool = ThreadPoolExecutor(max_workers=ChromaService.INDEX_WORKERS, thread_name_prefix="chroma-index")
+        self._query_pool = ThreadPoolExecutor(max_workers=ChromaService.QUERY_WORKERS, thread_name_prefix="chroma-query")
 
-        # Ensure watch folder exists
-        if not os.path.exists(ChromaService.RAW_PATH):
-            os.makedirs(ChromaService.RAW_PATH)
-            logger.info(f"Created watch directory: {ChromaService.RAW_PATH}")
+        # Ensure watch folders exist
+        for policy in self.folders:
+            if not os.path.exists(policy.root):
+                os.makedirs(policy.root)
+                logger.info(f"Created watch directory: {policy.root}")
 
     # ---------------- Watcher Event Handler ----------------
     class _ReindexHandler(FileSystemEventHandler):
@@ -67,62 +166,127 @@ class ChromaService:
             if not event.is_directory:
                 self.service._schedule_reindex(event.src_path)
 
+        def on_moved(self, event):
+            if not event.is_directory:
+                self.service._delete_file(event.src_path)
+                self.service._schedule_reindex(event.dest_path)
+
         def on_deleted(self, event):
             if not event.is_directory:
                 self.service._delete_file(event.src_path)
 
     # ---------------- Internal Methods ----------------
-    def _schedule_reindex(self, path, delay=1):
+    def _policy_for(self, abs_path) -> Optional[FolderPolicy]:
+        for policy in self.folders:
+            if policy.owns(abs_path):
+                return policy
+        return None
+
+    def _schedule_reindex(self, path, delay=None):
         abs_path = os.path.abspath(path)
+        policy = self._policy_for(abs_path)
+        if policy is None or not policy.accepts(abs_path):
+            return
         with self._reindex_lock:
             if abs_path in self._reindex_pending:
                 return
-            self._reindex_pending[abs_path] = True
-
-        def delayed():
-            time.sleep(delay)
-            self.reindex_file(abs_path)
-            with self._reindex_lock:
-                self._reindex_pending.pop(abs_path, None)
-
-        threading.Thread(target=delayed, daemon=True).start()
+            # Debounce bursts of events, then hand the work to the shared pool
+            timer = threading.Timer(
+                ChromaService.REINDEX_DELAY if delay is None else delay,
+                lambda: self._index_pool.submit(self._run_reindex, abs_path),
+            )
+            timer.daemon = True
+            self._reindex_pending[abs_path] = timer
+        timer.start()
+
+    def _run_reindex(self, abs_path):
+        with self._reindex_lock:
+            self._reindex_pending.pop(abs_path, None)
+        self.reindex_file(abs_path)
 
     def _delete_file(self, path):
         abs_path = os.path.abspath(path)
-        self.vector_store.delete(where={"source": abs_path})
-        logger.info(f"Deleted file from vector store: {abs_path}")
+        policy = self._policy_for(abs_path)
+        if policy is None:
+            return
+        self.vector_stores[policy.collection].delete(where={"source": abs_path})
+        logger.info(f"Deleted file from {policy.collection}: {abs_path}")
 
     def chunk_document(self, text, metadata):
         texts = self.text_splitter.split_text(text)
         logger.info(f"Chunked {metadata['source']} into {len(texts)} chunks!")
         return [Document(page_content=t, metadata=metadata) for t in texts]
 
+    def _search_collection(self, collection, query, k):
+        return self.vector_stores[collection].similarity_search(query, k=k)
+
     # ---------------- Public Methods ----------------
 
-    def retrieve(self, query):
-        return self.vector_store.similarity_search(query)
+    def retrieve(self, query, collections: Optional[List[str]] = None, k: int = 4):
+        """
+        Searches the given collections (all by default) in parallel and merges
+        the results with reciprocal rank fusion, since distances from different
+        embedding backends are not comparable. Raises ValueError for a
+        collection that no configured folder indexes into.
+        """
+        names = collections or list(self.vector_stores)
+        unknown = [name for name in names if name not in self.vector_stores]
+        if unknown:
+            raise ValueError(f"Unknown collection(s) {', '.join(unknown)}; known: {', '.join(self.vector_stores)}")
+        if len(names) == 1:
+            return self._search_collection(names[0], query, k)
+
+        futures = {name: self._query_pool.submit(self._search_collection, name, query, k) for name in names}
+        scored = []
+        for name, future in futures.items():
+            try:
+                docs = future.result()
+            except Exception as e:
+                logger.exception(f"Query failed for collection {name}: {e}")
+                continue
+            for rank, doc in enumerate(docs):
+                doc.metadata.setdefault("collection", name)
+                scored.append((1.0 / (60 + rank), doc))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [doc for _, doc in scored[:k]]
 
     def reindex_file(self, path):
-        """Reindex a single file into Chroma"""
+        """Reindex a single file into the collection that owns it"""
+        path = os.path.abspath(path)
+        policy = self._policy_for(path)
+        if policy is None or not policy.accepts(path):
+            return
         try:
+            vector_store = self.vector_stores[policy.collection]
             text = self.read_content(path)
             if not text.strip():
                 logger.info(f"No text extracted from {path}, skipping.")
                 return
             # Delete old vectors for this file
-            self.vector_store.delete(where={"source": path})
+            vector_store.delete(where={"source": path})
 
-            # Create a Document
-            # doc = Document(page_content=text, metadata={"source": path})
-            document_chunks = self.chunk_document(text, metadata={"source": path})
+            document_chunks = self.chunk_document(text, metadata={"source": path, "collection": policy.collection})
 
             # Add to vector store
             uuids = [str(uuid4()) for i in range(len(document_chunks))]
-            self.vector_store.add_documents(document_chunks, ids=uuids)
-            logger.info(f"Reindexed file: {path}")
+            vector_store.add_documents(document_chunks, ids=uuids)
+            logger.info(f"Reindexed file into {policy.collection}: {path}")
         except Exception as e:
             logger.exception(f"Failed to reindex {path}: {e}")
 
+    def reindex_all(self):
+        """Queue every accepted file in every watched folder for indexing"""
+        futures = []
+        for policy in self.folders:
+            for root, _, files in os.walk(policy.root):
+                for fname in files:
+                    file_path = os.path.join(root, fname)
+                    if self._policy_for(file_path) is policy and policy.accepts(file_path):
+                        futures.append(self._index_pool.submit(self.reindex_file, file_path))
+        for future in futures:
+            future.result()
+        return len(futures)
+
     def read_content(self, path):
         ext = os.path.splitext(path)[1].lower()
         if ext in {".txt", ".md"}:
@@ -149,9 +313,10 @@ class ChromaService:
         """Start the file watcher in background"""
         handler = self._ReindexHandler(self)
         self._observer = Observer()
-        self._observer.schedule(handler, ChromaService.RAW_PATH, recursive=True)
+        for policy in self.folders:
+            self._observer.schedule(handler, policy.root, recursive=True)
+            logger.info(f"Watching {policy.root} -> {policy.collection}")
         self._observer.start()
-        logger.info(f"Started watcher on: {ChromaService.RAW_PATH}")
 
     def stop(self):
         """Stop the watcher"""
@@ -160,6 +325,10 @@ class ChromaService:
             self._observer.join()
             self._observer = None
             logger.info("Stopped watcher.")
+        with self._reindex_lock:
+            for timer in self._reindex_pending.values():
+                timer.cancel()
+            self._reindex_pending.clear()
 
     # @staticmethod
     # def get_tool():
@@ -196,12 +365,9 @@ if __name__ == "__main__":
     # Start the file watcher
     service.start()
 
-    # # Reindex all existing files in RAW_PATH
-    for root, _, files in os.walk(ChromaService.RAW_PATH):
-        for fname in files:
-            file_path = os.path.join(root, fname)
-            logging.info(f"Reindexing existing file: {file_path}")
-            service.reindex_file(file_path)
+    # # Reindex all existing files in every watched folder
+    count = service.reindex_all()
+    logging.info(f"Reindexed {count} existing files.")
 
     # logging.info("Initial indexing complete. You can now query the vector store.")
 
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Transcript:
+    text: str
+    provider: str
+    language: Optional[str] = None
+    extra: dict = field(default_factory=dict)
+
+
+class STTProvider(ABC):
+    """Speech-to-text backend. Subclasses implement transcribe()."""
+    name = "base"
+
+    @abstractmethod
+    def transcribe(self, audio: BytesIO) -> Transcript:
+        ...
+
+    async def atranscribe(self, audio: BytesIO) -> Transcript:
+        """Runs transcribe() off the event loop, keeping the caller's trace context"""
+        return await asyncio.to_thread(self.transcribe, audio)
+
+    def metrics(self) -> dict:
+        return {}
+
+
+class ElevenLabsSTT(STTProvider):
+    """ElevenLabs scribe_v1, with adaptive audio isolation and optional diarization."""
+    name = "elevenlabs"
+
+    def __init__(self, service, diarize: bool = False):
+        self.service = service
+        self.diarize = diarize
+
+    def transcribe(self, audio: BytesIO) -> Transcript:
+        response = self.service.stt(audio, diarize=self.diarize)
+        return Transcript(text=response.text, provider=self.name, language=getattr(response, "language_code", None))
+
+    def metrics(self) -> dict:
+        return self.service.metrics()
+
+
+class LocalWhisperSTT(STTProvider):
+    """
+    faster-whisper on the CPU with int8 weights. The model loads on first use
+    and transcriptions run on a dedicated thread pool.
+    """
+    name = "local"
+
+    def __init__(self, model_size: str = "base.en", compute_type: str = "int8", workers: int = 1, cpu_threads: int = 4):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.workers = workers
+        self.cpu_threads = cpu_threads
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper")
+
+    @property
+    def model(self):
+        if self._model is None:
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError as e:
+                raise RuntimeError("Local STT needs faster-whisper: pip install faster-whisper") from e
+            logger.info(f"Loading faster-whisper {self.model_size} ({self.compute_type})")
+            self._model = WhisperModel(
+                self.model_size,
+                device="cpu",
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.workers,
+            )
+        return self._model
+
+    def warm_up(self):
+        """Loads the model in the background so the first command doesn't pay for it"""
+        self._executor.submit(lambda: self.model)
+
+    def transcribe(self, audio: BytesIO) -> Transcript:
+        # Short single-speaker commands: greedy decoding, no timestamps
+        segments, info = self.model.transcribe(audio, beam_size=1, language="en", without_timestamps=True, vad_filter=False)
+        text = " ".join(segment.text.strip() for segment in segments)
+        return Transcript(text=text, provider=self.name, language=info.language)
+
+    async def atranscribe(self, audio: BytesIO) -> Transcript:
+        call = functools.partial(contextvars.copy_context().run, self.transcribe, audio)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+
+class FakeSTT(STTProvider):
+    """
+    Deterministic stand-in for tests and benchmarks: returns a scripted
+    transcript per clip (by SHA-256 of the bytes), else a default.
+    """
+    name = "fake"
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None,
+                 default: Union[str, Callable[[bytes], str]] = "open spotify"):
+        self.transcripts = transcripts or {}
+        self.default = default
+
+    @staticmethod
+    def digest(audio_bytes: bytes) -> str:
+        return hashlib.sha256(audio_bytes).hexdigest()
+
+    def transcribe(self, audio: BytesIO) -> Transcript:
+        audio_bytes = audio.getvalue()
+        text = self.transcripts.get(FakeSTT.digest(audio_bytes))
+        if text is None:
+            text = self.default(audio_bytes) if callable(self.default) else self.default
+        return Transcript(text=text, provider=self.name, language="en")
+
+
+def get_stt_provider(elevenlabs_service=None, backend: Optional[str] = None) -> STTProvider:
+    """Picks the STT backend from STT_BACKEND (elevenlabs, local or fake)."""
+    backend = backend or os.getenv("STT_BACKEND", "elevenlabs")
+    if backend == "elevenlabs":
+        return ElevenLabsSTT(elevenlabs_service, diarize=os.getenv("STT_DIARIZE", "false") == "true")
+    if backend == "local":
+        provider = LocalWhisperSTT(model_size=os.getenv("STT_LOCAL_MODEL", "base.en"))
+        provider.warm_up()
+        return provider
+    if backend == "fake":
+        return FakeSTT(default=os.getenv("STT_FAKE_TEXT", "open spotify"))
+    raise ValueError(f"Unknown STT backend: {backend}")
@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, start_ns: Optional[int] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Tracer:
+    """
+    Minimal span tracer for the voice pipeline.
+
+    Spans nest through a context variable, so `with tracer.span(...)` works in
+    sync and async code alike. Finished traces are appended to a JSONL file in
+    the OTLP/JSON layout the OpenTelemetry collector's file exporter uses, and
+    recent durations per span name feed the p50/p95 summary on /metrics. If
+    tracemalloc is tracing, each span also records the bytes it allocated.
+    """
+
+    def __init__(self, export_path: Optional[str] = None, window: int = 1000, service_name: str = "gearis-backend"):
+        self.export_path = export_path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._traces: Dict[str, List[Span]] = {}
+        self._recent_traces = deque(maxlen=50)
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._allocations = defaultdict(lambda: deque(maxlen=window))
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """Opens a span under the current one, or a new trace if there is none."""
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        span = Span(name, trace_id, parent.span_id if parent and parent.trace_id == trace_id else None, attributes=attributes)
+        if span.parent_id is None:
+            with self._lock:
+                self._traces[trace_id] = []
+        alloc_start = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            if alloc_start is not None:
+                span.attributes["alloc_bytes"] = max(0, tracemalloc.get_traced_memory()[0] - alloc_start)
+            self.finish(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes) -> Span:
+        """Records a span whose timing was measured elsewhere (callbacks, the wake-word client)."""
+        parent = _current_span.get()
+        trace_id = trace_id or (parent.trace_id if parent else secrets.token_hex(16))
+        if parent_id is None and parent and parent.trace_id == trace_id:
+            parent_id = parent.span_id
+        span = Span(name, trace_id, parent_id, start_ns=start_ns, attributes=attributes)
+        span.end_ns = end_ns
+        self.finish(span)
+        return span
+
+    def finish(self, span: Span):
+        span.end_ns = span.end_ns or time.time_ns()
+        export = None
+        with self._lock:
+            self._durations[span.name].append(span.duration_ms)
+            if "alloc_bytes" in span.attributes:
+                self._allocations[span.name].append(span.attributes["alloc_bytes"])
+            if span.parent_id is None:
+                # Root finished: export the whole trace and keep it around for the UI
+                export = self._traces.pop(span.trace_id, []) + [span]
+                self._recent_traces.append((span.trace_id, export))
+            elif span.trace_id in self._traces:
+                self._traces[span.trace_id].append(span)
+            else:
+                # Late span (e.g. background TTS) after its trace closed
+                export = [span]
+                for trace_id, spans in self._recent_traces:
+                    if trace_id == span.trace_id:
+                        spans.append(span)
+        if export:
+            self._export(export)
+
+    def _export(self, spans: List[Span]):
+        if not self.export_path:
+            return
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "gearis"}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        })
+        try:
+            with self._lock, open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Failed to export trace: {e}")
+
+    def trace(self, trace_id: str) -> List[dict]:
+        """Spans of a recent trace as offsets from its start, for the UI waterfall."""
+        with self._lock:
+            spans = next((s for t, s in reversed(self._recent_traces) if t == trace_id), None) or list(self._traces.get(trace_id, []))
+        if not spans:
+            return []
+        origin = min(s.start_ns for s in spans)
+        return [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "start_ms": round((s.start_ns - origin) / 1e6, 1),
+                "duration_ms": round(s.duration_ms, 1),
+                "error": s.error,
+            }
+            for s in sorted(spans, key=lambda s: s.start_ns)
+        ]
+
+    def summary(self) -> dict:
+        """p50/p95 latency (and allocations, if measured) per span name."""
+        def percentile(values, q):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+        with self._lock:
+            stats = {}
+            for name, durations in self._durations.items():
+                if not durations:
+                    continue
+                stats[name] = {
+                    "count": len(durations),
+                    "p50_ms": round(percentile(durations, 0.5), 1),
+                    "p95_ms": round(percentile(durations, 0.95), 1),
+                }
+                allocations = self._allocations.get(name)
+                if allocations:
+                    stats[name]["p50_alloc_bytes"] = percentile(allocations, 0.5)
+            return stats
+
+    def reset(self):
+        with self._lock:
+            self._traces.clear()
+            self._recent_traces.clear()
+            self._durations.clear()
+            self._allocations.clear()
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain/LangGraph callbacks into spans: one per graph node, per
+    chat model call and per tool invocation, nested by run id under the span
+    that was current when the handler was created.
+    """
+    GRAPH_NODES = {"agent", "tools", "format_output"}
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        root = tracer.current()
+        self.trace_id = root.trace_id if root else secrets.token_hex(16)
+        self.root_id = root.span_id if root else None
+        self._open: Dict[UUID, tuple] = {}
+        self._span_ids: Dict[UUID, str] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes):
+        parent_id = self._span_ids.get(parent_run_id, self.root_id)
+        span = Span(name, self.trace_id, parent_id, attributes=attributes)
+        if tracemalloc.is_tracing():
+            span.alloc_start = tracemalloc.get_traced_memory()[0]
+        self._open[run_id] = span
+        self._span_ids[run_id] = span.span_id
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes):
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        span.attributes.update(attributes)
+        alloc_start = getattr(span, "alloc_start", None)
+        if alloc_start is not None and tracemalloc.is_tracing():
+            span.attributes["alloc_bytes"] = max(0, tracemalloc.get_traced_memory()[0] - alloc_start)
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        self.tracer.finish(span)
+
+    # --- graph nodes ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or ""
+        if name in self.GRAPH_NODES:
+            self._start(run_id, parent_run_id, f"graph.{name}")
+        elif parent_run_id in self._span_ids:
+            # Keep the id chain intact through intermediate runnables
+            self._span_ids[run_id] = self._span_ids[parent_run_id]
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- LLM calls ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "")
+        self._start(run_id, parent_run_id, f"llm.{node}" if node else "llm", messages=sum(len(m) for m in messages))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        attributes = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+            attributes = {
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "cache_read_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+            }
+        except (AttributeError, IndexError):
+            pass
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- tools ---
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool.{name}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+tracer = Tracer(export_path=os.getenv("TRACE_EXPORT_PATH", "traces.jsonl"))
@@ -2,6 +2,7 @@ import { Command } from "@tauri-apps/api/shell";
 import { useEffect, useRef, useState } from "react";
 import "./App.css";
 import { useAgentWebSocket } from "./hooks/useAgentWebSocket";
+import TraceWaterfall from "./components/TraceWaterfall";
 // import Switch from "./components/Switch";
 import { appWindow, LogicalSize } from "@tauri-apps/api/window";
 
@@ -11,7 +12,7 @@ function App() {
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
     const audioChunksRef = useRef<Blob[]>([]);
 
-    const { isConnected, statusMessage, error } = useAgentWebSocket();
+    const { isConnected, statusMessage, error, traceId, traceSpans } = useAgentWebSocket();
 
     async function sendNotificationWithDebug(title: string, body: string) {
         console.log("🔔 Attempting to send notification:", { title, body });
@@ -91,7 +92,7 @@ function App() {
         };
 
         resizeWindow();
-    }, [isRecording, statusMessage]);
+    }, [isRecording, statusMessage, traceSpans]);
 
     function stopRecording() {
         if (mediaRecorderRef.current && isRecording) {
@@ -144,6 +145,7 @@ function App() {
                 </div>
                 {/* <Switch label={"Toggle voice"} checked={toggleVoice} setChecked={setToggleVoice} /> */}
             </div>
+            <TraceWaterfall traceId={traceId} spans={traceSpans} />
         </div>
     );
 }
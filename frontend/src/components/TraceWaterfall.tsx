@@ -0,0 +1,40 @@
+import "./TraceWaterfall.css";
+
+export interface TraceSpan {
+    name: string;
+    span_id: string;
+    parent_id: string | null;
+    start_ms: number;
+    duration_ms: number;
+    error: string | null;
+}
+
+interface TraceWaterfallProps {
+    traceId: string;
+    spans: TraceSpan[];
+}
+
+export default function TraceWaterfall({ traceId, spans }: TraceWaterfallProps) {
+    if (spans.length === 0) return null;
+    const total = Math.max(...spans.map((s) => s.start_ms + s.duration_ms), 1);
+
+    return (
+        <div className="trace-waterfall" title={`Trace ${traceId}`}>
+            {spans.map((span) => (
+                <div className="trace-row" key={span.span_id}>
+                    <span className="trace-name">{span.name}</span>
+                    <div className="trace-track">
+                        <div
+                            className={`trace-bar ${span.error ? "error" : ""}`}
+                            style={{
+                                left: `${(span.start_ms / total) * 100}%`,
+                                width: `${Math.max((span.duration_ms / total) * 100, 0.5)}%`,
+                            }}
+                        />
+                    </div>
+                    <span className="trace-duration">{Math.round(span.duration_ms)} ms</span>
+                </div>
+            ))}
+        </div>
+    );
+}
@@ -1,23 +1,60 @@
 import { useEffect, useRef, useState } from "react";
 import { appWindow } from "@tauri-apps/api/window";
+import { TraceSpan } from "../components/TraceWaterfall";
+
+type Topic = "status" | "transcript" | "trace" | "window-control" | "audio";
+
+export interface AudioFrame {
+    utterance: string;
+    segment: number;
+    segments: number;
+    seq: number;
+    end?: boolean;
+    format: string;
+}
 
 interface AgentEvent {
-    type: "status";
+    type: "status" | "set_hidden" | "trace" | "queue" | "ping" | "transcript";
     data: {
         message: string;
         value: boolean | undefined;
+        trace_id?: string;
+        phase?: "start" | "end";
+        spans?: TraceSpan[];
+        session_id?: string;
+        position?: number;
+        text?: string;
     };
 }
 
-export function useAgentWebSocket(url: string = "ws://localhost:8000/ws") {
+// Binary frames: 4-byte big-endian header length, JSON header, raw payload
+function decodeBinaryFrame(buffer: ArrayBuffer): { header: any; payload: Uint8Array } {
+    const headerLength = new DataView(buffer).getUint32(0);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    return { header, payload: new Uint8Array(buffer, 4 + headerLength) };
+}
+
+export function useAgentWebSocket(
+    url: string = "ws://localhost:8000/ws",
+    onAudio?: (frame: AudioFrame, chunk: Uint8Array) => void,
+) {
     const [isConnected, setIsConnected] = useState(false);
     const [statusMessage, setStatusMessage] = useState("Ready");
     const [error, setError] = useState<string>("");
+    const [traceId, setTraceId] = useState<string>("");
+    const [traceSpans, setTraceSpans] = useState<TraceSpan[]>([]);
+    const [transcript, setTranscript] = useState<string>("");
     const wsRef = useRef<WebSocket | null>(null);
+    const onAudioRef = useRef(onAudio);
+    onAudioRef.current = onAudio;
+    const wantsAudio = Boolean(onAudio);
 
     useEffect(() => {
         console.log("🔌 Attempting WebSocket connection to:", url);
-        const ws = new WebSocket(url);
+        const topics: Topic[] = ["status", "transcript", "trace", "window-control"];
+        if (wantsAudio) topics.push("audio");
+        const ws = new WebSocket(`${url}?topics=${topics.join(",")}`);
+        ws.binaryType = "arraybuffer";
         wsRef.current = ws;
 
         ws.onopen = () => {
@@ -28,12 +65,27 @@ export function useAgentWebSocket(url: string = "ws://localhost:8000/ws") {
         };
 
         ws.onmessage = async (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                const { header, payload } = decodeBinaryFrame(event.data);
+                if (header.type === "audio") {
+                    onAudioRef.current?.(header as AudioFrame, payload);
+                } else if (header.type === "trace" && header.trace_id) {
+                    setTraceId(header.trace_id);
+                    setTraceSpans(JSON.parse(new TextDecoder().decode(payload)));
+                }
+                return;
+            }
             console.log("📨 Raw message received:", event.data);
             try {
                 const message: AgentEvent = JSON.parse(event.data);
                 console.log("📦 Parsed event:", message.type, message.data);
 
-                if (message.type === "status") {
+                if (message.type === "ping") {
+                    // The backend drops clients that stop answering its heartbeat
+                    ws.send(JSON.stringify({ type: "pong" }));
+                } else if (message.type === "transcript") {
+                    setTranscript(message.data.text ?? "");
+                } else if (message.type === "status") {
                     setStatusMessage(message.data.message);
                     setError("");
                 } else if (message.type === "set_hidden") {
@@ -46,6 +98,13 @@ export function useAgentWebSocket(url: string = "ws://localhost:8000/ws") {
                         await appWindow.show();
                         console.log(`✅ Window shown`);
                     }
+                } else if (message.type === "queue" && message.data.position) {
+                    // Position 0 is the running request; anything else is waiting its turn
+                    const ahead = message.data.position;
+                    setStatusMessage(`Waiting for ${ahead} earlier request${ahead === 1 ? "" : "s"}...`);
+                } else if (message.type === "trace" && message.data.trace_id) {
+                    setTraceId(message.data.trace_id);
+                    setTraceSpans(message.data.phase === "end" ? message.data.spans ?? [] : []);
                 }
             } catch (err) {
                 console.error("❌ Error parsing message:", err);
@@ -69,7 +128,7 @@ export function useAgentWebSocket(url: string = "ws://localhost:8000/ws") {
             console.log("🧹 Cleaning up WebSocket");
             ws.close();
         };
-    }, [url]);
+    }, [url, wantsAudio]);
 
-    return { isConnected, statusMessage, error };
+    return { isConnected, statusMessage, error, traceId, traceSpans, transcript };
 }
@@ -0,0 +1,103 @@
+import threading
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 ring buffer fed straight from the sounddevice callback.
+
+    The storage is mirrored (every sample is written at i and i + capacity), so
+    any window of up to `capacity` samples is one contiguous slice. Readers get
+    NumPy views into the ring instead of freshly allocated bytes objects.
+    Positions are absolute sample counts since the stream started.
+    """
+
+    def __init__(self, capacity: int, preroll: int = 0):
+        if preroll >= capacity:
+            raise ValueError("preroll must be smaller than the ring capacity")
+        self.capacity = capacity
+        self.preroll = preroll
+        self._buf = np.zeros(capacity * 2, dtype=np.int16)
+        self._written = 0
+        self._cond = threading.Condition()
+
+    @property
+    def written(self) -> int:
+        """Total number of samples written so far."""
+        return self._written
+
+    def write(self, samples: np.ndarray):
+        """Copy one block from the audio callback into the ring (no allocation)."""
+        data = samples.reshape(-1)
+        n = len(data)
+        if n > self.capacity:
+            data = data[-self.capacity:]
+            n = self.capacity
+
+        cap = self.capacity
+        start = self._written % cap
+        first = min(n, cap - start)
+        self._buf[start:start + first] = data[:first]
+        self._buf[start + cap:start + cap + first] = data[:first]
+        rest = n - first
+        if rest:
+            self._buf[:rest] = data[first:]
+            self._buf[cap:cap + rest] = data[first:]
+
+        with self._cond:
+            self._written += n
+            self._cond.notify_all()
+
+    def wait(self, position: int, timeout: float = None) -> bool:
+        """Block until more than `position` samples have been written."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._written > position, timeout)
+
+    def view(self, start: int, length: int) -> np.ndarray:
+        """Contiguous view of samples [start, start + length). Valid until overwritten."""
+        offset = start % self.capacity
+        return self._buf[offset:offset + length]
+
+    def history(self, end: int, length: int = None) -> np.ndarray:
+        """View of up to `length` samples (default: the pre-roll) ending at `end`."""
+        length = self.preroll if length is None else length
+        oldest = max(0, self._written - self.capacity)
+        start = max(oldest, end - length)
+        return self.view(start, end - start)
+
+    def reader(self, frame_length: int) -> "RingReader":
+        return RingReader(self, frame_length)
+
+
+class RingReader:
+    """Independent cursor over an AudioRingBuffer yielding fixed-size frame views."""
+
+    def __init__(self, ring: AudioRingBuffer, frame_length: int):
+        self.ring = ring
+        self.frame_length = frame_length
+        self.position = ring.written
+        self.overruns = 0
+
+    def seek(self, position: int):
+        self.position = position
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until at least one full frame is available."""
+        return self.ring.wait(self.position + self.frame_length - 1, timeout)
+
+    def frames(self, until: int = None):
+        """
+        Yields views of every complete frame available (up to `until` if given).
+        If the writer lapped this reader, the stale samples are skipped.
+        """
+        ring = self.ring
+        limit = ring.written if until is None else min(until, ring.written)
+        while self.position + self.frame_length <= limit:
+            oldest = ring.written - ring.capacity
+            if self.position < oldest:
+                self.overruns += 1
+                self.position = oldest
+                continue
+            frame = ring.view(self.position, self.frame_length)
+            self.position += self.frame_length
+            yield frame
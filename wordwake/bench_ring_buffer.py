@@ -0,0 +1,104 @@
+"""
+CPU benchmark for the wake-word frame loop, driven from a recorded WAV.
+
+Replays the file in sounddevice-sized blocks through the old bytes-slicing
+loop and through AudioRingBuffer, and reports CPU time per hour of audio.
+Porcupine and WebRTC VAD are used if available (--real), otherwise a cheap
+stand-in touches every sample so only the buffering cost is compared.
+
+    python bench_ring_buffer.py recording.wav [--repeat 20] [--real]
+"""
+import argparse
+import struct
+import time
+import wave
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+VAD_CHUNK_MS = 20
+
+
+def load_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError("expected 16 kHz, 16-bit, mono WAV")
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def make_processors(real: bool):
+    if not real:
+        return (lambda pcm: -1), (lambda chunk, rate: False)
+
+    import os
+    import pvporcupine
+    import webrtcvad
+    porcupine = pvporcupine.create(keywords=["jarvis"], access_key=os.getenv("PICO_API_KEY"))
+    vad = webrtcvad.Vad(2)
+    return porcupine.process, vad.is_speech
+
+
+def run_legacy(blocks, wake, is_speech):
+    vad_chunk_bytes = int(SAMPLE_RATE * VAD_CHUNK_MS / 1000) * 2
+    leftover = b""
+    vad_buf = b""
+    for block in blocks:
+        leftover += bytes(block)
+        while len(leftover) >= FRAME_LENGTH * 2:
+            chunk = leftover[:FRAME_LENGTH * 2]
+            leftover = leftover[FRAME_LENGTH * 2:]
+            wake(struct.unpack_from("h" * FRAME_LENGTH, chunk))
+            vad_buf += chunk
+            while len(vad_buf) >= vad_chunk_bytes:
+                vad_chunk = vad_buf[:vad_chunk_bytes]
+                vad_buf = vad_buf[vad_chunk_bytes:]
+                is_speech(vad_chunk, SAMPLE_RATE)
+
+
+def run_ring(blocks, wake, is_speech):
+    ring = AudioRingBuffer(capacity=SAMPLE_RATE * 4, preroll=SAMPLE_RATE * 3 // 10)
+    wake_reader = ring.reader(FRAME_LENGTH)
+    vad_reader = ring.reader(int(SAMPLE_RATE * VAD_CHUNK_MS / 1000))
+    for block in blocks:
+        ring.write(block)
+        for frame in wake_reader.frames():
+            wake(frame)
+            for vad_chunk in vad_reader.frames(until=wake_reader.position):
+                is_speech(vad_chunk.view(np.uint8), SAMPLE_RATE)
+
+
+def measure(fn, blocks, repeat, wake, is_speech) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(blocks, wake, is_speech)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wav")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--block", type=int, default=FRAME_LENGTH, help="samples per audio callback")
+    parser.add_argument("--real", action="store_true", help="use Porcupine and WebRTC VAD")
+    args = parser.parse_args()
+
+    samples = load_wav(args.wav)
+    # sounddevice hands the callback (frames, channels) arrays
+    blocks = [samples[i:i + args.block].reshape(-1, 1) for i in range(0, len(samples), args.block)]
+    audio_sec = len(samples) / SAMPLE_RATE * args.repeat
+    wake, is_speech = make_processors(args.real)
+
+    print(f"Audio: {audio_sec:.1f}s total ({args.repeat} x {len(samples) / SAMPLE_RATE:.1f}s), block={args.block}")
+    results = {}
+    for name, fn in (("bytes slicing", run_legacy), ("ring buffer", run_ring)):
+        cpu = measure(fn, blocks, args.repeat, wake, is_speech)
+        results[name] = cpu
+        print(f"{name:>14}: {cpu * 1000:8.1f} ms CPU  ({cpu / audio_sec * 3600:6.2f} CPU-s per audio hour)")
+    print(f"speedup: {results['bytes slicing'] / max(results['ring buffer'], 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Adaptive end-of-speech detection for the wake-word client.
+
+Instead of a fixed END_SILENCE_SEC, the trailing-silence threshold follows
+what the VAD has seen in the current utterance: short, crisp commands end
+after a short pause, while speakers who pause between words get more time.
+Until the speaker has paused and resumed once, the old fixed second applies.
+Everything is counted in samples, so a WAV replay gives the same result as
+the live microphone.
+
+    python endpointing.py fixture.wav --wake-ms 800
+"""
+import numpy as np
+
+
+class AdaptiveEndpointer:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        chunk_ms: int = 20,
+        min_silence_ms: int = 350,
+        max_silence_ms: int = 1000,
+        initial_silence_ms: int = 1000,
+        pause_factor: float = 1.5,
+        leading_silence_ms: int = 2500,
+        snr_factor: float = 2.0,
+    ):
+        self.chunk_ms = chunk_ms
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.initial_silence_ms = initial_silence_ms
+        self.pause_factor = pause_factor
+        self.leading_silence_ms = leading_silence_ms
+        self.snr_factor = snr_factor
+        self.chunk_samples = int(sample_rate * chunk_ms / 1000)
+        self.reset()
+
+    def reset(self):
+        self.noise_rms = None       # running estimate of the background level
+        self.speech_ms = 0          # total voiced time in this utterance
+        self.silence_ms = 0         # current run of trailing silence
+        self.elapsed_ms = 0
+        self.typical_pause_ms = 0.0  # EMA of pauses the speaker resumed after
+
+    @property
+    def threshold_ms(self) -> float:
+        """Trailing silence that ends the utterance, given the stats so far."""
+        if self.speech_ms == 0:
+            return self.leading_silence_ms
+        if self.typical_pause_ms == 0:
+            # Nothing learned yet; a mid-sentence pause mustn't end the capture
+            return self.initial_silence_ms
+        adaptive = self.typical_pause_ms * self.pause_factor
+        return min(self.max_silence_ms, max(self.min_silence_ms, adaptive))
+
+    def update(self, is_speech: bool, chunk: np.ndarray) -> bool:
+        """
+        Feed one VAD chunk and its decision. Returns True once the utterance
+        has ended. VAD hits that are no louder than the noise floor are
+        treated as silence so a noisy room doesn't keep the mic open.
+        """
+        rms = float(np.sqrt(np.mean(np.square(chunk, dtype=np.float32)))) if len(chunk) else 0.0
+        if is_speech and self.noise_rms is not None and rms < self.noise_rms * self.snr_factor:
+            is_speech = False
+
+        if is_speech:
+            if self.speech_ms and self.silence_ms:
+                # The speaker resumed after a pause; learn how long they pause
+                self.typical_pause_ms = (
+                    self.silence_ms if self.typical_pause_ms == 0
+                    else 0.7 * self.typical_pause_ms + 0.3 * self.silence_ms
+                )
+            self.speech_ms += self.chunk_ms
+            self.silence_ms = 0
+        else:
+            self.silence_ms += self.chunk_ms
+            self.noise_rms = rms if self.noise_rms is None else 0.95 * self.noise_rms + 0.05 * rms
+
+        self.elapsed_ms += self.chunk_ms
+        return self.silence_ms >= self.threshold_ms
+
+
+def segment(samples: np.ndarray, wake_index: int, is_speech, sample_rate: int = 16000,
+            preroll_ms: int = 500, max_utterance_ms: int = 12000, **endpointer_kwargs):
+    """
+    Offline version of the capture loop: given the sample index where the wake
+    word fired, returns (start, end) of the utterance the client would upload,
+    including the pre-roll. `is_speech(frame_bytes, sample_rate)` is usually
+    webrtcvad.Vad(n).is_speech, which wants bytes: it takes len/2 as the
+    sample count, so an int16 array would be half-classified.
+    """
+    endpointer = AdaptiveEndpointer(sample_rate=sample_rate, **endpointer_kwargs)
+    start = max(0, wake_index - int(sample_rate * preroll_ms / 1000))
+    step = endpointer.chunk_samples
+    limit = min(len(samples), wake_index + int(sample_rate * max_utterance_ms / 1000))
+
+    position = wake_index
+    while position + step <= limit:
+        chunk = samples[position:position + step]
+        position += step
+        if endpointer.update(is_speech(chunk.view(np.uint8), sample_rate), chunk):
+            break
+    return start, position
+
+
+if __name__ == "__main__":
+    import argparse
+    import wave
+    import webrtcvad
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wav")
+    parser.add_argument("--wake-ms", type=int, default=0, help="where the wake word fired")
+    parser.add_argument("--preroll-ms", type=int, default=500)
+    parser.add_argument("--aggressiveness", type=int, default=2)
+    args = parser.parse_args()
+
+    with wave.open(args.wav, "rb") as wf:
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+    vad = webrtcvad.Vad(args.aggressiveness)
+    start, end = segment(samples, int(rate * args.wake_ms / 1000), vad.is_speech,
+                         sample_rate=rate, preroll_ms=args.preroll_ms)
+    print(f"utterance: {start / rate * 1000:.0f} ms -> {end / rate * 1000:.0f} ms "
+          f"({(end - start) / rate * 1000:.0f} ms)")
@@ -1,8 +1,13 @@
-import struct, wave, time, queue, os
+import time, os, secrets, socket
+import numpy as np
 import sounddevice as sd
 import pvporcupine
 import webrtcvad
-import requests
+
+from audio_buffer import AudioRingBuffer
+from endpointing import AdaptiveEndpointer
+from uploader import UploadWorker, encode_wav
+from streaming import StreamingSession
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,23 +16,47 @@ pico_api_key = os.getenv("PICO_API_KEY")
 WAKEWORDS = ["jarvis"]  # built-in keywords: "picovoice", "bumblebee", etc.
 SAMPLE_RATE = 16000
 FRAME_LENGTH = 512      # Porcupine expects 512 samples @16kHz (~32ms)
-OUTPUT_WAV = "utterance.wav"
+UPLOAD_URL = os.getenv("WORDWAKE_UPLOAD_URL", "http://localhost:8000/api/upload-audio")
+INTERRUPT_URL = os.getenv("WORDWAKE_INTERRUPT_URL", "http://localhost:8000/api/interrupt")
+CANCEL_URL = os.getenv("WORDWAKE_CANCEL_URL", "http://localhost:8000/api/cancel")
+STREAM_URL = os.getenv("WORDWAKE_STREAM_URL", "ws://localhost:8000/ws/audio")
+# "stream": send frames to the server from the wake word on (falls back to upload if the socket drops)
+# "upload": send the whole utterance once local endpointing decides it's over
+TRANSPORT = os.getenv("WORDWAKE_TRANSPORT", "stream")
+# The server keeps one conversation (and one request queue) per session
+SESSION_ID = os.getenv("WORDWAKE_SESSION_ID", socket.gethostname())
 
 # VAD / capture tuning
 VAD_AGGRESSIVENESS = 2      # 0..3 (higher = more aggressive)
 VAD_CHUNK_MS = 20           # WebRTC VAD supports 10/20/30ms
-END_SILENCE_SEC = 1.0       # stop after this much continuous silence
+MIN_END_SILENCE_MS = 350    # trailing silence that ends a crisp short command
+MAX_END_SILENCE_MS = 1000   # upper bound for slow speakers who pause between words
+END_SILENCE_MS = 1000       # until the speaker's pauses are known (the old fixed END_SILENCE_SEC)
 MAX_UTTERANCE_SEC = 12.0    # safety cap so it never records forever
 
-def save_wav(raw_bytes: bytes, path: str, samplerate=SAMPLE_RATE):
-    with wave.open(path, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)  # int16
-        wf.setframerate(samplerate)
-        wf.writeframes(raw_bytes)
-        files = {"audio": ("utterance.wav", open("utterance.wav", "rb"), "audio/wav")}
-        response = requests.post("http://localhost:8000/api/upload-audio?toggle_voice=true", files=files)
-        print("Server response:", response.status_code, response.text)
+# Ring buffer tuning
+RING_SEC = 4.0              # how much mic history the ring keeps
+PREROLL_MS = 500            # history prepended to the capture so overlapping speech isn't clipped
+
+def on_upload_result(job):
+    if job.error is not None:
+        print("Upload failed:", job.error)
+        return
+    print("Server response:", job.response.status_code, job.response.text)
+    try:
+        text = job.response.json().get("transcript", "")
+    except ValueError:
+        return
+    if text:
+        print("You said:", text)
+        simple_intent_router(text)
+
+def on_stream_result(message):
+    print("Server response:", message)
+    text = message.get("transcript", "")
+    if text:
+        print("You said:", text)
+        simple_intent_router(text)
 
 def simple_intent_router(text: str):
     t = text.lower()
@@ -38,23 +67,26 @@ def simple_intent_router(text: str):
     else:
         print("→ Intent: fallback / smalltalk")
 
-def transcribe_stub(path: str) -> str:
-    print(f"[stub] Would transcribe {path} here.")
-    return "set a five minute timer"
-
 def main():
     porcupine = pvporcupine.create(
         keywords=WAKEWORDS,
         access_key=pico_api_key,
     )
 
+    # Uploads run on a background worker so the mic loop never blocks on the server
+    uploader = UploadWorker(UPLOAD_URL, params={"toggle_voice": "true", "session_id": SESSION_ID}, on_result=on_upload_result,
+                            cancel_url=CANCEL_URL)
+
     # --- Audio stream set-up (16k, int16, mono) ---
-    audio_q = queue.Queue()
+    ring = AudioRingBuffer(
+        capacity=int(SAMPLE_RATE * RING_SEC),
+        preroll=int(SAMPLE_RATE * PREROLL_MS / 1000),
+    )
 
     def on_audio(indata, frames, time_info, status):
         if status:
             pass  # you could log over/underflows
-        audio_q.put(bytes(indata))  # int16 bytes
+        ring.write(indata[:, 0])  # copy straight into the ring, no bytes objects
 
     stream = sd.InputStream(
         channels=1,
@@ -68,85 +100,133 @@ def main():
 
     # --- VAD init ---
     vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
-    vad_chunk_bytes = int(SAMPLE_RATE * (VAD_CHUNK_MS / 1000.0)) * 2  # bytes (int16)
+    vad_chunk_samples = int(SAMPLE_RATE * (VAD_CHUNK_MS / 1000.0))
+    endpointer = AdaptiveEndpointer(
+        sample_rate=SAMPLE_RATE,
+        chunk_ms=VAD_CHUNK_MS,
+        min_silence_ms=MIN_END_SILENCE_MS,
+        max_silence_ms=MAX_END_SILENCE_MS,
+        initial_silence_ms=END_SILENCE_MS,
+    )
+
+    # Independent cursors: 512-sample frames for Porcupine, 20ms frames for VAD
+    wake_reader = ring.reader(FRAME_LENGTH)
+    vad_reader = ring.reader(vad_chunk_samples)
+
+    # Preallocated capture buffer so recording never grows a bytearray
+    captured = np.empty(int(SAMPLE_RATE * MAX_UTTERANCE_SEC) + ring.preroll, dtype=np.int16)
 
     try:
-        leftover = b""
         capturing = False
-        captured = bytearray()
-        vad_buf = b""
-        last_voice_time = 0.0
+        captured_len = 0
         start_time = 0.0
+        stream_session = None
+        # The last streamed utterance, kept until its result arrives so barge-in can cancel it
+        previous_stream = None
+        trace_id = ""
+
+        def upload_captured():
+            """Uploads what was captured; the buffer is reused, so the WAV is built now."""
+            wav = encode_wav(captured[:captured_len].tobytes(), SAMPLE_RATE)
+            headers = {"X-Trace-Id": trace_id, "X-Capture-Ms": f"{captured_len / SAMPLE_RATE * 1000:.0f}"}
+            return lambda: uploader.submit(wav, headers=headers)
+
+        def finish_capture(reason):
+            print(reason)
+            if stream_session is not None:
+                # The server already has the audio; tell it we're done, and upload if the stream fails before the result
+                stream_session.end()
+                stream_session.hand_off(upload_captured())
+            else:
+                upload_captured()()
+            print("Listening for wake word…")
 
         while True:
-            block = audio_q.get()  # grab mic bytes
-            leftover += block
+            wake_reader.wait()  # block until a full frame is in the ring
 
-            # Always feed Porcupine with exact 512-sample frames
-            while len(leftover) >= FRAME_LENGTH * 2:
-                chunk = leftover[:FRAME_LENGTH * 2]
-                leftover = leftover[FRAME_LENGTH * 2:]
+            for frame in wake_reader.frames():
+                frame_start = wake_reader.position - FRAME_LENGTH
 
-                # Porcupine processing
-                pcm = struct.unpack_from("h" * FRAME_LENGTH, chunk)
-                result = porcupine.process(pcm)
+                # Porcupine processing (int16 view, no unpacking)
+                result = porcupine.process(frame)
 
                 if not capturing:
                     # Still in wake-word mode
                     if result >= 0:
                         print("Wake word detected! Speak…")
+                        if previous_stream is not None and not (previous_stream.done.is_set() or previous_stream.failed.is_set()):
+                            # Barge in on a streamed utterance: the server drops its request
+                            print("Cancelling previous request.")
+                            previous_stream.cancel()
+                        if uploader.busy:
+                            # Barge in: the user moved on, drop the stale request
+                            print("Cancelling previous request.")
+                            uploader.cancel()
+                        previous_stream = None
                         capturing = True
-                        captured = bytearray()
-                        vad_buf = b""
-                        last_voice_time = time.time()
-                        start_time = last_voice_time
-                        # (Optional) seed a tiny pre-roll if you keep a ring buffer
-                        # For now, just start fresh after trigger
+                        trace_id = secrets.token_hex(16)  # follows this utterance through the backend
+                        # Seed the capture with the pre-roll so speech overlapping
+                        # the wake word isn't clipped
+                        preroll = ring.history(frame_start)
+                        captured[:len(preroll)] = preroll
+                        captured_len = len(preroll)
+                        if TRANSPORT == "stream":
+                            stream_session = StreamingSession(
+                                STREAM_URL,
+                                params={"toggle_voice": "true", "sample_rate": SAMPLE_RATE, "trace_id": trace_id, "session_id": SESSION_ID},
+                                on_result=on_stream_result,
+                            )
+                            previous_stream = stream_session
+                            stream_session.send(preroll.tobytes())
+                        else:
+                            # Stop any reply still being spoken (the stream does this on connect)
+                            uploader.notify(INTERRUPT_URL)
+                        vad_reader.seek(frame_start)
+                        endpointer.reset()
+                        start_time = time.time()
                         # Fall through to capture this chunk as well
-                        captured.extend(chunk)
-                        vad_buf += chunk
-                else:
-                    # Already capturing speech
-                    captured.extend(chunk)
-                    vad_buf += chunk
-
-                # While we have 20ms (or chosen VAD_CHUNK_MS) available, run VAD
-                while capturing and len(vad_buf) >= vad_chunk_bytes:
-                    vad_chunk = vad_buf[:vad_chunk_bytes]
-                    vad_buf = vad_buf[vad_chunk_bytes:]
-                    if vad.is_speech(vad_chunk, SAMPLE_RATE):
-                        last_voice_time = time.time()
-
-                # Check for end-of-speech or timeout
-                if capturing:
-                    now = time.time()
-                    if (now - last_voice_time) >= END_SILENCE_SEC:
-                        print("🛑 End of speech detected.")
-                        save_wav(bytes(captured), OUTPUT_WAV)
-                        text = transcribe_stub(OUTPUT_WAV)
-                        
-                        print("You said:", text)
-                        simple_intent_router(text)
-                        print("Listening for wake word…")
-                        capturing = False
-                        captured.clear()
-                        vad_buf = b""
-                    elif (now - start_time) >= MAX_UTTERANCE_SEC:
-                        print("⏱️ Max utterance reached; stopping capture.")
-                        save_wav(bytes(captured), OUTPUT_WAV)
-                        text = transcribe_stub(OUTPUT_WAV)
-                        print("You said:", text)
-                        simple_intent_router(text)
+                    else:
+                        continue
+
+                # Capturing speech: copy the frame into the capture buffer
+                n = min(FRAME_LENGTH, len(captured) - captured_len)
+                captured[captured_len:captured_len + n] = frame[:n]
+                captured_len += n
+                if stream_session is not None:
+                    stream_session.send(frame.tobytes())
+                    if stream_session.endpointed.is_set():
+                        # Server-side endpointing won; it is already transcribing
+                        print("🛑 Server detected end of speech.")
+                        stream_session.hand_off(upload_captured())
                         print("Listening for wake word…")
                         capturing = False
-                        captured.clear()
-                        vad_buf = b""
+                        stream_session = None
+                        continue
+
+                # Run VAD over every 20ms (or chosen VAD_CHUNK_MS) view captured so far;
+                # the endpointer adapts its silence threshold to the speaker
+                ended = False
+                for vad_chunk in vad_reader.frames(until=wake_reader.position):
+                    if endpointer.update(vad.is_speech(vad_chunk.view(np.uint8), SAMPLE_RATE), vad_chunk):
+                        ended = True
+                        break
+
+                # Check for end-of-speech or timeout
+                if ended:
+                    finish_capture(f"🛑 End of speech detected ({endpointer.threshold_ms:.0f} ms silence).")
+                    capturing = False
+                    stream_session = None
+                elif (time.time() - start_time) >= MAX_UTTERANCE_SEC or captured_len == len(captured):
+                    finish_capture("⏱️ Max utterance reached; stopping capture.")
+                    capturing = False
+                    stream_session = None
 
     except KeyboardInterrupt:
         pass
     finally:
         stream.stop(); stream.close()
         porcupine.delete()
+        uploader.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,136 @@
+import json
+import queue
+import threading
+
+import websocket  # websocket-client
+
+
+class StreamingSession:
+    """
+    Streams one utterance to the backend's /ws/audio endpoint as raw int16 PCM.
+
+    Frames are queued from the audio loop and sent by a background thread, so a
+    slow or dead socket never stalls wake-word detection. The server decides
+    when the utterance ends and replies with an "endpoint" message, then a
+    "result" once the agent has run. If the socket can't be opened or drops
+    at any point before the result, `failed` is set: during capture the
+    caller falls back to a regular upload of what it captured locally, and
+    once capture is over the fallback given to hand_off() does it (the
+    server cancels a request whose socket drops, so it doesn't run twice).
+    """
+
+    def __init__(self, url: str, params: dict = None, connect_timeout: float = 2.0, on_result=None):
+        query = "&".join(f"{k}={v}" for k, v in (params or {}).items())
+        self.url = f"{url}?{query}" if query else url
+        self.connect_timeout = connect_timeout
+        self.on_result = on_result
+        self.endpointed = threading.Event()
+        self.failed = threading.Event()
+        # The result has arrived; nothing can be lost any more
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._fallback = None
+        self._frames = queue.Queue()
+        self._ws = None
+        self._sender = threading.Thread(target=self._send_loop, name="wordwake-stream-send", daemon=True)
+        self._sender.start()
+
+    @property
+    def active(self) -> bool:
+        return not (self.endpointed.is_set() or self.failed.is_set())
+
+    def send(self, pcm: bytes):
+        if self.active:
+            self._frames.put(pcm)
+
+    def end(self):
+        """Tell the server the client saw the end of speech first."""
+        if self.active:
+            self._frames.put(None)
+
+    def hand_off(self, fallback):
+        """
+        Capture is over: calls fallback() if the stream fails before the
+        result arrives, or right away if it already has.
+        """
+        with self._lock:
+            failed = self.failed.is_set() and not self.done.is_set()
+            if not failed:
+                self._fallback = fallback
+        if failed:
+            fallback()
+
+    def cancel(self):
+        """Barge-in: asks the server to drop this utterance's request, then closes."""
+        with self._lock:
+            self._fallback = None
+        if self._ws is not None and not self.done.is_set():
+            try:
+                self._ws.send(json.dumps({"type": "cancel"}))
+            except Exception:
+                pass
+        self.close()
+
+    def _fail(self, message: str):
+        with self._lock:
+            if self.done.is_set() or self.failed.is_set():
+                return
+            self.failed.set()
+            fallback, self._fallback = self._fallback, None
+        print(message)
+        if fallback is not None:
+            fallback()
+
+    def close(self):
+        with self._lock:
+            self._fallback = None
+        self.failed.set()
+        self._frames.put(None)
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+    def _send_loop(self):
+        try:
+            self._ws = websocket.create_connection(self.url, timeout=self.connect_timeout)
+            self._ws.settimeout(None)
+        except Exception as e:
+            self._fail(f"Audio stream unavailable, falling back to upload: {e}")
+            return
+
+        threading.Thread(target=self._recv_loop, name="wordwake-stream-recv", daemon=True).start()
+        try:
+            while True:
+                pcm = self._frames.get()
+                if not self.active:
+                    return
+                if pcm is None:
+                    self._ws.send(json.dumps({"type": "end"}))
+                    return
+                self._ws.send_binary(pcm)
+        except Exception as e:
+            # After the endpoint the receiving side notices the drop
+            if not self.endpointed.is_set():
+                self._fail(f"Audio stream dropped, falling back to upload: {e}")
+
+    def _recv_loop(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if message.get("type") == "endpoint":
+                    self.endpointed.set()
+                elif message.get("type") == "result":
+                    self.done.set()
+                    if self.on_result:
+                        self.on_result(message)
+                    return
+        except Exception as e:
+            if not self.failed.is_set():
+                self._fail(f"Audio stream dropped before the result, falling back to upload: {e}")
+        finally:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
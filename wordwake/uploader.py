@@ -0,0 +1,138 @@
+import io
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def encode_wav(pcm: bytes, samplerate: int = 16000) -> bytes:
+    """Wrap raw int16 mono PCM in a WAV container, entirely in memory."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # int16
+        wf.setframerate(samplerate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+class UploadJob:
+    def __init__(self, wav_bytes: bytes, headers: dict = None):
+        self.wav_bytes = wav_bytes
+        self.headers = headers or {}
+        self.cancelled = threading.Event()
+        # Set once the request is on its way to the server
+        self.sent = threading.Event()
+        self.done = threading.Event()
+        # Cancel the superseded request on the server before sending this one
+        self.cancel_previous = False
+        self.response = None
+        self.error = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class UploadWorker:
+    """
+    Sends utterances to the backend off the audio thread.
+
+    A persistent requests.Session keeps the connection to the server alive
+    between utterances. Submitting a new utterance barges in on the previous
+    one: a job that hasn't started is skipped, and a job already in flight
+    is cancelled on the server (POST cancel_url for the session, so its
+    tools stop too) and its reply discarded.
+    """
+
+    def __init__(self, url: str, params: dict = None, timeout: float = 60.0, on_result=None, cancel_url: str = None):
+        self.url = url
+        self.params = params or {}
+        self.cancel_url = cancel_url
+        self.timeout = timeout
+        self.on_result = on_result
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Two workers so a barge-in doesn't wait behind the stale request
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wordwake-upload")
+        self._lock = threading.Lock()
+        self._current = None
+
+    def submit(self, wav_bytes: bytes, barge_in: bool = True, headers: dict = None) -> UploadJob:
+        job = UploadJob(wav_bytes, headers)
+        with self._lock:
+            if barge_in and self._current is not None:
+                # Sent on this job's worker ahead of its upload, so it can't overtake and cancel it
+                job.cancel_previous = self._supersede(self._current)
+            self._current = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def cancel(self):
+        with self._lock:
+            in_flight = self._current is not None and self._supersede(self._current)
+            self._current = None
+        if in_flight:
+            self._pool.submit(self._cancel_on_server)
+
+    def _supersede(self, job: UploadJob) -> bool:
+        """Cancels job locally (call with the lock held); returns whether the server is already working on it."""
+        job.cancel()
+        return job.sent.is_set() and not job.done.is_set()
+
+    def _cancel_on_server(self):
+        if not self.cancel_url:
+            return
+        try:
+            self.session.post(self.cancel_url, params={"session_id": self.params.get("session_id", "default")}, timeout=2)
+        except requests.RequestException as e:
+            print("Cancel failed:", e)
+
+    def notify(self, url: str):
+        """Fire-and-forget POST on the shared session (e.g. to stop server-side playback)."""
+        def post():
+            try:
+                self.session.post(url, timeout=2)
+            except requests.RequestException as e:
+                print("Notify failed:", e)
+        self._pool.submit(post)
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._current is not None and not self._current.done.is_set()
+
+    def _run(self, job: UploadJob):
+        try:
+            with self._lock:
+                if job.cancelled.is_set():
+                    return
+                job.sent.set()
+            if job.cancel_previous:
+                self._cancel_on_server()
+            files = {"audio": ("utterance.wav", job.wav_bytes, "audio/wav")}
+            # Lets the server put the upload leg on the request's trace
+            headers = {**job.headers, "X-Sent-At": str(int(time.time() * 1000))}
+            job.response = self.session.post(self.url, params=self.params, files=files, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            job.error = e
+        finally:
+            job.done.set()
+            with self._lock:
+                if self._current is job:
+                    self._current = None
+
+        if job.cancelled.is_set():
+            if job.sent.is_set():
+                print("Discarded reply to a superseded utterance.")
+        elif self.on_result:
+            self.on_result(job)
+
+    def close(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()